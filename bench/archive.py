@@ -0,0 +1,86 @@
+"""
+Archive SQLite : import en masse de plusieurs années de notes (lots
+transactionnels) puis durée des requêtes de totaux servies par les index,
+comme « HOTEL-HEBERGEMENT de GIE IFEA au 3e trimestre ».
+
+    python -m bench.archive [--years 3] [--employees 150] [--rows 20] [--repeat 20]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from bench.samples import expense_rows
+from ndf.archive import ExpenseArchive, quarter
+from ndf.config import COMPANIES
+
+
+def notes(years: int, employees: int, rows: int, first_year: int = 2024):
+    """Une note par salarié et par mois, salariés répartis entre les sociétés."""
+    for year in range(first_year, first_year + years):
+        for month in range(1, 13):
+            for e in range(employees):
+                yield {
+                    "invoice_no": f"NDFSALARIE{e:04d}{year % 100:02d}{month:02d}",
+                    "employee":   f"Salarié {e:04d}",
+                    "company":    COMPANIES[e % len(COMPANIES)],
+                    "currency":   "€",
+                    "month":      f"{year}-{month:02d}",
+                    "rows":       expense_rows(rows, seed=e * 100 + month),
+                }
+
+
+def _median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--employees", type=int, default=150)
+    parser.add_argument("--rows", type=int, default=20, help="dépenses par note")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = ExpenseArchive(os.path.join(tmp, "archive.sqlite3"))
+        t0      = time.perf_counter()
+        lines   = archive.save_notes(notes(args.years, args.employees, args.rows))
+        elapsed = time.perf_counter() - t0
+        size    = os.path.getsize(archive.path) / 2**20
+        print(f"import : {lines} lignes en {elapsed:.1f} s ({lines / elapsed:,.0f} lignes/s), "
+              f"base de {size:.0f} Mo")
+
+        last    = 2024 + args.years - 1
+        queries = {
+            "HOTEL, GIE IFEA, T3": dict(company="GIE IFEA", category="HOTEL-HEBERGEMENT",
+                                        months=quarter(last, 3), group_by=()),
+            "société × catégorie, un mois": dict(company="IFEA SAS", month=f"{last}-06"),
+            "salarié, une année": dict(employee="Salarié 0042", months=(f"{last}-01", f"{last}-12"),
+                                       group_by=("month",)),
+            "catégorie, toutes sociétés": dict(category="TRANSPORT - CARBURANT",
+                                               group_by=("company",)),
+        }
+        print(f"\n{'requête':<32}{'ms':>8}{'groupes':>9}")
+        for label, kwargs in queries.items():
+            result = archive.totals(**kwargs)
+            ms     = _median_ms(lambda: archive.totals(**kwargs), args.repeat)
+            print(f"{label:<32}{ms:>8.2f}{len(result):>9}")
+
+        start, end = quarter(last, 3)
+        print("\nplan :", "; ".join(archive.explain(
+            "SELECT currency, SUM(amount_cents) FROM expenses WHERE company = ? AND category = ?"
+            " AND month BETWEEN ? AND ? GROUP BY currency",
+            ("GIE IFEA", "HOTEL-HEBERGEMENT", start, end))))
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
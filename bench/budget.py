@@ -0,0 +1,72 @@
+"""
+Mode « taille cible » : taille du PDF fusionné obtenu pour chaque cible, en
+une seule génération, sur une note mêlant scans, photos et un PDF texte.
+
+    python -m bench.budget [--targets 0,8,4,2,1] [--scans 3] [--photos 6]
+"""
+
+import argparse
+import io
+import tempfile
+import time
+
+import pandas as pd
+from reportlab.pdfgen import canvas as rl_canvas
+
+from bench.samples import expense_rows, photo_jpeg, scanned_pdf
+from ndf.blobs import BlobStore
+from ndf.config import configure_reportlab
+from ndf.images import compress_image
+from ndf.pdf import stream_full_pdf
+from ndf.pdfopt import optimize_pdf
+
+
+def text_pdf(pages: int = 20) -> bytes:
+    """PDF sans image (facture éditée) : ne rétrécit pas."""
+    buf = io.BytesIO()
+    c = rl_canvas.Canvas(buf)
+    for i in range(pages):
+        c.drawString(72, 700, f"Facture — page {i + 1} " * 4)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def sample_note(store: BlobStore, scans: int, photos: int) -> dict:
+    """Pièces jointes telles qu'enregistrées à l'import (déjà compressées)."""
+    uploaded = {}
+    for i in range(scans):
+        digest = store.put(optimize_pdf(scanned_pdf(2, 300, seed=i)))
+        uploaded[f"s{i}"] = {"sha256": digest, "name": f"scan{i}.pdf", "is_pdf": True, "is_image": False}
+    for i in range(photos):
+        digest = store.put(compress_image(photo_jpeg(12, seed=i)))
+        uploaded[f"p{i}"] = {"sha256": digest, "name": f"photo{i}.jpg", "is_pdf": False, "is_image": True}
+    uploaded["t"] = {"sha256": store.put(text_pdf()), "name": "texte.pdf",
+                     "is_pdf": True, "is_image": False}
+    return uploaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", default="0,8,4,2,1", help="cibles en Mo (0 = sans limite)")
+    parser.add_argument("--scans", type=int, default=3)
+    parser.add_argument("--photos", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    configure_reportlab()
+    with tempfile.TemporaryDirectory() as tmp:
+        store    = BlobStore(tmp)
+        uploaded = sample_note(store, args.scans, args.photos)
+        df       = pd.DataFrame(expense_rows(len(uploaded), seed=1))
+        print(f"{'cible (Mo)':>11}{'PDF (Mo)':>10}{'s':>7}")
+        for target in [float(x) for x in args.targets.split(",")]:
+            t0 = time.perf_counter()
+            with stream_full_pdf(df, "Jean Test", "IFEA SAS", "€", uploaded, blob_store=store,
+                                 target_size=int(target * 2**20) or None) as pdf:
+                size = pdf.seek(0, io.SEEK_END)
+            label = f"{target:g}" if target else "—"
+            print(f"{label:>11}{size / 2**20:>10.2f}{time.perf_counter() - t0:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark de compress_image : moteur actuel contre l'algorithme
+d'origine (décodage complet, LANCZOS à 1920 px, qualité 85, 75, 65…).
+
+    python -m bench.compress [--target-kb 500] [--repeat 3]
+"""
+
+import argparse
+import io
+import time
+
+from PIL import Image as PILImage
+
+from bench.samples import MEGAPIXELS, photo_jpeg
+from ndf.images import compress_image_with_stats
+
+
+def legacy_compress(image_bytes, max_size_kb=500, quality=85):
+    """Algorithme d'origine, instrumenté : renvoie (bytes, nombre d'encodages)."""
+    img = PILImage.open(io.BytesIO(image_bytes))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    max_width = 1920
+    if img.width > max_width:
+        ratio = max_width / img.width
+        img = img.resize((max_width, int(img.height * ratio)), PILImage.Resampling.LANCZOS)
+    output = io.BytesIO()
+    current_quality, passes = quality, 0
+    while current_quality > 20:
+        output.seek(0)
+        output.truncate()
+        img.save(output, format="JPEG", quality=current_quality, optimize=True)
+        passes += 1
+        if len(output.getvalue()) / 1024 <= max_size_kb or current_quality <= 30:
+            break
+        current_quality -= 10
+    return output.getvalue(), passes
+
+
+def _best_time(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target-kb", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    # (mégapixels, bruit capteur, orientation EXIF)
+    cases = [(mp, noise, 1) for mp in MEGAPIXELS for noise in (14, 40)] + [(12, 40, 6)]
+    print(f"{'image':<18}{'avant (s)':>10}{'passes':>8}{'Ko':>7}"
+          f"{'après (s)':>11}{'passes':>8}{'Ko':>7}{'q':>5}{'gain':>7}")
+    for mp, noise, orientation in cases:
+        src = photo_jpeg(mp, noise=noise, orientation=orientation)
+        t_old, (old, old_passes) = _best_time(
+            lambda: legacy_compress(src, args.target_kb), args.repeat)
+        t_new, (new, info) = _best_time(
+            lambda: compress_image_with_stats(src, args.target_kb), args.repeat)
+        label = f"{mp} MP bruit {noise}" + (" ↻" if orientation != 1 else "")
+        print(f"{label:<18}{t_old:>10.2f}{old_passes:>8}{len(old) // 1024:>7}"
+              f"{t_new:>11.2f}{info['passes']:>8}{info['size'] // 1024:>7}"
+              f"{info['quality']:>5}{t_old / t_new:>6.1f}×")
+
+
+if __name__ == "__main__":
+    main()
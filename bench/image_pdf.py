@@ -0,0 +1,85 @@
+"""
+Benchmark de la conversion image → page PDF : intégration directe du JPEG
+(flux DCT) contre l'ancien réencodage PNG.
+
+    python -m bench.image_pdf [--repeat 3]
+"""
+
+import argparse
+import io
+import time
+
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
+from bench.samples import photo_jpeg, screenshot_png
+from ndf.config import configure_reportlab
+from ndf.images import compress_image, image_to_pdf_bytes
+
+
+def legacy_image_to_pdf_bytes(img_bytes: bytes) -> bytes:
+    """Conversion d'origine : réencodage PNG puis drawImage, flux en ASCII85."""
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas as rl_canvas
+    use_a85, rl_config.useA85 = rl_config.useA85, 1
+    try:
+        img = PILImage.open(io.BytesIO(img_bytes))
+        pw, ph = A4
+        margin = 15 * mm
+        max_w, max_h = pw - 2 * margin, ph - 2 * margin
+        ratio = min(max_w / img.width, max_h / img.height)
+        dw, dh = img.width * ratio, img.height * ratio
+        buf = io.BytesIO()
+        c = rl_canvas.Canvas(buf, pagesize=A4)
+        tmp = io.BytesIO()
+        img.save(tmp, format="PNG")
+        tmp.seek(0)
+        c.drawImage(ImageReader(tmp), margin + (max_w - dw) / 2, margin + (max_h - dh) / 2,
+                    width=dw, height=dh, preserveAspectRatio=True)
+        c.save()
+        return buf.getvalue()
+    finally:
+        rl_config.useA85 = use_a85
+
+
+def _best_time(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    configure_reportlab()
+    # Pièces jointes telles que stockées après l'import (compress_image),
+    # plus une capture PNG brute pour le chemin de conversion unique.
+    samples = [(f"photo 12 MP #{i}", compress_image(photo_jpeg(12, seed=i))) for i in range(4)]
+    samples += [
+        ("photo 48 MP", compress_image(photo_jpeg(48))),
+        ("capture → JPEG", compress_image(screenshot_png())),
+        ("capture PNG brute", screenshot_png()),
+    ]
+    print(f"{'pièce jointe':<20}{'Ko':>6}{'avant (s)':>11}{'Ko PDF':>8}"
+          f"{'après (s)':>11}{'Ko PDF':>8}")
+    totals = [0.0, 0, 0.0, 0]
+    for label, data in samples:
+        t_old, old = _best_time(lambda: legacy_image_to_pdf_bytes(data), args.repeat)
+        t_new, new = _best_time(lambda: image_to_pdf_bytes(data), args.repeat)
+        for i, v in enumerate((t_old, len(old), t_new, len(new))):
+            totals[i] += v
+        print(f"{label:<20}{len(data) // 1024:>6}{t_old:>11.3f}{len(old) // 1024:>8}"
+              f"{t_new:>11.3f}{len(new) // 1024:>8}")
+    print(f"{'total':<20}{'':>6}{totals[0]:>11.3f}{totals[1] // 1024:>8}"
+          f"{totals[2]:>11.3f}{totals[3] // 1024:>8}")
+
+
+if __name__ == "__main__":
+    main()
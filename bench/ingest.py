@@ -0,0 +1,67 @@
+"""
+Import groupé de justificatifs : un fichier après l'autre (import unitaire
+d'origine, un aller-retour par reçu) contre ingest_files réparti sur le pool
+de conversion. Magasin de blobs neuf à chaque mesure.
+
+    python -m bench.ingest [--files 25] [--workers 4]
+"""
+
+import argparse
+import tempfile
+import time
+
+from bench.samples import photo_jpeg, scanned_pdf, screenshot_png
+from ndf.blobs import BlobStore
+from ndf.config import configure_reportlab
+from ndf.images import make_executor
+from ndf.ingest import ingest_files
+
+
+def sample_files(n: int) -> list[tuple[str, bytes]]:
+    """Surtout des photos 12 MP, quelques captures PNG et scans de 2 pages."""
+    files = []
+    for i in range(n):
+        if i % 8 == 7:
+            files.append((f"scan{i}.pdf", scanned_pdf(2, 300, seed=i)))
+        elif i % 8 == 6:
+            files.append((f"capture{i}.png", screenshot_png(seed=i)))
+        else:
+            files.append((f"recu{i}.jpg", photo_jpeg(12, seed=i)))
+    return files
+
+
+def _timed(files, executor=None) -> tuple[float, list[dict]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlobStore(tmp)
+        t0    = time.perf_counter()
+        if executor is None:
+            report = [r for f in files for r in ingest_files([f], store)]
+        else:
+            report = ingest_files(files, store, executor)
+        return time.perf_counter() - t0, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    configure_reportlab()
+    files  = sample_files(args.files)
+    before = sum(len(data) for _, data in files) / 2**20
+    one_by_one, _ = _timed(files)
+    executor = make_executor(args.workers)
+    try:
+        executor.submit(int).result()   # processus démarrés hors mesure
+        pooled, report = _timed(files, executor)
+    finally:
+        executor.shutdown()
+    after = sum(r["size"] for r in report if r["size"]) / 2**20
+    print(f"{len(files)} fichiers, {before:.0f} Mo → {after:.1f} Mo")
+    print(f"un par un : {one_by_one:.2f} s   lot ({args.workers} processus) : {pooled:.2f} s   "
+          f"×{one_by_one / pooled:.1f}")
+
+
+if __name__ == "__main__":
+    main()
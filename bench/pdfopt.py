@@ -0,0 +1,76 @@
+"""
+Pièces jointes PDF scannées : copie page à page depuis un tampon en mémoire
+(fusion d'origine) contre optimisation à l'import (lecture mmap, images
+ramenées à NDF_PDF_MAX_DPI, dédoublonnage). Chaque mesure tourne dans un
+processus neuf pour que le pic de mémoire résidente lui soit propre.
+
+    python -m bench.pdfopt [--pages 1,5,10] [--dpi 300,600] [--max-dpi 150]
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench.samples import scanned_pdf
+from ndf.config import configure_reportlab
+from ndf.pdfopt import optimize_pdf_with_stats
+from ndf.trace import peak_rss
+
+
+def legacy_copy(path: str) -> dict:
+    """Lecture complète en mémoire puis copie des pages telles quelles."""
+    from pypdf import PdfReader, PdfWriter
+
+    t0 = time.perf_counter()
+    with open(path, "rb") as fh:
+        reader = PdfReader(io.BytesIO(fh.read()))
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    out = io.BytesIO()
+    writer.write(out)
+    return {"size": len(out.getvalue()), "seconds": time.perf_counter() - t0, "peak_rss": peak_rss()}
+
+
+def optimized(path: str, max_dpi: int) -> dict:
+    return optimize_pdf_with_stats(path, max_dpi)[1]
+
+
+def _isolated(func, *args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(func, *args).result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", default="1,5,10")
+    parser.add_argument("--dpi", default="300,600")
+    parser.add_argument("--max-dpi", type=int, default=150)
+    args = parser.parse_args(argv)
+
+    # Comme un scanner : flux d'images binaires, sans ASCII85.
+    configure_reportlab()
+    mb = 1 << 20
+    print(f"{'pages':>6}{'dpi':>5}{'source (Mo)':>13}{'avant (Mo)':>12}{'RSS':>6}{'s':>7}"
+          f"{'après (Mo)':>12}{'RSS':>6}{'s':>7}")
+    for dpi in [int(x) for x in args.dpi.split(",")]:
+        for pages in [int(x) for x in args.pages.split(",")]:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+                tmp.write(scanned_pdf(pages, dpi))
+            try:
+                old = _isolated(legacy_copy, tmp.name)
+                new = _isolated(optimized, tmp.name, args.max_dpi)
+            finally:
+                os.unlink(tmp.name)
+            print(f"{pages:>6}{dpi:>5}{new['original_size'] / mb:>13.1f}"
+                  f"{old['size'] / mb:>12.1f}{old['peak_rss'] // mb:>6}{old['seconds']:>7.2f}"
+                  f"{new['size'] / mb:>12.2f}{new['peak_rss'] // mb:>6}{new['seconds']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Régénération après modification d'une note de 20 justificatifs : sans cache,
+première génération, ajout d'un reçu, note inchangée. Avec le cache, seuls
+le récapitulatif (empreinte modifiée) et le nouveau reçu sont rendus.
+
+    python -m bench.rebuild [--receipts 20] [--scans 5] [--repeat 3]
+"""
+
+import argparse
+import io
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from bench.samples import expense_rows, photo_jpeg, scanned_pdf
+from ndf.blobs import BlobStore
+from ndf.cache import PageCache
+from ndf.config import configure_reportlab
+from ndf.images import compress_image
+from ndf.pdf import stream_full_pdf
+from ndf.pdfopt import optimize_pdf
+
+
+def _attachment(store: BlobStore, i: int, scans: int) -> dict:
+    if i < scans:
+        digest = store.put(optimize_pdf(scanned_pdf(1, 300, seed=i)))
+        return {"sha256": digest, "name": f"scan{i}.pdf", "is_pdf": True, "is_image": False}
+    digest = store.put(compress_image(photo_jpeg(12, seed=i)))
+    return {"sha256": digest, "name": f"recu{i}.jpg", "is_pdf": False, "is_image": True}
+
+
+def _build(rows, uploaded, store, cache) -> float:
+    t0 = time.perf_counter()
+    with stream_full_pdf(pd.DataFrame(rows), "Jean Test", "IFEA SAS", "€", uploaded,
+                         invoice_no="NDFTEST2610", page_cache=cache, blob_store=store) as pdf:
+        pdf.seek(0, io.SEEK_END)
+    return time.perf_counter() - t0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--receipts", type=int, default=20)
+    parser.add_argument("--scans", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    configure_reportlab()
+    with tempfile.TemporaryDirectory() as tmp:
+        store    = BlobStore(tmp)
+        uploaded = {f"k{i}": _attachment(store, i, args.scans) for i in range(args.receipts + 1)}
+        extra    = uploaded.pop(f"k{args.receipts}")
+        rows     = expense_rows(args.receipts, seed=1)
+
+        timings = {"sans cache": [], "1re génération": [], "ajout d'un reçu": [], "inchangée": []}
+        for _ in range(args.repeat):
+            cache = PageCache(64 * 1024 * 1024)
+            timings["sans cache"].append(_build(rows, uploaded, store, None))
+            timings["1re génération"].append(_build(rows, uploaded, store, cache))
+            more = rows + expense_rows(1, seed=2)
+            timings["ajout d'un reçu"].append(
+                _build(more, {**uploaded, "new": extra}, store, cache))
+            timings["inchangée"].append(_build(more, {**uploaded, "new": extra}, store, cache))
+
+    print(f"{'génération':<18}{'médiane (s)':>12}")
+    for label, values in timings.items():
+        print(f"{label:<18}{statistics.median(values):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
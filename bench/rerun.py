@@ -0,0 +1,88 @@
+"""
+Latence de réexécution du script Streamlit et coût d'import à froid.
+
+Mesure, via streamlit.testing, le premier passage du script (imports
+compris) puis la médiane de `--reruns` réexécutions déclenchées par la
+saisie d'un champ de la barre latérale, comme le fait un utilisateur.
+Chaque mesure à froid tourne dans un processus neuf ; l'import du moteur
+PDF, différé jusqu'à la première génération, est mesuré à part.
+
+    python -m bench.rerun [--reruns 30] [--cold 3] [--rows 1]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def _measure(reruns: int, rows: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+    from bench.samples import expense_rows
+    from ndf.store import ExpenseStore
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    t0 = time.perf_counter()
+    at.run()
+    first = time.perf_counter() - t0
+    # Des dépenses en session : le tableau et le récapitulatif sont affichés.
+    store = ExpenseStore()
+    store.extend(expense_rows(rows), "€")
+    at.session_state["expense_store"] = store
+    at.run()
+    samples = []
+    for i in range(reruns):
+        at.sidebar.text_input[0].input(f"Jean{i}")
+        t0 = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - t0)
+    return {"first_run": first, "rerun_median": statistics.median(samples),
+            "rerun_p90": sorted(samples)[int(len(samples) * 0.9) - 1]}
+
+
+def _cold_import(module: str) -> float:
+    """Durée d'import de `module` dans un processus neuf."""
+    code = ("import time; t = time.perf_counter(); import " + module
+            + "; print(time.perf_counter() - t)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                         text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--cold", type=int, default=3, help="nombre de processus neufs")
+    parser.add_argument("--rows", type=int, default=1, help="dépenses en session")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_measure(args.reruns, args.rows)))
+        return
+
+    results = []
+    for _ in range(args.cold):
+        out = subprocess.run(
+            [sys.executable, "-m", "bench.rerun", "--child", "--reruns", str(args.reruns),
+             "--rows", str(args.rows)],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    for key, label in [("first_run", "premier passage (imports compris)"),
+                       ("rerun_median", "réexécution, médiane"),
+                       ("rerun_p90", "réexécution, p90")]:
+        value = statistics.median(r[key] for r in results)
+        print(f"{label:<36}{value * 1000:>9.1f} ms")
+    # Payé une fois par processus, à la première génération de PDF.
+    engine = statistics.median(_cold_import("ndf.pdf") for _ in range(args.cold))
+    print(f"{'import du moteur PDF (ndf.pdf)':<36}{engine * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Échantillons synthétiques pour les benchmarks : photos de tickets, captures
+d'écran PNG et PDF scannés, reproductibles à partir d'une graine.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image as PILImage
+from PIL import ImageDraw
+
+# Résolutions d'appareils photo courantes : 12, 24 et 48 mégapixels.
+MEGAPIXELS = {
+    12: (4000, 3000),
+    24: (6000, 4000),
+    48: (8000, 6000),
+}
+
+
+def receipt_photo(width: int, height: int, seed: int = 0, noise: float = 14) -> PILImage.Image:
+    """Photo d'un ticket posé sur une table : fond dégradé, lignes de texte, bruit capteur."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height:8, 0:width:8].astype(np.float32)
+    base = 90 + 60 * np.sin(xx / width * 3.1) + 40 * np.cos(yy / height * 2.3)
+    small = np.stack([base, base * 0.95, base * 0.85], -1)
+    img = PILImage.fromarray(np.clip(small, 0, 255).astype(np.uint8)).resize(
+        (width, height), PILImage.Resampling.BILINEAR,
+    )
+    draw = ImageDraw.Draw(img)
+    mx, my = int(width * 0.2), int(height * 0.1)
+    draw.rectangle([mx, my, width - mx, height - my], fill=(238, 236, 230))
+    line_h = max(8, height // 90)
+    for y in range(my + 2 * line_h, height - my - 2 * line_h, 2 * line_h):
+        length = int((width - 2 * mx) * (0.3 + 0.6 * rng.random()))
+        draw.rectangle([mx + 2 * line_h, y, mx + 2 * line_h + length, y + line_h], fill=(40, 40, 45))
+    pixels = np.asarray(img).astype(np.int16)
+    pixels += rng.normal(0, noise, pixels.shape).astype(np.int16)
+    return PILImage.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def photo_jpeg(megapixels: int, seed: int = 0, noise: float = 14,
+               orientation: int = 1, quality: int = 92) -> bytes:
+    """JPEG tel que produit par un téléphone, avec orientation EXIF optionnelle."""
+    width, height = MEGAPIXELS[megapixels]
+    img = receipt_photo(width, height, seed, noise)
+    exif = PILImage.Exif()
+    exif[0x0112] = orientation
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, exif=exif.tobytes())
+    return buf.getvalue()
+
+
+def screenshot_png(width: int = 1170, height: int = 2532, seed: int = 0) -> bytes:
+    """Capture d'écran de confirmation de paiement : aplats, texte, canal alpha."""
+    rng = np.random.default_rng(seed)
+    img = PILImage.new("RGBA", (width, height), (250, 250, 252, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, height // 8], fill=(30, 90, 200, 255))
+    for y in range(height // 6, height - 100, 60):
+        length = int(width * (0.2 + 0.6 * rng.random()))
+        draw.rectangle([60, y, 60 + length, y + 24], fill=(60, 60, 70, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def scanned_pdf(pages: int = 3, dpi: int = 300, seed: int = 0) -> bytes:
+    """Facture fournisseur scannée : une image pleine page A4 par page, à `dpi`."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas as rl_canvas
+
+    width, height = int(A4[0] / 72 * dpi), int(A4[1] / 72 * dpi)
+    buf = io.BytesIO()
+    c = rl_canvas.Canvas(buf, pagesize=A4)
+    for i in range(pages):
+        page = receipt_photo(width, height, seed + i, noise=6).convert("L")
+        jpg = io.BytesIO()
+        page.save(jpg, format="JPEG", quality=90)
+        jpg.seek(0)
+        c.drawImage(ImageReader(jpg), 0, 0, width=A4[0], height=A4[1])
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+_WORDS = ("train hôtel repas client taxi péage carburant séminaire formation "
+          "salon Paris Lyon Marseille réunion fournitures & <déplacement>").split()
+
+
+def expense_rows(n: int, seed: int = 0, cur: str = "€") -> list[dict]:
+    """
+    `n` dépenses au format de ExpenseStore.records() : libellés courts
+    pour la plupart, quelques-uns assez longs pour passer à la ligne.
+    """
+    from ndf.config import EXPENSE_CATEGORIES
+    rng = np.random.default_rng(seed)
+
+    def words(counts):
+        return " ".join(rng.choice(_WORDS, size=rng.choice(counts)))
+
+    return [{
+        "Date":                      f"{rng.integers(1, 29):02d}/10/2026",
+        "Fournisseur":               words([1, 1, 2, 6]),
+        "Objet":                     words([1, 2, 3, 12]),
+        "Type":                      EXPENSE_CATEGORIES[rng.integers(len(EXPENSE_CATEGORIES))],
+        f"Montant TTC ({cur})":      round(float(rng.uniform(1, 900)), 2),
+        "Imputation budgétaire":     ["", "PRJ-12", "Affaire 2026-042 Lyon"][rng.integers(3)],
+        "Justificatif":              f"recu_{i:04d}.pdf",
+    } for i in range(n)]
@@ -0,0 +1,242 @@
+"""
+Suite de référence de la génération : scénarios synthétiques reproductibles,
+de 1 à 1 000 lignes et de 0 à 100 pièces jointes (photos 12 MP, captures
+PNG, scans multipages), qui appellent compress_image, generate_expense_pdf
+et generate_full_pdf hors de Streamlit.
+
+Chaque mesure tourne dans un processus neuf : durée (médiane des
+répétitions), pic de mémoire résidente et taille produite. Les résultats
+sont écrits en JSON ; avec --baseline, ils sont comparés à un JSON
+enregistré et le code de sortie vaut 1 si un scénario régresse au-delà du
+seuil (durée ou mémoire).
+
+    python -m bench.suite [--only full] [--repeat 3] [--out resultats.json]
+                          [--baseline reference.json] [--threshold 0.15]
+    python -m bench.suite --load resultats.json --baseline reference.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from bench.samples import expense_rows, photo_jpeg, scanned_pdf, screenshot_png
+from ndf.config import configure_reportlab
+from ndf.trace import peak_rss
+
+# ─── Scénarios ────────────────────────────────────────────────────────────────
+# (nom, fonction mesurée, paramètres). Pour "full" : lignes, photos, captures
+# PNG et scans de SCAN_PAGES pages ; les pièces jointes sont passées telles
+# que l'import les enregistre (images compressées, PDF optimisés).
+SCENARIOS = [
+    ("compress/photo-12mp",   "compress", {"sample": "photo"}),
+    ("compress/capture-png",  "compress", {"sample": "screenshot"}),
+    ("summary/1",             "summary",  {"rows": 1}),
+    ("summary/100",           "summary",  {"rows": 100}),
+    ("summary/1000",          "summary",  {"rows": 1000}),
+    ("full/1-0",              "full",     {"rows": 1, "photos": 0, "screenshots": 0, "scans": 0}),
+    ("full/20-10",            "full",     {"rows": 20, "photos": 6, "screenshots": 2, "scans": 2}),
+    ("full/200-50",           "full",     {"rows": 200, "photos": 30, "screenshots": 10, "scans": 10}),
+    ("full/1000-100",         "full",     {"rows": 1000, "photos": 60, "screenshots": 25, "scans": 15}),
+]
+SCAN_PAGES = 3
+# Originaux distincts générés par type ; au-delà, les pièces jointes en sont
+# des variantes (octets ajoutés après la fin du fichier, ignorés à la
+# lecture) : empreintes différentes, donc ni dédoublonnées ni cachées.
+POOL = {"photo": 8, "screenshot": 4, "scan": 4}
+# Écarts absolus sous lesquels une hausse n'est pas une régression (bruit).
+MIN_DELTA = {"seconds": 0.02, "peak_rss": 8 * 1024 * 1024}
+
+
+# ─── Échantillons ─────────────────────────────────────────────────────────────
+class Samples:
+    """Originaux générés à la demande, une fois par exécution de la suite."""
+
+    def __init__(self):
+        self._raw, self._imported = {}, {}
+
+    def raw(self, kind: str, i: int) -> bytes:
+        seed = i % POOL[kind]
+        if (kind, seed) not in self._raw:
+            self._raw[kind, seed] = {
+                "photo":      lambda: photo_jpeg(12, seed=seed),
+                "screenshot": lambda: screenshot_png(seed=seed),
+                "scan":       lambda: scanned_pdf(SCAN_PAGES, 300, seed=seed),
+            }[kind]()
+        return self._raw[kind, seed]
+
+    def imported(self, kind: str, i: int) -> bytes:
+        """Pièce jointe telle qu'enregistrée par l'import de l'application."""
+        from ndf.images import compress_image
+        from ndf.pdfopt import optimize_pdf
+
+        seed = i % POOL[kind]
+        if (kind, seed) not in self._imported:
+            data = self.raw(kind, i)
+            self._imported[kind, seed] = optimize_pdf(data) if kind == "scan" else compress_image(data)
+        data = self._imported[kind, seed]
+        return data if i < POOL[kind] else data + b"\n%% ndf-bench %d\n" % i
+
+    def attachments(self, photos: int, screenshots: int, scans: int) -> dict:
+        uploaded = {}
+        for kind, count, ext in (("photo", photos, "jpg"), ("screenshot", screenshots, "png"),
+                                 ("scan", scans, "pdf")):
+            for i in range(count):
+                uploaded[f"{kind}{i}"] = {"bytes": self.imported(kind, i),
+                                          "name": f"{kind}{i}.{ext}",
+                                          "is_pdf": kind == "scan", "is_image": kind != "scan"}
+        return uploaded
+
+
+# ─── Mesures (processus neuf) ─────────────────────────────────────────────────
+def _run_compress(image: bytes) -> dict:
+    from ndf.images import compress_image
+    t0  = time.perf_counter()
+    out = compress_image(image)
+    return {"seconds": time.perf_counter() - t0, "size": len(out), "peak_rss": peak_rss()}
+
+
+def _run_summary(rows: list[dict]) -> dict:
+    import pandas as pd
+    from ndf.pdf import generate_expense_pdf
+    df  = pd.DataFrame(rows)
+    t0  = time.perf_counter()
+    out = generate_expense_pdf(df, "Jean Test", "IFEA SAS", "€", invoice_no="NDFTEST2610")
+    return {"seconds": time.perf_counter() - t0, "size": len(out), "peak_rss": peak_rss()}
+
+
+def _run_full(rows: list[dict], uploaded: dict) -> dict:
+    import pandas as pd
+    from ndf.pdf import generate_full_pdf
+    from ndf.trace import BuildTrace
+    df    = pd.DataFrame(rows)
+    # Chaque étape remet le pic à zéro : pic du processus = max des étapes.
+    prep  = peak_rss()
+    trace = BuildTrace(reset_peak=True)
+    t0    = time.perf_counter()
+    out   = generate_full_pdf(df, "Jean Test", "IFEA SAS", "€", uploaded,
+                              invoice_no="NDFTEST2610", trace=trace)
+    peak  = max([prep, peak_rss()] + [s["peak_rss"] for s in trace.spans])
+    return {"seconds": time.perf_counter() - t0, "size": len(out), "peak_rss": peak}
+
+
+def _isolated(func, *args) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=configure_reportlab) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run_scenario(samples: Samples, kind: str, params: dict, repeat: int) -> dict:
+    """Médiane et minimum des durées, pic de mémoire maximal, taille produite."""
+    if kind == "compress":
+        func, args = _run_compress, (samples.raw(params["sample"], 0),)
+    elif kind == "summary":
+        func, args = _run_summary, (expense_rows(params["rows"], seed=1),)
+    else:
+        func, args = _run_full, (expense_rows(params["rows"], seed=1),
+                                 samples.attachments(params["photos"], params["screenshots"],
+                                                     params["scans"]))
+    runs = [_isolated(func, *args) for _ in range(repeat)]
+    return {
+        "seconds":     round(statistics.median(r["seconds"] for r in runs), 4),
+        "seconds_min": round(min(r["seconds"] for r in runs), 4),
+        "peak_rss":    max(r["peak_rss"] for r in runs),
+        "size":        runs[-1]["size"],
+        "params":      params,
+    }
+
+
+def _meta(repeat: int) -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except OSError:
+        rev = ""
+    return {"date": datetime.now().isoformat(timespec="seconds"), "git": rev,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "repeat": repeat}
+
+
+# ─── Comparaison ──────────────────────────────────────────────────────────────
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Scénarios dont la durée ou le pic de mémoire dépasse la référence de plus
+    de `threshold` (fraction) et de MIN_DELTA ; la taille produite n'est
+    qu'affichée, un changement de taille pouvant être voulu.
+    """
+    mb = 1 << 20
+    regressions = []
+    print(f"\n{'scénario':<22}{'s':>8}{'Δ':>8}{'RSS (Mo)':>10}{'Δ':>8}{'Ko':>9}{'Δ':>8}")
+    for name, new in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name:<22}{new['seconds']:>8.3f}{'—':>8}{new['peak_rss'] // mb:>10}{'—':>8}"
+                  f"{new['size'] // 1024:>9}{'—':>8}  (nouveau)")
+            continue
+        deltas, flagged = {}, []
+        for metric in ("seconds", "peak_rss", "size"):
+            deltas[metric] = new[metric] / old[metric] - 1 if old[metric] else 0.0
+            if (metric in MIN_DELTA and deltas[metric] > threshold
+                    and new[metric] - old[metric] > MIN_DELTA[metric]):
+                flagged.append(metric)
+        print(f"{name:<22}{new['seconds']:>8.3f}{deltas['seconds']:>+8.0%}"
+              f"{new['peak_rss'] // mb:>10}{deltas['peak_rss']:>+8.0%}"
+              f"{new['size'] // 1024:>9}{deltas['size']:>+8.0%}"
+              + ("  ⚠ régression (" + ", ".join(flagged) + ")" if flagged else ""))
+        if flagged:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", default="",
+                        help="scénarios dont le nom contient l'un de ces mots (séparés par des virgules)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="fichier JSON des résultats")
+    parser.add_argument("--load", help="résultats JSON déjà enregistrés, au lieu de mesurer")
+    parser.add_argument("--baseline", help="résultats JSON de référence")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="hausse tolérée avant de signaler une régression (0.15 = 15 %%)")
+    args = parser.parse_args(argv)
+
+    if args.load:
+        with open(args.load, encoding="utf-8") as fh:
+            results = json.load(fh)
+    else:
+        # Comme un scanner : flux d'images binaires, sans ASCII85.
+        configure_reportlab()
+        words    = [w for w in args.only.split(",") if w]
+        samples  = Samples()
+        results  = {"meta": _meta(args.repeat), "results": {}}
+        mb = 1 << 20
+        print(f"{'scénario':<22}{'s':>8}{'min':>8}{'RSS (Mo)':>10}{'Ko':>9}")
+        for name, kind, params in SCENARIOS:
+            if words and not any(w in name for w in words):
+                continue
+            r = results["results"][name] = run_scenario(samples, kind, params, args.repeat)
+            print(f"{name:<22}{r['seconds']:>8.3f}{r['seconds_min']:>8.3f}"
+                  f"{r['peak_rss'] // mb:>10}{r['size'] // 1024:>9}", flush=True)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:.0%} : "
+                  + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Temps de rendu du tableau récapitulatif selon le nombre de lignes : tableau
+découpé par page (moteur actuel) contre le tableau d'origine (iterrows, un
+Paragraph par cellule, une seule Table).
+
+    python -m bench.summary [--rows 10,100,500,1000,2000,5000] [--legacy-max 1000]
+"""
+
+import argparse
+import io
+import time
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+from bench.samples import expense_rows
+from ndf.config import EXPENSE_CATEGORIES, configure_reportlab
+from ndf.pdf import STYLES, TABLE_HEADERS, _COL_WIDTHS, _expense_table_story, paragraph
+from ndf.utils import fmt_fr
+
+
+def legacy_table(df: pd.DataFrame, cur: str) -> Table:
+    """Construction d'origine du tableau, ligne par ligne."""
+    rows   = [[paragraph(h, STYLES.header) for h in [*TABLE_HEADERS, f"TOTAL ({cur})"]]]
+    totals = {cat: 0.0 for cat in EXPENSE_CATEGORIES}
+    amt_col = f"Montant TTC ({cur})"
+    for _, row in df.iterrows():
+        cat_vals = {cat: "" for cat in EXPENSE_CATEGORIES}
+        rtype    = row.get("Type", "")
+        if rtype in EXPENSE_CATEGORIES:
+            v = float(row.get(amt_col, 0))
+            cat_vals[rtype] = v
+            totals[rtype]  += v
+        row_total = sum(v for v in cat_vals.values() if v != "")
+        rows.append(
+            [paragraph(row.get(c, ""))
+             for c in ("Date", "Fournisseur", "Objet", "Imputation budgétaire")]
+            + [paragraph(fmt_fr(cat_vals[c]) if cat_vals[c] != "" else "")
+               for c in EXPENSE_CATEGORIES]
+            + [paragraph(fmt_fr(row_total))]
+        )
+    rows.append(
+        [paragraph("TOTAUX", STYLES.header), paragraph(""), paragraph(""), paragraph("")]
+        + [paragraph(fmt_fr(totals[c]) if totals[c] else "", STYLES.header)
+           for c in EXPENSE_CATEGORIES]
+        + [paragraph(fmt_fr(sum(totals.values())), STYLES.header)]
+    )
+    tbl = Table(rows, colWidths=_COL_WIDTHS, repeatRows=1)
+    tbl.setStyle(TableStyle([
+        ("GRID",   (0, 0), (-1, -1), 0.5, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]))
+    return tbl
+
+
+def _render(story) -> tuple[int, int]:
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(A4), leftMargin=10*mm,
+                            rightMargin=10*mm, topMargin=10*mm, bottomMargin=10*mm)
+    doc.build(story)
+    return doc.page, len(buf.getvalue())
+
+
+def _time(func) -> tuple[float, tuple]:
+    t0 = time.perf_counter()
+    result = func()
+    return time.perf_counter() - t0, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default="10,100,500,1000,2000,5000")
+    parser.add_argument("--legacy-max", type=int, default=1000,
+                        help="nombre de lignes au-delà duquel l'ancien rendu n'est pas mesuré")
+    args = parser.parse_args(argv)
+
+    configure_reportlab()
+    print(f"{'lignes':>7}{'avant (s)':>11}{'ms/ligne':>10}"
+          f"{'après (s)':>11}{'ms/ligne':>10}{'pages':>7}{'gain':>7}")
+    for n in [int(x) for x in args.rows.split(",")]:
+        df = pd.DataFrame(expense_rows(n, seed=n))
+        t_new, (pages, _) = _time(lambda: _render(_expense_table_story(df, "€")))
+        if n <= args.legacy_max:
+            t_old, _ = _time(lambda: _render([legacy_table(df, "€")]))
+            old = f"{t_old:>11.2f}{t_old / n * 1000:>10.2f}"
+            gain = f"{t_old / t_new:>6.1f}×"
+        else:
+            old, gain = f"{'—':>11}{'—':>10}", f"{'—':>7}"
+        print(f"{n:>7}{old}{t_new:>11.2f}{t_new / n * 1000:>10.2f}{pages:>7}{gain}")
+
+
+if __name__ == "__main__":
+    main()
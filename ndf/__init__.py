@@ -0,0 +1,27 @@
+"""
+Bibliothèque de la note de frais, utilisable hors de Streamlit.
+
+  - ndf.config    : sociétés, catégories, devises, mois
+  - ndf.utils     : numéro de facture, format des montants
+  - ndf.money     : montants en centimes entiers, format vectorisé
+  - ndf.store     : tableau des dépenses de la session (colonnes, totaux courants)
+  - ndf.archive   : archive SQLite des notes (reprise, totaux par société, mois…)
+  - ndf.consolidation : consolidation mensuelle d'une société (XLSX, PDF)
+  - ndf.images    : compression des images, conversion image → page PDF
+  - ndf.pdfopt    : allègement des PDF joints (images sous-échantillonnées)
+  - ndf.ingest    : import des justificatifs, un fichier ou un lot en parallèle
+  - ndf.logos     : registre des logos des sociétés
+  - ndf.blobs     : magasin disque des pièces jointes (adressé par SHA-256)
+  - ndf.cache     : cache des pièces jointes converties
+  - ndf.pdf       : récapitulatif et PDF fusionné
+  - ndf.pdfstream : écriture page par page du PDF fusionné (mémoire bornée)
+  - ndf.jobs      : génération du PDF en arrière-plan (avancement, annulation)
+  - ndf.scheduler : file commune des générations (bornée, équitable)
+  - ndf.trace     : mesures par étape de la génération, profil cProfile
+  - ndf.signature : signature manuscrite stylisée
+  - ndf.excel     : import / export Excel du tableau des dépenses
+  - ndf.batch     : génération en lot depuis un manifeste (python -m ndf.batch)
+
+Les modules légers (config, utils, blobs, trace) n'importent ni ReportLab, ni pypdf,
+ni Pillow : l'interface ne charge le moteur qu'au premier besoin.
+"""
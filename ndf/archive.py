@@ -0,0 +1,377 @@
+"""
+Archive SQLite des notes de frais : dépenses saisies et notes générées,
+conservées d'une session à l'autre.
+
+Chaque note est indexée par son N° de facture (build_invoice_number,
+NDF<NOM><AAMM>) ; ses lignes reprennent la société, le salarié et le mois
+de la note, de sorte que les totaux par société, mois, salarié ou catégorie
+se lisent dans les index sans parcourir la table. Les montants sont en
+centimes entiers, comme dans ExpenseStore. Les enregistrements se font par
+transactions groupées (executemany), une transaction par note ou par lot.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from ndf.config import ATTACHMENT_KEY
+from ndf.money import as_cents
+
+ARCHIVE_PATH       = os.environ.get("NDF_ARCHIVE_DB") or os.path.join(
+    os.path.expanduser("~"), ".ndf", "archive.sqlite3")
+ARCHIVE_BATCH_SIZE = 500   # notes par transaction dans save_notes()
+
+_SCHEMA_VERSION = 2
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    invoice_no   TEXT PRIMARY KEY,
+    employee     TEXT NOT NULL,
+    company      TEXT NOT NULL,
+    month        TEXT NOT NULL,              -- AAAA-MM
+    currency     TEXT NOT NULL,
+    total_cents  INTEGER NOT NULL,
+    row_count    INTEGER NOT NULL,
+    attachments  TEXT NOT NULL DEFAULT '{}', -- clé -> métadonnées du blob (JSON)
+    status       TEXT NOT NULL DEFAULT 'brouillon',
+    pdf_sha256   TEXT,                       -- PDF généré, blob du BlobStore
+    pdf_size     INTEGER,
+    created_at   TEXT NOT NULL,
+    updated_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_notes_company  ON notes (company, month);
+CREATE INDEX IF NOT EXISTS ix_notes_employee ON notes (employee, month);
+CREATE INDEX IF NOT EXISTS ix_notes_month    ON notes (month);
+
+CREATE TABLE IF NOT EXISTS expenses (
+    invoice_no    TEXT NOT NULL REFERENCES notes (invoice_no) ON DELETE CASCADE,
+    position      INTEGER NOT NULL,
+    company       TEXT NOT NULL,
+    employee      TEXT NOT NULL,
+    month         TEXT NOT NULL,
+    date          TEXT NOT NULL,             -- AAAA-MM-JJ si la saisie est lisible
+    supplier      TEXT NOT NULL,
+    object        TEXT NOT NULL,
+    category      TEXT NOT NULL,
+    currency      TEXT NOT NULL,
+    amount_cents  INTEGER,
+    imputation    TEXT NOT NULL,
+    receipt       TEXT NOT NULL,
+    attachment    TEXT NOT NULL,
+    PRIMARY KEY (invoice_no, position)
+);
+-- Index couvrants : les totaux se calculent sans lire la table. Société et
+-- mois (consolidation mensuelle), catégorie puis société et période
+-- (« HOTEL-HEBERGEMENT de GIE IFEA au 3e trimestre »).
+CREATE INDEX IF NOT EXISTS ix_expenses_company
+    ON expenses (company, month, category, currency, amount_cents);
+CREATE INDEX IF NOT EXISTS ix_expenses_category
+    ON expenses (category, company, month, currency, amount_cents);
+CREATE INDEX IF NOT EXISTS ix_expenses_employee ON expenses (employee, month);
+CREATE INDEX IF NOT EXISTS ix_expenses_month    ON expenses (month);
+"""
+# Colonnes acceptées par totals(group_by=…).
+GROUP_COLUMNS = ("company", "employee", "month", "category", "imputation", "invoice_no")
+
+
+class ArchiveConflict(ValueError):
+    """Le N° de facture appartient déjà à la note d'un autre salarié."""
+
+
+def quarter(year: int, q: int) -> tuple[str, str]:
+    """Premier et dernier mois (AAAA-MM) du trimestre `q` (1 à 4)."""
+    return f"{year}-{3 * q - 2:02d}", f"{year}-{3 * q:02d}"
+
+
+def _iso_date(text: str) -> str:
+    """JJ/MM/AAAA → AAAA-MM-JJ ; toute autre saisie est gardée telle quelle."""
+    try:
+        return datetime.strptime(text, "%d/%m/%Y").date().isoformat()
+    except (TypeError, ValueError):
+        return text or ""
+
+
+def _fr_date(iso: str) -> str:
+    """AAAA-MM-JJ → JJ/MM/AAAA, comme la saisie du formulaire."""
+    try:
+        return date.fromisoformat(iso).strftime("%d/%m/%Y")
+    except (TypeError, ValueError):
+        return iso
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _line(invoice_no: str, position: int, company: str, employee: str, month: str, cur: str,
+          r: dict) -> tuple:
+    """Ligne de la table expenses d'une dépense au format ExpenseStore.records()."""
+    return (
+        invoice_no, position, company, employee, month,
+        _iso_date(r.get("Date", "")), r.get("Fournisseur", "") or "",
+        r.get("Objet", "") or "", r.get("Type", "") or "", cur,
+        as_cents(r.get(f"Montant TTC ({cur})")),
+        r.get("Imputation budgétaire", "") or "", r.get("Justificatif", "") or "",
+        r.get(ATTACHMENT_KEY, "") or "",
+    )
+
+
+class ExpenseArchive:
+    """
+    Archive partagée par toutes les sessions du processus : une connexion
+    SQLite (journal WAL) protégée par un verrou.
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            self._conn.executescript(_SCHEMA)
+            if version < 2:
+                # La version 1 gardait chaque PDF généré en BLOB (note_pdfs) ;
+                # il est désormais dans le BlobStore, la note n'en garde que
+                # l'empreinte et la taille.
+                self._conn.execute("DROP TABLE IF EXISTS note_pdfs")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ── Enregistrement ───────────────────────────────────────────────────────
+    def _write_note(self, note: dict) -> int:
+        """Remplace la note et ses lignes (dans la transaction en cours)."""
+        invoice_no = note["invoice_no"]
+        employee, company, cur = note["employee"], note["company"], note["currency"]
+        month      = note.get("month") or date.today().strftime("%Y-%m")
+        row = self._conn.execute("SELECT employee FROM notes WHERE invoice_no = ?",
+                                 (invoice_no,)).fetchone()
+        if row is not None and row["employee"] != employee:
+            raise ArchiveConflict(f"{invoice_no} : note de {row['employee']}")
+
+        lines = [_line(invoice_no, position, company, employee, month, cur, r)
+                 for position, r in enumerate(note["rows"])]
+        total = sum(line[10] or 0 for line in lines)
+        now   = _now()
+        self._conn.execute("DELETE FROM expenses WHERE invoice_no = ?", (invoice_no,))
+        self._conn.execute(
+            "INSERT INTO notes (invoice_no, employee, company, month, currency, total_cents,"
+            " row_count, attachments, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (invoice_no) DO UPDATE SET company = excluded.company,"
+            " month = excluded.month, currency = excluded.currency,"
+            " total_cents = excluded.total_cents, row_count = excluded.row_count,"
+            " attachments = excluded.attachments, status = 'brouillon',"
+            " updated_at = excluded.updated_at",
+            (invoice_no, employee, company, month, cur, total, len(lines),
+             json.dumps(note.get("attachments") or {}, ensure_ascii=False), now, now),
+        )
+        self._conn.executemany(
+            "INSERT INTO expenses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lines)
+        return len(lines)
+
+    def save_note(self, invoice_no: str, employee: str, company: str, cur: str, rows,
+                  month: str | None = None, attachments: dict | None = None) -> int:
+        """
+        Enregistre (ou remplace) la note `invoice_no` en une transaction.
+
+        `rows` : lignes au format ExpenseStore.records(cur, with_keys=True) ;
+        `attachments` : métadonnées des pièces jointes (empreinte du blob,
+        nom…) par clé, pour les retrouver à la reprise. Une note remplacée
+        redevient un brouillon. Lève ArchiveConflict si le N° de facture est
+        celui d'un autre salarié. Renvoie le nombre de lignes.
+        """
+        note = {"invoice_no": invoice_no, "employee": employee, "company": company,
+                "currency": cur, "rows": rows, "month": month, "attachments": attachments}
+        with self._lock, self._conn:
+            return self._write_note(note)
+
+    def save_changes(self, invoice_no: str, employee: str, changes: dict[int, dict],
+                     row_count: int, attachments: dict | None = None) -> bool:
+        """
+        Enregistre seulement les lignes modifiées d'une note déjà archivée :
+        `changes` donne les lignes par position (ExpenseStore.changes), les
+        positions à partir de `row_count` sont supprimées. Le coût suit le
+        nombre de modifications, non la taille de la note. La note redevient
+        un brouillon.
+
+        Returns:
+            False si la note n'est pas (ou plus) archivée : l'enregistrer
+            alors en entier avec save_note()
+
+        Raises:
+            ArchiveConflict: la note est celle d'un autre salarié
+        """
+        with self._lock, self._conn:
+            note = self._conn.execute(
+                "SELECT employee, company, month, currency FROM notes WHERE invoice_no = ?",
+                (invoice_no,)).fetchone()
+            if note is None:
+                return False
+            if note["employee"] != employee:
+                raise ArchiveConflict(f"{invoice_no} : note de {note['employee']}")
+            self._conn.execute("DELETE FROM expenses WHERE invoice_no = ? AND position >= ?",
+                               (invoice_no, row_count))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO expenses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [_line(invoice_no, position, note["company"], employee, note["month"],
+                       note["currency"], r)
+                 for position, r in changes.items() if position < row_count])
+            self._conn.execute(
+                "UPDATE notes SET row_count = ?, attachments = ?, status = 'brouillon',"
+                " updated_at = ?, total_cents = (SELECT COALESCE(SUM(amount_cents), 0)"
+                " FROM expenses WHERE invoice_no = ?) WHERE invoice_no = ?",
+                (row_count, json.dumps(attachments or {}, ensure_ascii=False), _now(),
+                 invoice_no, invoice_no))
+        return True
+
+    def save_notes(self, notes, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """
+        Import en masse : `notes` est une suite de dicts (invoice_no,
+        employee, company, currency, rows[, month, attachments]) écrits par
+        lots de `batch_size` notes, une transaction par lot. Renvoie le
+        nombre de lignes.
+        """
+        total, batch = 0, []
+        for note in notes:
+            batch.append(note)
+            if len(batch) >= batch_size:
+                total += self._write_batch(batch)
+                batch  = []
+        if batch:
+            total += self._write_batch(batch)
+        return total
+
+    def _write_batch(self, notes: list[dict]) -> int:
+        with self._lock, self._conn:
+            return sum(self._write_note(note) for note in notes)
+
+    def save_pdf(self, invoice_no: str, digest: str, size: int) -> bool:
+        """
+        Rattache le PDF généré (blob `digest` du BlobStore, `size` octets) à
+        la note, qui passe à l'état « générée ». Le blob reste conservé tant
+        que la note y renvoie (blob_digests) ; celui d'une génération
+        précédente redevient expirable.
+        """
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE notes SET status = 'générée', pdf_sha256 = ?, pdf_size = ?,"
+                " updated_at = ? WHERE invoice_no = ?",
+                (digest, size, _now(), invoice_no))
+        return bool(cur.rowcount)
+
+    def delete_note(self, invoice_no: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM notes WHERE invoice_no = ?", (invoice_no,))
+
+    # ── Lecture ──────────────────────────────────────────────────────────────
+    def note(self, invoice_no: str) -> dict | None:
+        """Métadonnées de la note (sans ses lignes), None si inconnue."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM notes WHERE invoice_no = ?",
+                                     (invoice_no,)).fetchone()
+        if row is None:
+            return None
+        note = dict(row)
+        note["attachments"] = json.loads(note["attachments"])
+        return note
+
+    def load_note(self, invoice_no: str) -> dict | None:
+        """
+        Note complète : métadonnées et "rows", au format accepté par
+        ExpenseStore.extend(rows, note["currency"]) (clé de pièce jointe comprise).
+        """
+        note = self.note(invoice_no)
+        if note is None:
+            return None
+        amt_col = f"Montant TTC ({note['currency']})"
+        with self._lock:
+            lines = self._conn.execute(
+                "SELECT * FROM expenses WHERE invoice_no = ? ORDER BY position",
+                (invoice_no,)).fetchall()
+        note["rows"] = [{
+            "Date":                  _fr_date(r["date"]),
+            "Fournisseur":           r["supplier"],
+            "Objet":                 r["object"],
+            "Type":                  r["category"],
+            amt_col:                 None if r["amount_cents"] is None else r["amount_cents"] / 100,
+            "Imputation budgétaire": r["imputation"],
+            "Justificatif":          r["receipt"],
+            ATTACHMENT_KEY:          r["attachment"],
+        } for r in lines]
+        return note
+
+    def blob_digests(self) -> set[str]:
+        """
+        Empreintes des blobs des notes archivées, pièces jointes et PDF
+        générés (blobs à ne pas expirer).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT json_extract(a.value, '$.sha256') AS digest"
+                " FROM notes, json_each(notes.attachments) AS a"
+                " UNION SELECT pdf_sha256 FROM notes").fetchall()
+        return {r["digest"] for r in rows if r["digest"]}
+
+    @staticmethod
+    def _where(company=None, employee=None, category=None, month=None, months=None):
+        clauses, params = [], []
+        for column, value in (("company", company), ("employee", employee),
+                              ("category", category), ("month", month)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if months:
+            clauses.append("month BETWEEN ? AND ?")
+            params.extend(months)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def notes(self, company: str | None = None, employee: str | None = None,
+              month: str | None = None, months: tuple[str, str] | None = None,
+              limit: int = 500) -> list[dict]:
+        """Notes filtrées, les plus récentes d'abord (sans lignes ni PDF)."""
+        where, params = self._where(company, employee, None, month, months)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT invoice_no, employee, company, month, currency, total_cents, row_count,"
+                f" status, pdf_size, updated_at FROM notes{where}"
+                " ORDER BY month DESC, employee LIMIT ?", (*params, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def totals(self, company: str | None = None, employee: str | None = None,
+               category: str | None = None, month: str | None = None,
+               months: tuple[str, str] | None = None,
+               group_by: tuple[str, ...] = ("category",)) -> list[dict]:
+        """
+        Totaux en centimes des dépenses filtrées, par `group_by` (colonnes de
+        GROUP_COLUMNS) et par devise : les montants ne sont pas convertis.
+        `months` est un intervalle inclusif (AAAA-MM, AAAA-MM), voir quarter().
+
+            archive.totals(company="GIE IFEA", category="HOTEL-HEBERGEMENT",
+                           months=quarter(2026, 3), group_by=())
+        """
+        unknown = set(group_by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Regroupement inconnu : {', '.join(sorted(unknown))}")
+        keys          = ", ".join((*group_by, "currency"))
+        where, params = self._where(company, employee, category, month, months)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {keys}, SUM(amount_cents) AS total_cents, COUNT(*) AS lines"
+                f" FROM expenses{where} GROUP BY {keys} ORDER BY {keys}", params).fetchall()
+        return [dict(r) for r in rows]
+
+    def explain(self, sql: str, params=()) -> list[str]:
+        """Plan d'exécution SQLite d'une requête (diagnostic des index)."""
+        with self._lock:
+            return [r["detail"] for r in
+                    self._conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
@@ -0,0 +1,315 @@
+"""
+Génération en lot des notes de frais de fin de mois, sans Streamlit.
+
+Le manifeste (CSV ou XLSX) contient une ligne par dépense :
+
+    Prénom ; Nom ; Société ; Devise ; Date ; Fournisseur ; Objet ; Type ;
+    Montant TTC ; Imputation budgétaire ; Justificatif
+
+`Devise` vaut € ou $ (EUR/USD acceptés), `Type` une clé ou un libellé de
+EXPENSE_CATEGORIES, `Justificatif` un chemin relatif au manifeste (vide si
+aucun). Les lignes sont regroupées par salarié et société : chaque groupe
+produit un PDF fusionné, les groupes étant répartis sur plusieurs processus.
+
+    python -m ndf.batch manifeste.xlsx -o notes/ -j 8
+"""
+
+import argparse
+import csv
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+from ndf.config import COMPANY_INFO, EXPENSE_CATEGORIES, EXPENSE_LABELS
+from ndf.excel import iter_xlsx_records, parse_amount
+from ndf.utils import build_invoice_number
+
+MANIFEST_COLUMNS = [
+    "Prénom", "Nom", "Société", "Devise", "Date", "Fournisseur", "Objet",
+    "Type", "Montant TTC", "Imputation budgétaire", "Justificatif",
+]
+_CURRENCY_ALIASES = {"€": "€", "EUR": "€", "EURO": "€", "$": "$", "USD": "$", "DOLLAR": "$"}
+_TYPE_ALIASES     = {
+    **{k.upper(): k for k in EXPENSE_CATEGORIES},
+    **{label.upper(): k for k, label in EXPENSE_LABELS.items()},
+}
+
+
+class ManifestError(ValueError):
+    """Ligne de manifeste invalide (numéro de ligne dans le message)."""
+
+
+# ─── Lecture du manifeste ─────────────────────────────────────────────────────
+def _read_csv(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as fh:
+        sample  = fh.read(4096)
+        fh.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        yield from csv.DictReader(fh, dialect=dialect)
+
+
+def _cell(raw: dict, key: str) -> str:
+    value = raw.get(key)
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d/%m/%Y")
+    return str(value).strip()
+
+
+def read_manifest(path: str) -> list[dict]:
+    """
+    Lit et valide le manifeste.
+
+    Returns:
+        une dépense par ligne : {"employee": (prénom, nom), "company", "currency",
+        "row": dict au format de ExpenseStore.records(), "attachment":
+        chemin absolu ou None}
+
+    Raises:
+        ManifestError: colonne manquante ou ligne invalide
+    """
+    reader = iter_xlsx_records if path.lower().endswith((".xlsx", ".xlsm")) else _read_csv
+    base   = os.path.dirname(os.path.abspath(path))
+    items  = []
+    for line, raw in enumerate(reader(path), start=2):
+        missing = [c for c in MANIFEST_COLUMNS if c not in raw]
+        if missing:
+            raise ManifestError(f"colonnes manquantes : {', '.join(missing)}")
+        firstname, lastname = _cell(raw, "Prénom"), _cell(raw, "Nom")
+        company  = _cell(raw, "Société")
+        currency = _CURRENCY_ALIASES.get(_cell(raw, "Devise").upper() or "€")
+        rtype    = _TYPE_ALIASES.get(_cell(raw, "Type").upper())
+        if not firstname or not lastname:
+            raise ManifestError(f"ligne {line} : prénom et nom obligatoires")
+        if company not in COMPANY_INFO:
+            raise ManifestError(f"ligne {line} : société inconnue « {company} »")
+        if currency is None:
+            raise ManifestError(f"ligne {line} : devise inconnue « {_cell(raw, 'Devise')} »")
+        if rtype is None:
+            raise ManifestError(f"ligne {line} : type inconnu « {_cell(raw, 'Type')} »")
+        try:
+            amount = parse_amount(_cell(raw, "Montant TTC"))
+            if amount is None:
+                raise ValueError
+        except ValueError:
+            raise ManifestError(
+                f"ligne {line} : montant invalide « {_cell(raw, 'Montant TTC')} »"
+            ) from None
+        attachment = _cell(raw, "Justificatif")
+        items.append({
+            "employee":   (firstname, lastname),
+            "company":    company,
+            "currency":   currency,
+            "attachment": os.path.join(base, attachment) if attachment else None,
+            "row": {
+                "Date":                      _cell(raw, "Date"),
+                "Fournisseur":               _cell(raw, "Fournisseur"),
+                "Objet":                     _cell(raw, "Objet"),
+                "Type":                      rtype,
+                f"Montant TTC ({currency})": amount,
+                "Imputation budgétaire":     _cell(raw, "Imputation budgétaire"),
+                "Justificatif":              os.path.basename(attachment),
+            },
+        })
+    return items
+
+
+def group_notes(items: list[dict]) -> list[dict]:
+    """Regroupe les dépenses en une note par (salarié, société, devise), dans l'ordre du manifeste."""
+    notes = {}
+    for item in items:
+        key = (item["employee"], item["company"], item["currency"])
+        note = notes.setdefault(key, {
+            "firstname":   item["employee"][0],
+            "lastname":    item["employee"][1],
+            "company":     item["company"],
+            "currency":    item["currency"],
+            "rows":        [],
+            "attachments": [],
+        })
+        note["rows"].append(item["row"])
+        if item["attachment"] and item["attachment"] not in note["attachments"]:
+            note["attachments"].append(item["attachment"])
+    return list(notes.values())
+
+
+# ─── Génération d'une note (exécutée dans un processus du pool) ───────────────
+def build_note(note: dict, out_path: str, target_size: int | None = None) -> dict:
+    """
+    Produit le PDF fusionné d'une note dans `out_path`, réduit au besoin
+    pour tenir dans `target_size` octets.
+
+    Returns:
+        {"path", "pages", "size", "seconds", "pdf_in", "pdf_out" (octets des
+         PDF joints avant / après optimisation), "peak_rss" (pic du processus),
+         "warnings": [(fichier, message)], "error": message ou None}. Une pièce
+        jointe illisible est un avertissement ; l'échec du récapitulatif est
+        une erreur.
+    """
+    import pandas as pd
+    from pypdf import PdfReader
+    from ndf.images import compress_image
+    from ndf.pdf import stream_full_pdf
+    from ndf.pdfopt import optimize_pdf_with_stats
+    from ndf.trace import BuildTrace, peak_rss
+
+    t0       = time.perf_counter()
+    result   = {"path": out_path, "pages": 0, "size": 0, "seconds": 0.0,
+                "pdf_in": 0, "pdf_out": 0, "peak_rss": 0, "warnings": [], "error": None}
+    uploaded = {}
+    for path in note["attachments"]:
+        name = os.path.basename(path)
+        ext  = name.lower().rsplit(".", 1)[-1]
+        try:
+            if ext == "pdf":
+                # Lu par mmap et allégé avant la fusion (voir ndf.pdfopt)
+                data, info = optimize_pdf_with_stats(path)
+                result["pdf_in"]  += info["original_size"]
+                result["pdf_out"] += info["size"]
+            else:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+        except OSError as e:
+            result["warnings"].append((name, e.strerror or str(e)))
+            continue
+        if ext in ("jpg", "jpeg", "png"):
+            data = compress_image(data, max_size_kb=500, quality=85)
+        uploaded[path] = {
+            "bytes":    data,
+            "name":     name,
+            "is_pdf":   ext == "pdf",
+            "is_image": ext in ("jpg", "jpeg", "png"),
+        }
+    name  = f"{note['firstname']} {note['lastname']}"
+    # Processus dédié au lot : chaque étape remet le pic à zéro (ndf.trace) ;
+    # celui de la préparation est relevé avant, celui des étapes dans la trace.
+    prep  = peak_rss()
+    trace = BuildTrace(reset_peak=True, user=name, rows=len(note["rows"]),
+                       attachments=len(uploaded))
+    try:
+        with stream_full_pdf(
+            pd.DataFrame(note["rows"]), name, note["company"], note["currency"],
+            uploaded, invoice_no=build_invoice_number(note["lastname"]),
+            errors=result["warnings"], target_size=target_size, trace=trace,
+        ) as pdf, open(out_path, "wb") as out:
+            shutil.copyfileobj(pdf, out)
+        result["size"]  = os.path.getsize(out_path)
+        result["pages"] = len(PdfReader(out_path).pages)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    result["seconds"]  = time.perf_counter() - t0
+    result["peak_rss"] = max([prep, peak_rss()] + [s["peak_rss"] for s in trace.spans])
+    return result
+
+
+def _output_paths(notes: list[dict], out_dir: str) -> list[str]:
+    """
+    Un fichier par note : N° de facture, complété en cas d'homonymes par le
+    prénom et la société, puis au besoin par un compteur (_2, _3…).
+    """
+    paths, seen = [], set()
+    for note in notes:
+        base = stem = build_invoice_number(note["lastname"])
+        if stem in seen:
+            extra = "".join(c for c in f"{note['firstname']}{note['company']}".upper() if c.isalnum())
+            base  = stem = f"{stem}_{extra}"
+        n = 1
+        while stem in seen:
+            n   += 1
+            stem = f"{base}_{n}"
+        seen.add(stem)
+        paths.append(os.path.join(out_dir, f"{stem}.pdf"))
+    return paths
+
+
+def _failed(path: str, error: str) -> dict:
+    return {"path": path, "pages": 0, "size": 0, "seconds": 0.0, "pdf_in": 0, "pdf_out": 0,
+            "peak_rss": 0, "warnings": [], "error": error}
+
+
+def run_batch(notes: list[dict], out_dir: str, workers: int = 1,
+              target_size: int | None = None) -> list[dict]:
+    """
+    Génère toutes les notes, en parallèle sur `workers` processus ; un résultat
+    par note. Une note dont le fichier de sortie est déjà pris par une note
+    précédente est en erreur plutôt que d'écraser celle-ci.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths   = _output_paths(notes, out_dir)
+    claimed = set()
+    todo    = []
+    for i, path in enumerate(paths):
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in claimed:
+            claimed.add(key)
+            todo.append(i)
+    results = [_failed(p, f"fichier de sortie déjà utilisé : {os.path.basename(p)}")
+               for p in paths]
+    if workers <= 1:
+        for i in todo:
+            results[i] = build_note(notes[i], paths[i], target_size)
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {i: pool.submit(build_note, notes[i], paths[i], target_size) for i in todo}
+        for i, future in futures.items():
+            try:
+                results[i] = future.result()
+            except Exception as e:   # processus mort, résultat non transmissible…
+                results[i] = _failed(paths[i], str(e) or type(e).__name__)
+    return results
+
+
+# ─── Ligne de commande ────────────────────────────────────────────────────────
+def _print_summary(notes: list[dict], results: list[dict], elapsed: float) -> None:
+    print(f"{'salarié':<28}{'société':<24}{'lignes':>7}{'pages':>7}{'Ko':>8}{'s':>7}  statut")
+    for note, res in zip(notes, results):
+        who    = f"{note['firstname']} {note['lastname']}"
+        status = "ERREUR" if res["error"] else f"{len(res['warnings'])} avert." if res["warnings"] else "ok"
+        print(f"{who[:27]:<28}{note['company'][:23]:<24}{len(note['rows']):>7}"
+              f"{res['pages']:>7}{res['size'] // 1024:>8}{res['seconds']:>7.1f}  {status}")
+    failed = [(n, r) for n, r in zip(notes, results) if r["error"]]
+    warned = [(n, r) for n, r in zip(notes, results) if r["warnings"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} notes générées en {elapsed:.1f} s "
+          f"(cumul {sum(r['seconds'] for r in results):.1f} s)")
+    pdf_in, pdf_out = sum(r["pdf_in"] for r in results), sum(r["pdf_out"] for r in results)
+    if pdf_in:
+        print(f"PDF joints : {pdf_in / 2**20:.1f} Mo → {pdf_out / 2**20:.1f} Mo, "
+              f"pic mémoire {max(r['peak_rss'] for r in results) / 2**20:.0f} Mo")
+    for note, res in failed:
+        print(f"  ✗ {note['firstname']} {note['lastname']} : {res['error']}")
+    for note, res in warned:
+        for fname, msg in res["warnings"]:
+            print(f"  ⚠ {note['firstname']} {note['lastname']} — {fname} : {msg}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m ndf.batch",
+        description="Génère une note de frais PDF par salarié à partir d'un manifeste CSV/XLSX.",
+    )
+    parser.add_argument("manifest", help="fichier .csv ou .xlsx")
+    parser.add_argument("-o", "--output", default="notes", help="répertoire de sortie")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                        help="processus en parallèle (défaut : nombre de CPU)")
+    parser.add_argument("--max-mb", type=int, default=0,
+                        help="taille maximale de chaque PDF en Mo, justificatifs réduits "
+                             "au besoin (défaut : 0, sans limite)")
+    args = parser.parse_args(argv)
+
+    try:
+        notes = group_notes(read_manifest(args.manifest))
+    except (OSError, ManifestError) as e:
+        print(f"Manifeste invalide : {e}", file=sys.stderr)
+        return 2
+    t0      = time.perf_counter()
+    results = run_batch(notes, args.output, args.workers, args.max_mb * 1024 * 1024 or None)
+    _print_summary(notes, results, time.perf_counter() - t0)
+    return 1 if any(r["error"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Stockage disque des pièces jointes, adressé par contenu (SHA-256).
+
+Chaque contenu est écrit une seule fois sous <racine>/<2 premiers hex>/<sha256>,
+quel que soit le nombre de sessions qui l'importent : la session ne garde que
+l'empreinte et les métadonnées. La date de modification d'un blob sert de date
+de dernier usage ; un ménage périodique supprime les blobs inutilisés depuis
+plus de `ttl_seconds`, puis les plus anciens tant que `max_bytes` est dépassé.
+Les blobs encore référencés ailleurs (pièces jointes des notes archivées,
+voir `keep`) ne sont jamais supprimés.
+"""
+
+import contextlib
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+BLOB_DIR       = os.environ.get("NDF_BLOB_DIR") or os.path.join(tempfile.gettempdir(), "ndf-blobs")
+BLOB_TTL       = float(os.environ.get("NDF_BLOB_TTL_HOURS", "24")) * 3600
+BLOB_MAX_BYTES = int(os.environ.get("NDF_BLOB_MAX_MB", "2048")) * 1024 * 1024
+SWEEP_INTERVAL = 600   # secondes minimum entre deux ménages déclenchés par put()
+
+
+class BlobStore:
+    """
+    Magasin de blobs partagé par toutes les sessions du processus.
+
+    `keep` renvoie les empreintes à conserver quel que soit leur âge
+    (ExpenseArchive.blob_digests) ; il est appelé à chaque ménage.
+    """
+
+    def __init__(self, root: str = BLOB_DIR, ttl_seconds: float = BLOB_TTL,
+                 max_bytes: int = BLOB_MAX_BYTES, keep=None):
+        self.root        = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes   = max_bytes
+        self.keep        = keep
+        self._lock       = threading.Lock()
+        self._last_sweep = 0.0
+        self._derived    = {}   # (empreinte source, transformation) -> empreinte
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data: bytes) -> str:
+        """Enregistre `data` (si absent) et renvoie son empreinte SHA-256."""
+        digest = hashlib.sha256(data).hexdigest()
+        path   = self.path(digest)
+        if os.path.exists(path):
+            self.touch(digest)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Écriture atomique : un lecteur ne voit jamais un blob partiel.
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp)
+                raise
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+        return digest
+
+    def put_file(self, fh, chunk_size: int = 1 << 20) -> str:
+        """
+        Enregistre le contenu du fichier binaire `fh` (lu depuis sa position
+        courante, par blocs : le fichier n'est jamais entier en mémoire) et
+        renvoie son empreinte SHA-256. `fh` n'est pas refermé.
+        """
+        # Empreinte inconnue avant la fin : écriture dans un répertoire
+        # d'attente, balayé par sweep() comme les autres.
+        staging = os.path.join(self.root, "tmp")
+        os.makedirs(staging, exist_ok=True)
+        sha     = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=staging, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while chunk := fh.read(chunk_size):
+                    sha.update(chunk)
+                    out.write(chunk)
+            digest = sha.hexdigest()
+            path   = self.path(digest)
+            if os.path.exists(path):
+                os.remove(tmp)
+                self.touch(digest)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+        if time.time() - self._last_sweep > SWEEP_INTERVAL:
+            self.sweep()
+        return digest
+
+    def put_derived(self, data: bytes, transform, name: str,
+                    source_digest: str | None = None) -> str:
+        """
+        Enregistre `transform(data)` et renvoie son empreinte.
+
+        La transformation (compression d'une photo…) n'est calculée qu'une
+        fois par contenu source et par `name`, pour toutes les sessions :
+        un fichier déjà importé est reconnu à son empreinte (`source_digest`
+        si l'appelant l'a déjà calculée).
+        """
+        source_digest = source_digest or hashlib.sha256(data).hexdigest()
+        digest        = self.derived(source_digest, name)
+        if digest is None:
+            digest = self.put_result(source_digest, name, transform(data))
+        return digest
+
+    def derived(self, source_digest: str, name: str) -> str | None:
+        """Empreinte du résultat déjà enregistré de la transformation `name`, sinon None."""
+        digest = self._derived.get((source_digest, name))
+        if digest is not None and self.exists(digest):
+            self.touch(digest)
+            return digest
+        return None
+
+    def put_result(self, source_digest: str, name: str, result: bytes) -> str:
+        """
+        Enregistre le résultat d'une transformation calculée ailleurs (dans un
+        processus du pool…), comme l'aurait fait put_derived.
+        """
+        digest = self.put(result)
+        self._derived[source_digest, name] = digest
+        return digest
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def touch(self, digest: str) -> None:
+        """Marque le blob comme utilisé maintenant (repousse son expiration)."""
+        with contextlib.suppress(OSError):
+            os.utime(self.path(digest))
+
+    @contextlib.contextmanager
+    def open(self, digest: str):
+        """
+        Blob projeté en mémoire (mmap, lecture seule) : les pages du fichier
+        sont chargées par le noyau à la demande et partagées entre lecteurs.
+
+        Raises:
+            FileNotFoundError: blob absent ou expiré
+        """
+        with open(self.path(digest), "rb") as fh:
+            self.touch(digest)
+            if os.fstat(fh.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def read(self, digest: str) -> bytes:
+        with open(self.path(digest), "rb") as fh:
+            self.touch(digest)
+            return fh.read()
+
+    def sweep(self, now: float | None = None) -> dict:
+        """
+        Supprime les blobs expirés, puis les moins récemment utilisés jusqu'à
+        repasser sous `max_bytes`, sauf ceux que `keep` désigne (comptés
+        dans "remaining", mais jamais supprimés).
+
+        Returns:
+            {"removed": nombre de blobs supprimés, "freed": octets libérés,
+             "remaining": octets restants}
+        """
+        now  = time.time() if now is None else now
+        keep = self.keep() if self.keep is not None else set()
+        with self._lock:
+            self._last_sweep = now
+            blobs, kept = [], 0
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    with contextlib.suppress(OSError):
+                        st = entry.stat()
+                        # Fichiers .tmp abandonnés par une écriture interrompue.
+                        if entry.name.endswith(".tmp") and now - st.st_mtime < 3600:
+                            continue
+                        if entry.name in keep:
+                            kept += st.st_size
+                            continue
+                        blobs.append((st.st_mtime, st.st_size, entry.path))
+            blobs.sort()
+            total   = kept + sum(size for _, size, _ in blobs)
+            removed = freed = 0
+            for mtime, size, path in blobs:
+                if now - mtime <= self.ttl_seconds and total <= self.max_bytes:
+                    break
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+                    removed += 1
+                    freed   += size
+                    total   -= size
+            if removed:
+                self._derived = {m: d for m, d in self._derived.items()
+                                 if os.path.exists(self.path(d))}
+            return {"removed": removed, "freed": freed, "remaining": total}
@@ -0,0 +1,177 @@
+"""
+Cache des pièces jointes converties et des récapitulatifs rendus, partagé
+par toutes les sessions.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from pypdf import PdfReader
+
+# Budget du cache des pièces jointes converties (partagé par toutes les sessions).
+PAGE_CACHE_MAX_BYTES      = int(os.environ.get("NDF_PAGE_CACHE_MB", "64")) * 1024 * 1024
+PAGE_CACHE_DIR            = os.environ.get("NDF_PAGE_CACHE_DIR") or None
+PAGE_CACHE_MAX_DISK_BYTES = int(os.environ.get("NDF_PAGE_CACHE_DISK_MB", "512")) * 1024 * 1024
+
+
+class PageCache:
+    """
+    Cache LRU des pièces jointes prêtes à fusionner, indexé par SHA-256.
+
+    Chaque entrée garde le PDF d'une pièce jointe (image déjà convertie en
+    page A4, ou PDF d'origine) avec son PdfReader déjà analysé. Les entrées
+    les moins récemment utilisées sont déplacées vers un répertoire disque
+    optionnel quand `max_memory_bytes` est dépassé, puis supprimées quand
+    `max_disk_bytes` l'est aussi.
+
+    Les PdfReader étant liés à leur flux, la copie des pages vers un
+    PDF fusionné se fait sous verrou : le cache est partagé entre sessions.
+    """
+
+    def __init__(self, max_memory_bytes: int, disk_dir: str | None = None,
+                 max_disk_bytes: int = 0):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes   = max_disk_bytes if disk_dir else 0
+        self.disk_dir         = disk_dir
+        self._mem   = OrderedDict()   # clé -> (PdfReader, taille)
+        self._disk  = OrderedDict()   # clé -> taille
+        self._lock  = threading.RLock()
+        self.memory_bytes = 0
+        self.disk_bytes   = 0
+        self.hits         = 0
+        self.disk_hits    = 0
+        self.misses       = 0
+        self.evictions    = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            entries = sorted(os.scandir(disk_dir), key=lambda e: e.stat().st_mtime)
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".pdf"):
+                    size = entry.stat().st_size
+                    self._disk[entry.name[:-4]] = size
+                    self.disk_bytes += size
+            self._trim()
+
+    @staticmethod
+    def key(data: bytes, kind: str, digest: str | None = None) -> str:
+        """
+        Clé de cache : type de conversion + SHA-256 du contenu brut.
+
+        `digest` évite de rehacher un contenu dont l'empreinte est déjà connue
+        (pièce jointe du magasin de blobs) ; `data` est alors ignoré.
+        """
+        return f"{kind}-{digest or hashlib.sha256(data).hexdigest()}"
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pdf")
+
+    def _lookup(self, key: str):
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return self._mem[key][0]
+        if key in self._disk:
+            try:
+                with open(self._disk_path(key), "rb") as fh:
+                    pdf_bytes = fh.read()
+            except OSError:
+                self.disk_bytes -= self._disk.pop(key)
+                return None
+            self.disk_hits += 1
+            return self._store(key, pdf_bytes)
+        return None
+
+    def _store(self, key: str, pdf_bytes: bytes):
+        if key in self._disk:
+            self.disk_bytes -= self._disk.pop(key)
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+        reader = PdfReader(io.BytesIO(pdf_bytes))
+        if len(pdf_bytes) <= self.max_memory_bytes:
+            self._mem[key] = (reader, len(pdf_bytes))
+            self.memory_bytes += len(pdf_bytes)
+        else:
+            self._spill(key, pdf_bytes)
+        self._trim()
+        return reader
+
+    def _spill(self, key: str, pdf_bytes: bytes) -> None:
+        if len(pdf_bytes) > self.max_disk_bytes:
+            self.evictions += 1
+            return
+        try:
+            with open(self._disk_path(key), "wb") as fh:
+                fh.write(pdf_bytes)
+        except OSError:
+            self.evictions += 1
+            return
+        self._disk[key] = len(pdf_bytes)
+        self.disk_bytes += len(pdf_bytes)
+
+    def _trim(self) -> None:
+        while self.memory_bytes > self.max_memory_bytes and self._mem:
+            key, (reader, size) = self._mem.popitem(last=False)
+            self.memory_bytes -= size
+            self._spill(key, reader.stream.getvalue())
+        while self.disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self.disk_bytes -= size
+            self.evictions  += 1
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def append_pages(self, key: str, writer) -> bool:
+        """Ajoute au writer les pages en cache ; False si la clé est absente."""
+        with self._lock:
+            reader = self._lookup(key)
+            if reader is None:
+                return False
+            for page in reader.pages:
+                writer.add_page(page)
+            return True
+
+    def put(self, key: str, pdf_bytes: bytes, writer=None) -> None:
+        """Enregistre le PDF converti d'une pièce jointe (et l'ajoute au writer)."""
+        with self._lock:
+            if key in self._mem:
+                reader = self._mem[key][0]
+            else:
+                self.misses += 1
+                reader = self._store(key, pdf_bytes)
+            if writer is not None:
+                for page in reader.pages:
+                    writer.add_page(page)
+
+    def size(self, key: str) -> int | None:
+        """Taille (octets) du PDF en cache sous `key`, None s'il est absent."""
+        with self._lock:
+            if key in self._mem:
+                return self._mem[key][1]
+            return self._disk.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._mem or key in self._disk
+
+    def stats(self) -> dict:
+        """Compteurs pour dimensionner le budget du cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits":         self.hits,
+                "disk_hits":    self.disk_hits,
+                "misses":       self.misses,
+                "hit_rate":     (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions":    self.evictions,
+                "entries":      len(self._mem),
+                "memory_bytes": self.memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes":   self.disk_bytes,
+            }
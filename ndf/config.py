@@ -0,0 +1,80 @@
+"""
+Données de référence : sociétés, catégories de dépenses, devises et mois.
+"""
+
+import os
+
+# ─── Données sociétés ─────────────────────────────────────────────────────────
+COMPANY_INFO = {
+    "IFEA SAS": {
+        "address":  "28 rue Petit – 92110 Clichy",
+        "logo":     "ifea",
+    },
+    "IFEA Bois Colombes": {
+        "address":  "Bois-Colombes",
+        "logo":     "ifea",
+    },
+    "Ecole Secondaire Suger": {
+        "address":  "8 rue Yves du Manoir – 92420 Vaucresson",
+        "logo":     "suger",
+    },
+    "MindEd Tech": {
+        "address":  "",
+        "logo":     None,
+    },
+    "GIE IFEA": {
+        "address":  "28 rue Petit – 92110 Clichy",
+        "logo":     "ifea",
+    },
+    "Association LISA": {
+        "address":  "28 rue Petit – 92110 Clichy",
+        "logo":     None,
+    },
+}
+
+COMPANIES          = list(COMPANY_INFO.keys())
+EXPENSE_CATEGORIES = [
+    "DIVERS",
+    "RECEPTION-INVITATIONS-REPAS",
+    "HOTEL-HEBERGEMENT",
+    "TRANSPORT - CARBURANT",
+    "TELEPHONE",
+    "AFFRANCHISSEMENT",
+]
+EXPENSE_LABELS = {
+    "DIVERS":                      "DIVERS",
+    "RECEPTION-INVITATIONS-REPAS": "RECEPTION-INVITATIONS-REPAS",
+    "HOTEL-HEBERGEMENT":           "HÔTEL-HEBERGEMENT",
+    "TRANSPORT - CARBURANT":       "TRANSPORT - CARBURANT",
+    "TELEPHONE":                   "TÉLÉPHONE",
+    "AFFRANCHISSEMENT":            "AFFRANCHISSEMENT",
+}
+CURRENCIES = {"€ (Euro)": "€", "$ (Dollar)": "$"}
+# Colonne technique (masquée dans le tableau) : clé de la pièce jointe de la
+# ligne dans st.session_state.uploaded_files_data.
+ATTACHMENT_KEY = "_pj"
+# Taille maximale proposée pour le PDF fusionné : limite de la passerelle mail.
+PDF_TARGET_MB  = int(os.environ.get("NDF_PDF_TARGET_MB", "10"))
+# Panneau de diagnostic (mesures par étape, profil cProfile) : exploitation seulement.
+ADMIN_MODE     = os.environ.get("NDF_ADMIN", "") == "1"
+# Consolidation mensuelle par société (toutes les notes archivées) : comptabilité seulement.
+ACCOUNTING_MODE = os.environ.get("NDF_ACCOUNTING", "") == "1"
+# Journal « ndf » (étapes des générations, file) : "stderr", un chemin de fichier, ou "0".
+TRACE_LOG       = os.environ.get("NDF_TRACE", "stderr")
+MONTHS_FR  = [
+    "Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
+    "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre",
+]
+
+
+# ─── ReportLab ────────────────────────────────────────────────────────────────
+def configure_reportlab() -> None:
+    """
+    Réglages globaux de ReportLab pour le processus, appliqués par le moteur
+    lui-même au début de chaque rendu (render_image_pdf, _render_expense_pdf,
+    write_consolidation_pdf) : tout appelant, processus de conversion compris,
+    obtient les mêmes PDF. Les PDF produits sont binaires : l'encodage ASCII85
+    des flux, actif par défaut, ne ferait qu'alourdir chaque image de 25 %.
+    """
+    from reportlab import rl_config
+    rl_config.useA85 = 0
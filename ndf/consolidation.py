@@ -0,0 +1,222 @@
+"""
+Consolidation comptable du mois d'une société, toutes notes confondues.
+
+Les montants sont agrégés par l'archive (ndf.archive, une requête GROUP BY
+servie par les index) au niveau salarié × imputation budgétaire ×
+catégorie ; seul ce résultat, dont la taille ne dépend pas du nombre de
+lignes, passe en mémoire. Le tableau croisé est ensuite calculé par pandas
+(groupby / unstack, en centimes entiers) puis écrit en XLSX (openpyxl en
+mode `write_only`) et en un PDF récapitulatif compact.
+
+    python -m ndf.consolidation "GIE IFEA" 2026-10 -o compta/
+"""
+
+import argparse
+import io
+import os
+import sys
+
+import pandas as pd
+
+from ndf.config import COMPANY_INFO, EXPENSE_CATEGORIES, MONTHS_FR, configure_reportlab
+from ndf.excel import category_header, styled_cell
+
+_KEYS = ["employee", "imputation", "currency"]
+
+
+def month_label(month: str) -> str:
+    """AAAA-MM → « Octobre 2026 »."""
+    year, m = month.split("-")
+    return f"{MONTHS_FR[int(m) - 1]} {year}"
+
+
+# ─── Agrégation ───────────────────────────────────────────────────────────────
+def month_totals(archive, company: str, month: str) -> pd.DataFrame:
+    """Totaux (centimes) du mois par salarié, imputation, catégorie et devise."""
+    rows = archive.totals(company=company, month=month,
+                          group_by=("employee", "imputation", "category"))
+    return pd.DataFrame.from_records(
+        rows, columns=["employee", "imputation", "category", "currency", "total_cents", "lines"])
+
+
+def pivot(totals: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tableau croisé : une ligne par (salarié, imputation, devise), une colonne
+    de centimes par catégorie de EXPENSE_CATEGORIES et une colonne TOTAL.
+
+    `totals` peut aussi contenir des lignes de dépenses brutes (plusieurs
+    lignes par clé, colonne total_cents) : elles sont sommées.
+    """
+    table = (totals.groupby(_KEYS + ["category"], sort=True)["total_cents"].sum()
+                   .unstack("category", fill_value=0)
+                   .reindex(columns=EXPENSE_CATEGORIES, fill_value=0)
+                   .astype("int64"))
+    table.columns.name = None
+    table["TOTAL"] = table.sum(axis=1)
+    return table
+
+
+def subtotals(table: pd.DataFrame, level: str) -> pd.DataFrame:
+    """Tableau croisé ramené à un niveau ("employee" ou "imputation") et à la devise."""
+    return table.groupby(level=[level, "currency"], sort=True).sum()
+
+
+def currency_totals(table: pd.DataFrame) -> pd.DataFrame:
+    """Ligne TOTAUX par devise (les montants ne sont pas convertis)."""
+    return table.groupby(level="currency", sort=True).sum()
+
+
+# ─── Export XLSX ──────────────────────────────────────────────────────────────
+def write_consolidation_xlsx(table: pd.DataFrame, notes: list[dict], company: str,
+                             month: str, out) -> None:
+    """
+    Classeur de consolidation dans `out` (chemin ou fichier binaire) :
+    « Consolidation » (salarié × imputation), « Par imputation » et
+    « Notes » (une ligne par note archivée du mois).
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    bold = Font(bold=True)
+    wb   = Workbook(write_only=True)
+
+    def amounts_sheet(title: str, frame: pd.DataFrame, keys: list[str]) -> None:
+        ws = wb.create_sheet(title)
+        for i, width in enumerate([28] * (len(keys) - 1) + [8] + [16] * 7):
+            ws.column_dimensions[chr(ord("A") + i)].width = width
+        ws.freeze_panes = "A3"
+        ws.append([styled_cell(ws, f"{company} — {month_label(month)}", font=bold)])
+        ws.append([styled_cell(ws, k, font=bold) for k in keys]
+                  + [styled_cell(ws, category_header(c, "TTC"), font=bold) for c in EXPENSE_CATEGORIES]
+                  + [styled_cell(ws, "TOTAL (TTC)", font=bold)])
+        euros = (frame.to_numpy("int64") / 100).tolist()
+        for index, values in zip(frame.index, euros):
+            ws.append(list(index) + [styled_cell(ws, v) for v in values])
+        totals = currency_totals(frame)
+        for cur, values in zip(totals.index, (totals.to_numpy("int64") / 100).tolist()):
+            ws.append([styled_cell(ws, "TOTAUX", font=bold)] + [None] * (len(keys) - 2) + [cur]
+                      + [styled_cell(ws, v, font=bold) for v in values])
+
+    amounts_sheet("Consolidation", table, ["Salarié", "Imputation budgétaire", "Devise"])
+    amounts_sheet("Par imputation", subtotals(table, "imputation"),
+                  ["Imputation budgétaire", "Devise"])
+
+    ws = wb.create_sheet("Notes")
+    for letter, width in zip("ABCDEFG", [20, 28, 8, 16, 8, 12, 20]):
+        ws.column_dimensions[letter].width = width
+    ws.append([styled_cell(ws, h, font=bold) for h in
+               ("N° de facture", "Salarié", "Lignes", "Total TTC", "Devise", "Statut",
+                "Mise à jour")])
+    for n in notes:
+        ws.append([n["invoice_no"], n["employee"], n["row_count"],
+                   styled_cell(ws, n["total_cents"] / 100), n["currency"], n["status"],
+                   n["updated_at"]])
+    wb.save(out)
+
+
+# ─── PDF récapitulatif ────────────────────────────────────────────────────────
+def write_consolidation_pdf(table: pd.DataFrame, notes: list[dict], company: str,
+                            month: str, out) -> None:
+    """
+    Récapitulatif paysage : en-tête de la société, totaux par salarié puis
+    par imputation budgétaire (une colonne par catégorie), TOTAUX par devise.
+    Cellules en chaînes simples : pas de Paragraph par montant.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    from ndf.logos import get_logo
+    from ndf.money import format_cents
+    from ndf.pdf import STYLES, TABLE_CATEGORIES, TABLE_HEADERS, paragraph, table_style
+    from ndf.utils import PDF_NBSP
+
+    configure_reportlab()
+    widths  = [80 * mm] + [26 * mm] * len(TABLE_CATEGORIES) + [28 * mm]
+    columns = TABLE_CATEGORIES + ["TOTAL"]
+
+    def amounts_table(label: str, frame: pd.DataFrame) -> Table:
+        header = [paragraph(h, STYLES.header) for h in [label, *TABLE_HEADERS[4:], "TOTAL"]]
+        text   = {c: format_cents(frame[c], blank_zero=c != "TOTAL", sep=PDF_NBSP).tolist()
+                  for c in columns}
+        multi  = frame.index.get_level_values("currency").nunique() > 1
+        names  = [f"{k} ({cur})" if multi else k or "—" for k, cur in frame.index]
+        rows   = [header] + [[name] + [text[c][i] for c in columns]
+                             for i, name in enumerate(names)]
+        totals = currency_totals(frame)
+        for i, cur in enumerate(totals.index):
+            rows.append([f"TOTAUX ({cur})"] + format_cents(totals[columns].iloc[i],
+                                                          sep=PDF_NBSP).tolist())
+        tbl = Table(rows, colWidths=widths, repeatRows=1)
+        tbl.setStyle(table_style(report=False))
+        return tbl
+
+    info  = COMPANY_INFO.get(company, {})
+    logo  = get_logo(info.get("logo"))
+    story = []
+    if logo:
+        from reportlab.platypus import Image as RLImage
+        story.append(RLImage(io.BytesIO(logo["bytes"]), width=logo["width"],
+                             height=logo["height"], hAlign="LEFT"))
+    story += [
+        paragraph("CONSOLIDATION DES NOTES DE FRAIS", STYLES.title),
+        paragraph(f"<b>{company}</b> — {month_label(month)}", STYLES.normal),
+        paragraph(f"{len(notes)} note(s), "
+                  f"{table.index.get_level_values('employee').nunique()} salarié(s) ; "
+                  f"{sum(n['status'] != 'générée' for n in notes)} brouillon(s) non générés",
+                  STYLES.small),
+        Spacer(1, 4 * mm),
+        amounts_table("Salarié", subtotals(table, "employee")),
+        Spacer(1, 6 * mm),
+        Paragraph("<b>Par imputation budgétaire</b>", STYLES.normal),
+        Spacer(1, 2 * mm),
+        amounts_table("Imputation budgétaire", subtotals(table, "imputation")),
+    ]
+    doc = SimpleDocTemplate(out, pagesize=landscape(A4), leftMargin=10 * mm, rightMargin=10 * mm,
+                            topMargin=10 * mm, bottomMargin=10 * mm,
+                            title=f"Consolidation {company} {month}")
+    doc.build(story)
+
+
+# ─── Ligne de commande ────────────────────────────────────────────────────────
+def consolidate(archive, company: str, month: str, output: str) -> dict:
+    """Écrit <société>_<mois>.xlsx et .pdf dans `output` ; renvoie les chemins et chiffres."""
+    table = pivot(month_totals(archive, company, month))
+    notes = archive.notes(company=company, month=month, limit=100_000)
+    os.makedirs(output, exist_ok=True)
+    stem  = os.path.join(output, f"{''.join(c if c.isalnum() else '_' for c in company)}_{month}")
+    write_consolidation_xlsx(table, notes, company, month, stem + ".xlsx")
+    write_consolidation_pdf(table, notes, company, month, stem + ".pdf")
+    return {"xlsx": stem + ".xlsx", "pdf": stem + ".pdf", "notes": len(notes),
+            "totals": currency_totals(table)["TOTAL"].to_dict()}
+
+
+def main(argv=None) -> int:
+    from ndf.archive import ARCHIVE_PATH, ExpenseArchive
+    from ndf.utils import fmt_cents
+
+    parser = argparse.ArgumentParser(
+        prog="python -m ndf.consolidation",
+        description="Consolide les notes archivées d'une société pour un mois (XLSX + PDF).",
+    )
+    parser.add_argument("company", choices=list(COMPANY_INFO))
+    parser.add_argument("month", help="mois au format AAAA-MM")
+    parser.add_argument("-o", "--output", default="consolidation", help="répertoire de sortie")
+    parser.add_argument("--db", default=ARCHIVE_PATH, help="archive SQLite (défaut : NDF_ARCHIVE_DB)")
+    args = parser.parse_args(argv)
+
+    archive = ExpenseArchive(args.db)
+    try:
+        result = consolidate(archive, args.company, args.month, args.output)
+    finally:
+        archive.close()
+    if not result["notes"]:
+        print(f"Aucune note archivée pour {args.company} en {args.month}.", file=sys.stderr)
+        return 1
+    totals = ", ".join(f"{fmt_cents(v)} {cur}" for cur, v in result["totals"].items())
+    print(f"{result['notes']} note(s) — total {totals}\n  {result['xlsx']}\n  {result['pdf']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Import et export Excel du tableau des dépenses.
+
+Lecture en mode `read_only` et écriture en mode `write_only` d'openpyxl :
+les lignes sont traitées une par une, la mémoire ne dépend pas du nombre
+de lignes.
+"""
+
+from datetime import date, datetime
+
+from ndf.config import EXPENSE_CATEGORIES, EXPENSE_LABELS
+from ndf.money import as_cents
+
+TEXT_COLUMNS  = ["Date", "Fournisseur", "Objet", "Imputation budgétaire", "Justificatif"]
+_TYPE_ALIASES = {
+    **{k.upper(): k for k in EXPENSE_CATEGORIES},
+    **{label.upper(): k for k, label in EXPENSE_LABELS.items()},
+}
+_AMOUNT_FORMAT = "#,##0.00"
+# En-têtes de montant suivis de « (devise) », en majuscules.
+_AMOUNT_HEADERS = {"MONTANT TTC", "TOTAL", *(label.upper() for label in EXPENSE_LABELS.values())}
+
+
+def category_header(cat: str, cur: str) -> str:
+    """En-tête de la colonne d'une catégorie dans l'export."""
+    return f"{EXPENSE_LABELS[cat]} ({cur})"
+
+
+def iter_xlsx_records(source):
+    """
+    Lignes de la première feuille sous forme de dict {en-tête: valeur}.
+
+    `source` est un chemin ou un fichier binaire. Les lignes entièrement
+    vides sont ignorées.
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows   = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else "" for h in next(rows, ())]
+        for values in rows:
+            if any(v not in (None, "") for v in values):
+                yield dict(zip(header, values))
+    finally:
+        wb.close()
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d/%m/%Y")
+    return str(value).strip()
+
+
+def parse_amount(value) -> float | None:
+    """Montant d'une cellule : nombre, "1 234,56" ou "1234.56" ; None si vide."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    clean = str(value).replace(" ", "").replace("\xa0", "").replace("\u202f", "")
+    return float(clean.replace(",", "."))
+
+
+def _row_type(raw: dict) -> str:
+    """Catégorie de la colonne "Type" (clé ou libellé) ; ValueError si inconnue."""
+    rtype = _TYPE_ALIASES.get(_text(raw.get("Type")).upper())
+    if rtype is None:
+        raise ValueError(f"type inconnu « {_text(raw.get('Type'))} »")
+    return rtype
+
+
+def _header_currency(header: str) -> str | None:
+    """Devise d'un en-tête de montant (« Montant TTC ($) », « DIVERS (€) »…), sinon None."""
+    name, sep, rest = header.rpartition(" (")
+    if not sep or not rest.endswith(")"):
+        return None
+    if name.upper() in _AMOUNT_HEADERS:
+        return rest[:-1].strip()
+    return None
+
+
+# ─── Import ───────────────────────────────────────────────────────────────────
+def read_expenses_xlsx(source, cur: str) -> tuple[list[dict], list[str]]:
+    """
+    Lit un tableau de dépenses, en lignes au format de ExpenseStore.records().
+
+    Deux dispositions sont acceptées :
+      - une colonne "Type" et une colonne "Montant TTC" (ou "Montant TTC (€)") ;
+        un montant vide est gardé vide (None) : la ligne est un brouillon à
+        compléter (ExpenseStore.incomplete) ;
+      - une colonne par catégorie, comme produit par write_expenses_xlsx ;
+        une ligne sans montant mais avec un "Type" est un brouillon.
+
+    Un en-tête de montant dans une autre devise que `cur` (« Montant TTC ($) »
+    pour une note en €) rejette tout le fichier : aucune ligne, un message.
+
+    Returns:
+        (lignes valides, messages d'erreur des lignes rejetées)
+    """
+    amt_col   = f"Montant TTC ({cur})"
+    rows, errors = [], []
+    cat_cols  = None
+    for line, raw in enumerate(iter_xlsx_records(source), start=2):
+        if cat_cols is None:
+            other = [h for h in raw if _header_currency(h) not in (None, cur)]
+            if other:
+                return [], [f"colonne « {other[0]} » dans une autre devise que la note ({cur}) : "
+                            f"fichier non importé"]
+            cat_cols = {
+                h: k for h in raw for k in EXPENSE_CATEGORIES
+                if h.upper().startswith(EXPENSE_LABELS[k].upper() + " (")
+            }
+        if _text(raw.get("Date")).upper() == "TOTAUX":
+            continue
+        base = {c: _text(raw.get(c)) for c in TEXT_COLUMNS}
+        try:
+            if cat_cols:
+                amounts = [(k, parse_amount(raw.get(h))) for h, k in cat_cols.items()]
+                amounts = [(k, v) for k, v in amounts if v]
+                if not amounts and _text(raw.get("Type")):
+                    amounts = [(_row_type(raw), None)]      # brouillon exporté
+                if not amounts:
+                    raise ValueError("aucun montant")
+            elif "Type" in raw:
+                value = raw.get(amt_col, raw.get("Montant TTC"))
+                amounts = [(_row_type(raw), parse_amount(value))]
+            else:
+                raise ValueError("colonnes Type / Montant TTC absentes")
+        except ValueError as e:
+            errors.append(f"ligne {line} : {e}")
+            continue
+        for rtype, value in amounts:
+            rows.append({
+                "Date":                  base["Date"],
+                "Fournisseur":           base["Fournisseur"],
+                "Objet":                 base["Objet"],
+                "Type":                  rtype,
+                amt_col:                 value,
+                "Imputation budgétaire": base["Imputation budgétaire"],
+                "Justificatif":          base["Justificatif"],
+            })
+    return rows, errors
+
+
+# ─── Export ───────────────────────────────────────────────────────────────────
+def write_expenses_xlsx(rows, cur: str, out) -> None:
+    """
+    Écrit le tableau dans `out` (chemin ou fichier binaire) : une colonne par
+    catégorie de EXPENSE_CATEGORIES, un total par ligne et une ligne TOTAUX.
+    Les totaux sont cumulés en centimes entiers (ndf.money) ; un montant
+    vide reste une cellule vide et la colonne "Type" garde la catégorie du
+    brouillon pour le réimport.
+    """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    amt_col = f"Montant TTC ({cur})"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Note de frais")
+    for letter, width in zip("ABCDEFGHIJKLM", [12, 24, 32, 18] + [16] * 7 + [24, 24]):
+        ws.column_dimensions[letter].width = width
+    ws.freeze_panes = "A2"
+
+    bold   = Font(bold=True)
+    header = (["Date", "Fournisseur", "Objet", "Imputation budgétaire"]
+              + [category_header(c, cur) for c in EXPENSE_CATEGORIES]
+              + [f"TOTAL ({cur})", "Justificatif", "Type"])
+    ws.append([styled_cell(ws, h, font=bold) for h in header])
+
+    totals = dict.fromkeys(EXPENSE_CATEGORIES, 0)
+    for row in rows:
+        rtype = row.get("Type")
+        cents = as_cents(row.get(amt_col))
+        cells = [None] * len(EXPENSE_CATEGORIES)
+        total = None
+        if rtype in totals and cents is not None:
+            totals[rtype] += cents
+            cells[EXPENSE_CATEGORIES.index(rtype)] = total = styled_cell(ws, cents / 100)
+        ws.append(
+            [row.get("Date", ""), row.get("Fournisseur", ""), row.get("Objet", ""),
+             row.get("Imputation budgétaire", "")]
+            + cells
+            + [styled_cell(ws, total.value) if total is not None else None, row.get("Justificatif", ""),
+               rtype or ""]
+        )
+    ws.append(
+        [styled_cell(ws, "TOTAUX", font=bold), None, None, None]
+        + [styled_cell(ws, totals[c] / 100, font=bold) for c in EXPENSE_CATEGORIES]
+        + [styled_cell(ws, sum(totals.values()) / 100, font=bold), None, None]
+    )
+    wb.save(out)
+
+
+def styled_cell(ws, value, font=None):
+    """Cellule `write_only` : format monétaire pour les montants, police optionnelle."""
+    from openpyxl.cell import WriteOnlyCell
+    cell = WriteOnlyCell(ws, value=value)
+    if isinstance(value, float):
+        cell.number_format = _AMOUNT_FORMAT
+    if font is not None:
+        cell.font = font
+    return cell
@@ -0,0 +1,319 @@
+"""
+Traitement des pièces jointes images : compression à l'import et conversion
+en page PDF A4. Fonctions de niveau module pour pouvoir être exécutées dans
+les processus d'un ProcessPoolExecutor.
+"""
+
+import io
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
+from ndf.config import configure_reportlab
+
+# Nombre de processus pour la conversion des pièces jointes.
+ATTACHMENT_WORKERS = int(os.environ.get("NDF_WORKERS", "0")) or os.cpu_count() or 1
+
+
+# ─── Fonction de compression d'images ─────────────────────────────────────────
+MAX_IMAGE_WIDTH  = 1920   # largeur maximale (px) d'une image une fois redressée
+MIN_JPEG_QUALITY = 25     # qualité plancher de la recherche
+_EXIF_ORIENTATION = 0x0112
+
+# Taille relative typique d'un JPEG selon sa qualité (1.0 = qualité 85),
+# mesurée sur des photos de tickets ramenées à 1920 px de large.
+_JPEG_SIZE_CURVE = (
+    (1, 0.05), (25, 0.15), (35, 0.22), (45, 0.29), (55, 0.36),
+    (65, 0.47), (75, 0.63), (85, 1.0), (95, 1.9), (100, 3.2),
+)
+
+
+def compress_image(image_bytes, max_size_kb=500, quality=85):
+    """
+    Compresse une image pour réduire la taille du PDF final.
+    
+    Args:
+        image_bytes: bytes de l'image originale
+        max_size_kb: taille maximale cible en KB (par défaut 500KB)
+        quality: qualité JPEG (1-100, par défaut 85)
+    
+    Returns:
+        bytes de l'image compressée
+    """
+    return compress_image_with_stats(image_bytes, max_size_kb, quality)[0]
+
+
+def _relative_jpeg_size(quality: int) -> float:
+    """Interpolation linéaire de _JPEG_SIZE_CURVE."""
+    for (q0, r0), (q1, r1) in zip(_JPEG_SIZE_CURVE, _JPEG_SIZE_CURVE[1:]):
+        if quality <= q1:
+            return r0 + (r1 - r0) * (max(quality, q0) - q0) / (q1 - q0)
+    return _JPEG_SIZE_CURVE[-1][1]
+
+
+def _estimate_quality(known_q: int, known_size: int, target: int, hi: int) -> int:
+    """Plus haute qualité ≤ `hi` dont la taille estimée tient dans `target`."""
+    scale = known_size / _relative_jpeg_size(known_q)
+    for q in range(hi, MIN_JPEG_QUALITY, -1):
+        # Marge de 5 % pour absorber l'écart entre l'image et la courbe type.
+        if scale * _relative_jpeg_size(q) <= target * 0.95:
+            return q
+    return MIN_JPEG_QUALITY
+
+
+def _open_for_width(image_bytes: bytes, max_width: int):
+    """
+    Décode l'image redressée selon son orientation EXIF, à une résolution
+    proche de `max_width` : pour un JPEG, le décodeur réduit directement
+    l'échelle (1/2, 1/4, 1/8) au lieu de décoder toute l'image.
+    """
+    img = PILImage.open(io.BytesIO(image_bytes))
+    orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+    if img.format == "JPEG":
+        # Orientations 5 à 8 : l'image est stockée pivotée d'un quart de tour.
+        upright_w = img.height if orientation in (5, 6, 7, 8) else img.width
+        if upright_w > max_width:
+            scale = max_width / upright_w
+            img.draft("RGB", (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+    return img
+
+
+def compress_image_with_stats(image_bytes, max_size_kb=500, quality=85,
+                              max_width=MAX_IMAGE_WIDTH):
+    """
+    Compresse une image sous `max_size_kb` et décrit le résultat.
+
+    La qualité JPEG est d'abord essayée à `quality` ; si le fichier est trop
+    gros, la qualité qui tient dans la cible est estimée à partir de la taille
+    obtenue (sans descendre sous MIN_JPEG_QUALITY), puis réencodée.
+
+    Returns:
+        (bytes, infos) où infos contient original_size, size (octets),
+        quality, passes (nombre d'encodages), width, height et, en cas
+        d'échec, error (les bytes d'origine sont alors renvoyés)
+    """
+    info = {"original_size": len(image_bytes), "size": len(image_bytes),
+            "quality": None, "passes": 0, "width": None, "height": None}
+    try:
+        img = _open_for_width(image_bytes, max_width)
+        
+        # Convertir en RGB si nécessaire (pour PNG avec transparence)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = PILImage.new('RGB', img.size, (255, 255, 255))
+            if img.mode in ('P', 'LA'):
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        
+        # Finir la réduction (le décodage JPEG s'arrête à une puissance de 2)
+        if img.width > max_width:
+            ratio = max_width / img.width
+            new_height = int(img.height * ratio)
+            img = img.resize((max_width, new_height), PILImage.Resampling.LANCZOS)
+        info["width"], info["height"] = img.size
+
+        target = max_size_kb * 1024
+
+        def encode(q):
+            out = io.BytesIO()
+            img.save(out, format='JPEG', quality=q, optimize=True)
+            info["passes"] += 1
+            return out.getvalue()
+
+        # Chaque mesure recale la courbe type sur l'image : en pratique une
+        # seule estimation suffit, au lieu de descendre de 10 en 10.
+        best_q, best = quality, encode(quality)
+        while len(best) > target and best_q > MIN_JPEG_QUALITY:
+            q = _estimate_quality(best_q, len(best), target, best_q - 1)
+            best_q, best = q, encode(q)
+
+        info.update(size=len(best), quality=best_q)
+        return best, info
+    
+    except Exception as e:
+        # En cas d'erreur, retourner l'image originale
+        info["error"] = str(e) or type(e).__name__
+        return image_bytes, info
+
+
+def fit_image(image_bytes, max_bytes: int) -> bytes:
+    """
+    JPEG de l'image sous `max_bytes` (budget de taille du PDF fusionné).
+
+    La qualité baisse d'abord. Sur une photo bruitée, la taille varie par
+    paliers et l'estimation peut tomber bien en deçà du budget : trois
+    encodages au plus, par dichotomie, reprennent alors la marge perdue. Si
+    la qualité plancher ne suffit pas, la largeur est réduite d'après la
+    taille obtenue (octets ∝ pixels).
+    """
+    data, info = compress_image_with_stats(image_bytes, max_bytes / 1024)
+    if info["quality"] is None:
+        return data
+    for _ in range(3):
+        if info["size"] <= max_bytes or info["width"] <= 64:
+            break
+        # Marge de 10 % : la taille ne suit pas exactement le nombre de pixels.
+        width = max(64, int(info["width"] * math.sqrt(max_bytes / info["size"]) * 0.9))
+        data, info = compress_image_with_stats(image_bytes, max_bytes / 1024, max_width=width)
+    if info["size"] > max_bytes:
+        return data
+    lo, hi = info["quality"], 85    # lo tient dans le budget, hi non
+    for _ in range(3):
+        if info["size"] >= max_bytes * 0.85 or hi - lo < 3:
+            break
+        q = (lo + hi) // 2
+        # Même largeur que le résultat retenu (réduite ci-dessus le cas échéant).
+        candidate, cinfo = compress_image_with_stats(image_bytes, math.inf, quality=q,
+                                                     max_width=info["width"])
+        if cinfo["size"] <= max_bytes:
+            data, info, lo = candidate, cinfo, q
+        else:
+            hi = q
+    return data
+
+
+# Octets d'une page image au-delà du JPEG lui-même (page, xobject, xref…).
+PAGE_OVERHEAD = 2 * 1024
+
+
+def image_to_pdf_bytes(img_bytes: bytes) -> bytes:
+    """Intègre une image JPG/PNG dans une page A4 portrait."""
+    buf = io.BytesIO()
+    render_image_pdf(buf, img_bytes)
+    return buf.getvalue()
+
+
+def _embeddable_image(img_bytes: bytes):
+    """
+    Source à passer à drawImage, avec ses dimensions affichées.
+
+    Un JPEG RGB ou niveaux de gris sans rotation EXIF (cas de toutes les images
+    passées par compress_image) est transmis tel quel : ReportLab l'intègre
+    comme flux DCT sans le décoder. Les autres images (PNG, transparence,
+    CMYK, JPEG à redresser) sont converties une seule fois en RGB.
+    """
+    from reportlab.lib.utils import ImageReader
+    img = PILImage.open(io.BytesIO(img_bytes))
+    orientation = img.getexif().get(_EXIF_ORIENTATION, 1)
+    if img.format == "JPEG" and img.mode in ("RGB", "L") and orientation == 1:
+        return ImageReader(io.BytesIO(img_bytes)), img.size
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        img  = PILImage.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.split()[-1])
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    return ImageReader(img), img.size
+
+
+def render_image_pdf(out, img_bytes: bytes) -> None:
+    """Écrit dans `out` une page A4 portrait contenant l'image JPG/PNG."""
+    from reportlab.pdfgen import canvas as rl_canvas
+    configure_reportlab()
+    source, (iw, ih) = _embeddable_image(img_bytes)
+    pw, ph = A4
+    margin = 15 * mm
+    max_w, max_h = pw - 2 * margin, ph - 2 * margin
+    ratio  = min(max_w / iw, max_h / ih)
+    dw, dh = iw * ratio, ih * ratio
+    x = margin + (max_w - dw) / 2
+    y = margin + (max_h - dh) / 2
+    c   = rl_canvas.Canvas(out, pagesize=A4)
+    c.drawImage(source, x, y, width=dw, height=dh, preserveAspectRatio=True)
+    c.save()
+
+
+# ─── Normalisation parallèle des pièces jointes ───────────────────────────────
+def normalize_attachment(kind: str, data: bytes | str, budget: int | None = None) -> bytes:
+    """
+    Renvoie le PDF prêt à fusionner d'une pièce jointe ("pdf" ou "image").
+
+    `data` est le contenu ou le chemin d'un fichier (blob du magasin) : le
+    processus du pool lit alors le fichier lui-même au lieu de recevoir une
+    copie des octets. Avec `budget` (octets), une image est réencodée pour
+    que sa page tienne dans ce budget.
+    """
+    if isinstance(data, str):
+        with open(data, "rb") as fh:
+            data = fh.read()
+    if kind == "pdf":
+        return data
+    if kind == "image":
+        if budget is not None:
+            data = fit_image(data, max(budget - PAGE_OVERHEAD, 8 * 1024))
+        return image_to_pdf_bytes(data)
+    raise ValueError(f"Type de pièce jointe inconnu : {kind}")
+
+
+def make_executor(workers: int = ATTACHMENT_WORKERS) -> ProcessPoolExecutor:
+    """
+    Pool de processus pour `normalize_attachments`.
+
+    Démarrage en "spawn" : le serveur Streamlit est multithreadé et un fork
+    pourrait hériter d'un verrou tenu par un autre thread.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def normalize_attachments(attachments, executor=None, ahead: int | None = None,
+                          reset_peak: bool = False):
+    """
+    Convertit les pièces jointes en PDF, en parallèle si `executor` est fourni.
+
+    Args:
+        attachments: liste de tuples (kind, bytes ou chemin[, budget]), kind
+            valant "pdf" ou "image" (voir normalize_attachment)
+        executor: ProcessPoolExecutor (ou tout Executor) ; None = séquentiel
+        ahead: conversions soumises d'avance (défaut : deux par processus) ;
+            les résultats non encore consommés restent ainsi en nombre borné
+        reset_peak: pic de mémoire de chaque conversion plutôt que celui du
+            processus du pool (voir ndf.trace.measured)
+
+    Yields:
+        une entrée {"pdf": bytes | None, "error": str | None, "worker": dict}
+        par pièce jointe, dans l'ordre d'origine ; "worker" donne la durée et
+        la mémoire de la conversion dans le processus du pool (vide
+        hors pool, voir ndf.trace.measured). L'échec d'une pièce n'interrompt
+        pas les autres.
+    """
+    from ndf.trace import measured
+
+    ahead   = ahead or 2 * ATTACHMENT_WORKERS
+    futures = {}
+
+    def submit(i: int) -> None:
+        # Les PDF sont déjà prêts : inutile de les copier vers un processus.
+        if executor is not None and i < len(attachments) and attachments[i][0] != "pdf":
+            futures[i] = executor.submit(measured, normalize_attachment, *attachments[i],
+                                         reset_peak=reset_peak)
+
+    for i in range(ahead):
+        submit(i)
+    try:
+        for i, args in enumerate(attachments):
+            future = futures.pop(i, None)
+            submit(i + ahead)
+            try:
+                pdf, worker = future.result() if future is not None else (
+                    normalize_attachment(*args), {})
+                yield {"pdf": pdf, "error": None, "worker": worker}
+            except Exception as e:
+                yield {"pdf": None, "error": str(e) or type(e).__name__, "worker": {}}
+    finally:
+        # Générateur fermé avant la fin (annulation) : conversions non démarrées abandonnées.
+        for future in futures.values():
+            future.cancel()
+
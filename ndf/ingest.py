@@ -0,0 +1,128 @@
+"""
+Import des justificatifs : compression des images et allègement des PDF,
+pour un fichier ou pour un lot.
+
+Un fichier est reconnu à son empreinte : sa transformation n'est calculée
+qu'une fois par processus (BlobStore.put_derived). Pour un lot, les
+transformations sont réparties sur les processus du pool de conversion
+(ndf.images.make_executor) et le rapport décrit chaque fichier : tailles
+avant et après, réutilisation, doublon ou échec. Chaque transformation est
+une étape « ingest » du BuildTrace fourni (voir ndf.trace).
+"""
+
+import hashlib
+import io
+
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png")
+ACCEPTED_TYPES   = ["pdf", *IMAGE_EXTENSIONS]
+IMAGE_MAX_KB     = 500
+IMAGE_QUALITY    = 85
+
+
+def file_kind(name: str) -> str | None:
+    """"image", "pdf" ou None (format non pris en charge) d'après l'extension."""
+    ext = name.lower().rsplit(".", 1)[-1]
+    return "pdf" if ext == "pdf" else "image" if ext in IMAGE_EXTENSIONS else None
+
+
+def transform_name(kind: str) -> str:
+    """Nom de la transformation d'import dans le magasin de blobs."""
+    if kind == "image":
+        return f"jpeg-{IMAGE_MAX_KB}k-q{IMAGE_QUALITY}"
+    from ndf.pdfopt import PDF_MAX_DPI
+    return f"pdf-{PDF_MAX_DPI}dpi"
+
+
+def prepare(kind: str, data: bytes) -> bytes:
+    """
+    Transformation d'import d'un fichier (exécutée dans un processus du pool).
+
+    Raises:
+        ValueError: image illisible, ou PDF qui ne s'ouvre pas (un PDF
+            lisible que l'optimisation n'a pas su alléger est gardé tel quel)
+    """
+    if kind == "image":
+        from ndf.images import compress_image_with_stats
+        out, info = compress_image_with_stats(data, max_size_kb=IMAGE_MAX_KB, quality=IMAGE_QUALITY)
+        if "error" in info:
+            raise ValueError("image illisible")
+        return out
+    from ndf.pdfopt import optimize_pdf_with_stats
+    out, info = optimize_pdf_with_stats(data)
+    if "error" in info:
+        from pypdf import PdfReader
+        try:
+            len(PdfReader(io.BytesIO(data)).pages)
+        except Exception as e:
+            raise ValueError(f"PDF illisible ({e})") from e
+    return out
+
+
+def ingest_files(files, blob_store, executor=None, progress=None, trace=None) -> list[dict]:
+    """
+    Importe des justificatifs dans `blob_store`.
+
+    Args:
+        files: suite de (nom, octets)
+        executor: pool de processus ; None = transformations une à une
+        progress: appelé avec (faits, total, nom) après chaque fichier
+        trace: BuildTrace recevant une étape par fichier transformé (durée,
+            tailles, mesures du processus du pool)
+
+    Returns:
+        une entrée par fichier, dans l'ordre : {"name", "kind", "key"
+        (SHA-256 du fichier d'origine), "sha256" (blob enregistré),
+        "original_size", "size", "status", "error"}. `status` vaut "new",
+        "reused" (déjà transformé), "duplicate" (même contenu qu'un fichier
+        précédent du lot, "duplicate_of" donne son nom) ou "failed".
+        L'échec d'un fichier n'interrompt pas les autres. La synthèse du
+        lot (événement ingest_build) est journalisée à la fin.
+    """
+    from ndf.trace import BuildTrace, measured
+
+    progress = progress or (lambda done, total, name: None)
+    trace    = trace or BuildTrace(kind="ingest")
+    entries, pending, seen = [], [], {}
+    for name, data in files:
+        entry = {"name": name, "kind": file_kind(name), "key": None, "sha256": None,
+                 "original_size": len(data), "size": None, "status": None, "error": None}
+        entries.append(entry)
+        if entry["kind"] is None:
+            entry.update(status="failed", error="format non pris en charge (PDF, JPG, PNG)")
+            continue
+        entry["key"] = hashlib.sha256(data).hexdigest()
+        if entry["key"] in seen:
+            entry.update(status="duplicate", duplicate_of=seen[entry["key"]]["name"])
+            continue
+        seen[entry["key"]] = entry
+        digest = blob_store.derived(entry["key"], transform_name(entry["kind"]))
+        if digest is not None:
+            entry.update(status="reused", sha256=digest, size=blob_store.size(digest))
+        else:
+            pending.append((entry, data))
+
+    futures = [executor.submit(measured, prepare, entry["kind"], data,
+                               reset_peak=trace.reset_peak)
+               if executor is not None else None for entry, data in pending]
+    total   = len(entries)
+    done    = total - len(pending)
+    for (entry, data), future in zip(pending, futures):
+        with trace.stage("ingest", entry["name"], len(data), kind=entry["kind"]) as span:
+            try:
+                result, worker = future.result() if future is not None else (
+                    prepare(entry["kind"], data), {})
+                span.update(worker, bytes_out=len(result))
+                digest = blob_store.put_result(entry["key"], transform_name(entry["kind"]), result)
+                entry.update(status="new", sha256=digest, size=len(result))
+            except Exception as e:
+                entry.update(status="failed", error=str(e) or type(e).__name__)
+                span["error"] = entry["error"]
+        done += 1
+        progress(done, total, entry["name"])
+
+    for entry in entries:
+        if entry["status"] == "duplicate":
+            first = seen[entry["key"]]
+            entry.update(sha256=first["sha256"], size=first["size"], error=first["error"])
+    trace.finish("done")
+    return entries
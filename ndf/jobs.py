@@ -0,0 +1,131 @@
+"""
+Génération du PDF en arrière-plan.
+
+Un PdfJob exécute stream_full_pdf dans un thread : la session Streamlit
+reste réactive, le travail survit aux réexécutions du script (l'objet est
+gardé dans st.session_state) et l'interface interroge son avancement.
+"""
+
+import threading
+import time
+
+from ndf.trace import BuildTrace
+
+STAGE_LABELS = {
+    "queued":      "En attente",
+    "summary":     "Récapitulatif",
+    "attachments": "Pièces jointes",
+    "write":       "Écriture du PDF",
+    "done":        "Terminé",
+    "cancelled":   "Annulé",
+    "failed":      "Échec",
+}
+# Part de la barre de progression atteinte au début de chaque étape.
+_STAGE_START = {"queued": 0.0, "summary": 0.02, "attachments": 0.1, "write": 0.92}
+
+
+class JobCancelled(Exception):
+    """Levée dans le thread de génération quand l'utilisateur annule."""
+
+
+class PdfJob:
+    """
+    Appel de `func(*args, **kwargs)` dans un thread, avec avancement et
+    annulation. `func` reçoit en plus `progress=`, `errors=` et `trace=`
+    (voir ndf.pdf.stream_full_pdf) ; son résultat est un fichier à fermer.
+    `trace` (un BuildTrace neuf à défaut) reçoit les mesures de chaque
+    étape, la synthèse finale et, s'il est demandé, le profil cProfile.
+    """
+
+    def __init__(self, func, *args, trace: BuildTrace | None = None, **kwargs):
+        self._func     = func
+        self._args     = args
+        self._kwargs   = kwargs
+        self._lock     = threading.Lock()
+        self._cancel   = threading.Event()
+        self.stage     = "queued"
+        self.done      = 0
+        self.total     = 0
+        self.detail    = ""
+        self.result    = None
+        self.error     = None
+        self.warnings  = []     # (fichier, message) des pièces jointes ignorées
+        self.trace     = trace or BuildTrace()
+        self.created   = time.monotonic()
+        self.started   = None
+        self.finished  = None
+
+    def start(self) -> "PdfJob":
+        threading.Thread(target=self.run, name="ndf-pdf-job", daemon=True).start()
+        return self
+
+    def run(self) -> None:
+        self.started = time.monotonic()
+        try:
+            with self.trace.profiled():
+                result = self._func(
+                    *self._args, progress=self._progress, errors=self.warnings,
+                    trace=self.trace, **self._kwargs,
+                )
+        except JobCancelled:
+            self._finish("cancelled")
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            self._finish("failed")
+        else:
+            with self._lock:
+                cancelled = self._cancel.is_set()   # annulé pendant l'écriture finale
+                if cancelled and result is not None:
+                    result.close()
+                    result = None
+            if cancelled:
+                self._finish("cancelled")
+            elif result is None:
+                self.error = "aucun PDF produit"
+                self._finish("failed")
+            else:
+                self.result = result
+                self._finish("done")
+
+    def _progress(self, stage: str, done: int = 0, total: int = 0, detail: str = "") -> None:
+        if self._cancel.is_set():
+            raise JobCancelled
+        with self._lock:
+            self.stage, self.done, self.total, self.detail = stage, done, total, detail
+
+    def _finish(self, stage: str) -> None:
+        if self.started is not None:
+            self.trace.finish(stage)
+        with self._lock:
+            self.stage    = stage
+            self.finished = time.monotonic()
+
+    def cancel(self) -> None:
+        """Demande l'arrêt ; effectif à la prochaine étape ou pièce jointe."""
+        self._cancel.set()
+
+    def mark_cancelled(self) -> None:
+        """Termine à l'état « annulé » un job qui n'a pas démarré, sans appeler `func`."""
+        self._cancel.set()
+        self._finish("cancelled")
+
+    @property
+    def is_finished(self) -> bool:
+        return self.finished is not None
+
+    def snapshot(self) -> dict:
+        """État cohérent pour l'affichage : étape, libellé, fraction 0–1."""
+        with self._lock:
+            stage, done, total, detail = self.stage, self.done, self.total, self.detail
+        if stage in ("done", "cancelled", "failed"):
+            fraction = 1.0
+        elif stage == "attachments" and total:
+            fraction = _STAGE_START["attachments"] + (
+                _STAGE_START["write"] - _STAGE_START["attachments"]) * done / total
+        else:
+            fraction = _STAGE_START[stage]
+        label = STAGE_LABELS[stage]
+        if stage == "attachments" and total:
+            label = f"{label} {done + 1}/{total} : {detail}"
+        return {"stage": stage, "label": label, "fraction": fraction,
+                "cancelling": self._cancel.is_set() and not self.is_finished}
@@ -0,0 +1,58 @@
+"""
+Registre des logos des sociétés, chargés à la demande depuis ndf/assets/logos.
+
+Chaque logo est décodé une seule fois par processus et ramené à la
+résolution d'impression de l'en-tête (LOGO_DPI à LOGO_HEIGHT) : le PDF
+n'embarque jamais plus de pixels que nécessaire.
+"""
+
+import functools
+import io
+import os
+
+from PIL import Image as PILImage
+from reportlab.lib.units import mm
+
+LOGO_DIR    = os.path.join(os.path.dirname(__file__), "assets", "logos")
+LOGO_HEIGHT = 18 * mm   # hauteur imprimée du logo dans l'en-tête (points)
+LOGO_DPI    = 300
+
+
+@functools.lru_cache(maxsize=None)
+def get_logo(name: str | None) -> dict | None:
+    """
+    Logo prêt à intégrer, ou None si `name` est vide ou sans fichier.
+
+    Returns:
+        {"bytes": JPEG ou PNG, "width": largeur imprimée en points,
+         "height": LOGO_HEIGHT}. Le dictionnaire est partagé : ne pas le modifier.
+    """
+    if not name:
+        return None
+    for ext in ("jpg", "jpeg", "png"):
+        path = os.path.join(LOGO_DIR, f"{name}.{ext}")
+        if os.path.exists(path):
+            break
+    else:
+        return None
+    with open(path, "rb") as fh:
+        data = fh.read()
+    img = PILImage.open(io.BytesIO(data))
+    max_h = round(LOGO_HEIGHT / 72 * LOGO_DPI)
+    if img.height > max_h:
+        img = img.resize(
+            (round(img.width * max_h / img.height), max_h), PILImage.Resampling.LANCZOS,
+        )
+        buf = io.BytesIO()
+        if img.mode in ("RGBA", "LA", "P"):
+            img.save(buf, format="PNG", optimize=True)
+        else:
+            img.convert("RGB").save(buf, format="JPEG", quality=90, optimize=True)
+        data = buf.getvalue()
+    # Un logo déjà sous la résolution cible est gardé tel quel : un JPEG est
+    # alors intégré sans décodage (flux DCT).
+    return {
+        "bytes":  data,
+        "width":  LOGO_HEIGHT * img.width / img.height,
+        "height": LOGO_HEIGHT,
+    }
@@ -0,0 +1,102 @@
+"""
+Montants en centimes entiers.
+
+Les montants saisis (float, "1 234,56", "12.5") sont convertis une fois en
+centimes int64 ; sommes et cumuls se font ensuite en arithmétique entière
+exacte, et le formatage français (1 234,56) s'applique à une colonne entière
+en une passe vectorisée.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ndf.utils import THIN_NBSP
+
+
+def to_cents(values) -> pd.Series:
+    """
+    Centimes (Int64, <NA> si la valeur n'est pas un montant) d'une colonne.
+
+    Les chaînes acceptent la virgule décimale et les espaces de milliers.
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        text = s.astype("string").str.replace("[\\s\u00a0\u202f]", "", regex=True)
+        s    = text.str.replace(",", ".", regex=False)
+    number = pd.to_numeric(s, errors="coerce").astype("float64")
+    cents  = np.rint(number.to_numpy() * 100)
+    return pd.Series(cents, index=s.index).astype("Int64")
+
+
+def as_cents(value) -> int | None:
+    """Centimes d'un montant isolé (même règle que to_cents) ; None si invalide."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = value.replace(" ", "").replace("\u00a0", "").replace("\u202f", "")
+        value = value.replace(",", ".")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if number != number else int(np.rint(number * 100))
+
+
+def split_by_category(types: pd.Series, cents: pd.Series, categories: list[str]) -> pd.DataFrame:
+    """Une colonne Int64 par catégorie : le montant de la ligne ou <NA>."""
+    return pd.DataFrame({cat: cents.where(types == cat) for cat in categories})
+
+
+def format_cents(cents, blank_zero: bool = False, sep: str = THIN_NBSP) -> pd.Series:
+    """
+    Colonne de centimes formatée « -1 234,56 », sans boucle Python.
+
+    <NA> donne "" ; avec `blank_zero`, 0 aussi. `sep` sépare les milliers.
+    """
+    c     = pd.Series(cents).astype("Int64")
+    v     = c.fillna(0).to_numpy("int64")
+    blank = c.isna().to_numpy(bool) | ((v == 0) & blank_zero)
+    text  = np.where(blank, "", _format_chars(v, sep))
+    return pd.Series(text.tolist(), index=c.index, dtype=object)
+
+
+_POW10 = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+def _format_chars(v: np.ndarray, sep: str) -> np.ndarray:
+    """
+    Mise en forme par tableaux de caractères : chaque montant est une ligne
+    d'une matrice UCS-4 remplie alignée à droite (chiffres, séparateurs,
+    signe), puis recalée à gauche et relue comme tableau de chaînes numpy.
+    """
+    n      = len(v)
+    mag    = np.abs(v)
+    euros  = mag // 100
+    ndigit = 1 + np.searchsorted(_POW10, euros, side="right")
+    width  = int(ndigit.max()) if n else 1
+    width += (width - 1) // 3                # chiffres + séparateurs de milliers
+    elen   = ndigit + (ndigit - 1) // 3
+    neg    = v < 0
+    cols   = width + 4                       # signe + partie entière + ",dd"
+
+    chars = np.zeros((n, cols), dtype=np.uint32)
+    chars[:, -1] = mag % 10 + 48
+    chars[:, -2] = mag // 10 % 10 + 48
+    chars[:, -3] = ord(",")
+    k = 0
+    for r in range(width):                   # partie entière, de droite à gauche
+        col     = cols - 4 - r
+        present = r < elen
+        if (r + 1) % 4 == 0:
+            chars[present, col] = ord(sep)
+        else:
+            chars[:, col] = np.where(present, euros // 10 ** k % 10 + 48, 0)
+            k += 1
+    chars[np.nonzero(neg)[0], cols - 4 - elen[neg]] = ord("-")
+
+    # Recalage à gauche : numpy ignore les NUL de fin, pas ceux de début.
+    length = elen + 3 + neg
+    src    = np.arange(cols)[None, :] + (cols - length)[:, None]
+    chars  = np.take_along_axis(chars, np.minimum(src, cols - 1), 1)
+    chars[src > cols - 1] = 0
+    return chars.view(f"<U{cols}").ravel()
@@ -0,0 +1,666 @@
+"""
+Moteur PDF : récapitulatif de la note de frais (ReportLab) et fusion avec les
+pièces jointes (pypdf).
+
+Importé à la demande par l'interface : les styles ReportLab sont construits
+une seule fois, à l'import du module.
+"""
+
+import base64
+import functools
+import hashlib
+import io
+import os
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+from xml.sax.saxutils import escape as xml_escape
+
+import pandas as pd
+from pypdf import PdfReader
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import (
+    SimpleDocTemplate, Table, TableStyle,
+    Paragraph, Spacer, KeepInFrame, PageBreak, Flowable,
+)
+from reportlab.platypus import Image as RLImage
+
+from ndf.blobs import BlobStore
+from ndf.cache import PageCache
+from ndf.config import COMPANY_INFO, MONTHS_FR, configure_reportlab
+from ndf.images import PAGE_OVERHEAD, normalize_attachments
+from ndf.logos import get_logo
+from ndf.money import format_cents, split_by_category, to_cents
+from ndf.pdfstream import PdfStreamWriter
+from ndf.trace import BuildTrace
+from ndf.utils import PDF_NBSP, fmt_cents
+
+# Seuil (octets) au-delà duquel les PDF intermédiaires et le PDF fusionné
+# débordent de la mémoire vers un fichier temporaire sur disque.
+PDF_SPOOL_MAX_BYTES = int(os.environ.get("NDF_SPOOL_MAX_MB", "8")) * 1024 * 1024
+
+
+# ─── ReportLab styles ─────────────────────────────────────────────────────────
+_base = getSampleStyleSheet()
+_hdr  = ParagraphStyle("hdr", parent=_base["Normal"],
+                        fontName="Helvetica-Bold", fontSize=7, alignment=1, leading=9)
+_cel  = ParagraphStyle("cel", parent=_base["Normal"],
+                        fontName="Helvetica",      fontSize=7, alignment=1, leading=9)
+_ttl  = ParagraphStyle("ttl", parent=_base["Heading1"], fontSize=15, leading=19)
+_nrm  = ParagraphStyle("nrm", parent=_base["Normal"],   fontSize=9,  leading=12)
+_sml  = ParagraphStyle("sml", parent=_base["Normal"],
+                        fontName="Helvetica", fontSize=8, leading=10,
+                        textColor=colors.HexColor("#444444"))
+
+
+# Styles partagés avec les autres documents PDF (ndf.consolidation).
+STYLES = SimpleNamespace(header=_hdr, cell=_cel, title=_ttl, normal=_nrm, small=_sml)
+
+
+def paragraph(text, style=None):
+    """Paragraphe ReportLab, style cellule de tableau par défaut."""
+    return Paragraph(str(text) if text else "", style or _cel)
+
+
+_p = paragraph
+
+
+# ─── En-tête ──────────────────────────────────────────────────────────────────
+def _build_header_story(story: list, company: str, name: str, invoice_no: str = "") -> None:
+    """Ajoute le bloc en-tête (logo + infos société + nom/mois) à la story."""
+    PAGE_W, _  = landscape(A4)
+    usable_w   = PAGE_W - 20 * mm
+    current_month = MONTHS_FR[date.today().month - 1]
+    info       = COMPANY_INFO.get(company, {})
+    address    = info.get("address", "")
+    logo       = get_logo(info.get("logo"))
+
+    text_items = [_p("NOTE DE FRAIS", _ttl), _p(f"<b>{company}</b>", _nrm)]
+    if address:
+        text_items.append(_p(address, _sml))
+    text_items.append(_p(
+        f"<b>Nom :</b> {name}   |   "
+        f"<b>Mois :</b> {current_month} {date.today().year}", _nrm,
+    ))
+    if invoice_no:
+        text_items.append(_p(f"<b>N° de Facture :</b> {invoice_no}", _nrm))
+
+    if logo:
+        logo_col_w = logo["width"] + 5 * mm
+        text_col_w = usable_w - logo_col_w
+        logo_cell  = RLImage(io.BytesIO(logo["bytes"]), width=logo["width"], height=logo["height"])
+        text_block = KeepInFrame(text_col_w - 6, 25 * mm, text_items, mode="shrink")
+        h_tbl = Table([[logo_cell, text_block]], colWidths=[logo_col_w, text_col_w])
+        h_tbl.setStyle(TableStyle([
+            ("VALIGN",      (0, 0), (-1, -1), "MIDDLE"),
+            ("LEFTPADDING", (0, 0), (0, 0),   0),
+            ("RIGHTPADDING",(0, 0), (0, 0),   5),
+            ("LEFTPADDING", (1, 0), (1, 0),   4),
+        ]))
+        story.append(h_tbl)
+    else:
+        for item in text_items:
+            story.append(item)
+
+
+# ─── Tableau des dépenses ─────────────────────────────────────────────────────
+TABLE_HEADERS = [
+    "Date de\nDépense", "Fournisseur", "Objet (Description)", "Imputation\nbudgétaire",
+    "RECEPTION-\nINVITATIONS-\nREPAS (TTC)", "HÔTEL-\nHEBERGEMENT\n(TTC)",
+    "TRANSPORT -\nCARBURANT (TTC)", "TÉLÉPHONE\n(TTC)", "AFFRAN-\nCHISSEMENT (TTC)",
+    "DIVERS\n(TTC)",
+]
+# Ordre des colonnes montants du tableau (≠ ordre de EXPENSE_CATEGORIES).
+TABLE_CATEGORIES = [
+    "RECEPTION-INVITATIONS-REPAS", "HOTEL-HEBERGEMENT", "TRANSPORT - CARBURANT",
+    "TELEPHONE", "AFFRANCHISSEMENT", "DIVERS",
+]
+_TEXT_COLUMNS = ["Date", "Fournisseur", "Objet", "Imputation budgétaire"]
+_COL_WIDTHS   = [22*mm, 32*mm, 38*mm, 28*mm, 24*mm, 22*mm, 24*mm, 18*mm, 21*mm, 15*mm, 22*mm]
+_USABLE_W     = landscape(A4)[0] - 20*mm
+_FRAME_H      = landscape(A4)[1] - 20*mm - 12   # marges du document, padding du cadre
+_CELL_FONT    = ("Helvetica", 7, 9)             # police, taille, interligne
+_CELL_PAD     = 3                               # points, en haut et en bas
+_CELL_HPAD    = 12                              # points, gauche + droite
+
+
+def _text_cells(texts: list[list[str]]) -> tuple[list[list], list[float]]:
+    """
+    Cellules texte et hauteur de chaque ligne.
+
+    Une chaîne simple (sans Paragraph ni analyse de balisage) suffit quand le
+    texte tient sur une ligne ; sinon un Paragraph, échappé, gère le retour à
+    la ligne et sa hauteur est mesurée pour le découpage en pages.
+    """
+    font, size, leading = _CELL_FONT
+    cells, heights = [], []
+    for row in zip(*texts):
+        out, height = [], leading
+        for text, width in zip(row, _COL_WIDTHS):
+            avail = width - _CELL_HPAD
+            if "\n" not in text and stringWidth(text, font, size) <= avail:
+                out.append(text)
+            else:
+                para = Paragraph(xml_escape(text).replace("\n", "<br/>"), _cel)
+                height = max(height, para.wrap(avail, _FRAME_H)[1])
+                out.append(para)
+        cells.append(out)
+        heights.append(height + 2 * _CELL_PAD)
+    return cells, heights
+
+
+def _paginate(heights: list[float], first_avail: float, fixed: dict) -> list[tuple[int, int]]:
+    """Découpe les lignes en blocs (début, fin) remplissant chacun une page."""
+    chunks, start, n = [], 0, len(heights)
+    avail = first_avail
+    while True:
+        room = (avail - fixed["header"] - fixed["footer"] - (fixed["report"] if chunks else 0)
+                - 1)   # arrondis de mise en page
+        end  = start
+        while end < n and (room >= heights[end] or end == start):
+            room -= heights[end]
+            end  += 1
+        chunks.append((start, end))
+        if end >= n:
+            return chunks
+        start, avail = end, _FRAME_H
+
+
+def _expense_table_story(df: pd.DataFrame, cur: str, first_avail: float = _FRAME_H) -> list:
+    """
+    Tableau des dépenses en blocs d'une page : chaque bloc se termine par
+    une ligne « À reporter » et le suivant commence par une ligne « Report »
+    reprenant les totaux cumulés ; le dernier se termine par les TOTAUX.
+
+    Les montants par catégorie sont calculés colonne par colonne, en
+    centimes entiers (ndf.money), et les cellules numériques sont de simples
+    chaînes.
+    """
+    n       = len(df)
+    amt_col = f"Montant TTC ({cur})"
+    types   = df["Type"] if "Type" in df else pd.Series("", index=df.index)
+    cents   = to_cents(df[amt_col] if amt_col in df else pd.Series(pd.NA, index=df.index))
+    split   = split_by_category(types, cents, TABLE_CATEGORIES)
+    split["TOTAL"] = split.sum(axis=1).astype("Int64")
+    cumul   = split.fillna(0).astype("int64").cumsum().to_numpy()
+
+    texts = [
+        [] if n == 0 else [("" if pd.isna(v) else str(v)) for v in df[c]]
+        if c in df else [""] * n
+        for c in _TEXT_COLUMNS
+    ]
+    amount_texts = [format_cents(split[c], sep=PDF_NBSP).tolist() for c in split.columns]
+    cells, heights = _text_cells(texts)
+    for row, values in zip(cells, zip(*amount_texts)):
+        row.extend(values)
+
+    def totals_row(label: str, upto: int) -> list[str]:
+        sums = cumul[upto - 1] if upto else [0] * split.shape[1]
+        return ([label, "", "", ""]
+                + [fmt_cents(v, PDF_NBSP) if v else "" for v in sums[:-1]]
+                + [fmt_cents(sums[-1], PDF_NBSP)])
+
+    def header_row() -> list:
+        return [_p(h, _hdr) for h in TABLE_HEADERS] + [_p(f"TOTAL ({cur})", _hdr)]
+
+    widths = dict(colWidths=_COL_WIDTHS)
+    fixed  = {
+        "header": Table([header_row()], **widths).wrap(_USABLE_W, _FRAME_H)[1],
+        "report": _CELL_FONT[2] + 2 * _CELL_PAD,
+        "footer": _CELL_FONT[2] + 2 * _CELL_PAD,
+    }
+    chunks = _paginate(heights, first_avail, fixed)
+    story  = []
+    for i, (start, end) in enumerate(chunks):
+        last = i == len(chunks) - 1
+        rows = [header_row()]
+        if i:
+            rows.append(totals_row("Report", start))
+        rows.extend(cells[start:end])
+        rows.append(totals_row("TOTAUX" if last else "À reporter", end))
+        tbl = Table(rows, repeatRows=1, **widths)
+        tbl.setStyle(table_style(report=bool(i)))
+        story.append(tbl)
+        if not last:
+            story.append(PageBreak())
+    return story
+
+
+def table_style(report: bool) -> TableStyle:
+    font, size, leading = _CELL_FONT
+    first = 2 if report else 1
+    cmds  = [
+        ("BACKGROUND",     (0, 0),  (-1, 0),  colors.HexColor("#757070")),
+        ("TEXTCOLOR",      (0, 0),  (-1, 0),  colors.white),
+        ("FONTNAME",       (0, 0),  (-1, 0),  "Helvetica-Bold"),
+        ("FONT",           (0, 1),  (-1, -1), font, size, leading),
+        ("ALIGN",          (0, 1),  (-1, -1), "CENTER"),
+        ("BACKGROUND",     (0, -1), (-1, -1), colors.HexColor("#A5A5A5")),
+        ("FONTNAME",       (0, -1), (-1, -1), "Helvetica-Bold"),
+        ("GRID",           (0, 0),  (-1, -1), 0.5, colors.grey),
+        ("VALIGN",         (0, 0),  (-1, -1), "MIDDLE"),
+        ("TOPPADDING",     (0, 0),  (-1, -1), _CELL_PAD),
+        ("BOTTOMPADDING",  (0, 0),  (-1, -1), _CELL_PAD),
+        ("ROWBACKGROUNDS", (0, first), (-1, -2), [colors.white, colors.HexColor("#F2F2F2")]),
+    ]
+    if report:
+        cmds += [
+            ("BACKGROUND", (0, 1), (-1, 1), colors.HexColor("#D9D9D9")),
+            ("FONTNAME",   (0, 1), (-1, 1), "Helvetica-Bold"),
+        ]
+    return TableStyle(cmds)
+
+
+# ─── Signature vectorielle ────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=1)
+def _signature_font() -> str:
+    """
+    Police de la signature : la TrueType résolue par ndf.signature, que
+    ReportLab embarque en sous-ensemble (seuls les glyphes du nom) ;
+    Times-BoldItalic, police standard non embarquée, à défaut.
+    """
+    from ndf.signature import resolve_font
+    path, _ = resolve_font()
+    if path is not None:
+        try:
+            pdfmetrics.registerFont(TTFont("NDF-Signature", path))
+            return "NDF-Signature"
+        except Exception:
+            pass
+    return "Times-BoldItalic"
+
+
+class _SignatureText(Flowable):
+    """
+    Nom du bénéficiaire en texte vectoriel, souligné du paraphe, aux
+    proportions de l'aperçu de ndf.signature (police 180 px, traits de 6 et
+    3 px), agrandi pour occuper `width` × `height`.
+    """
+
+    _INK = colors.Color(10 / 255, 10 / 255, 10 / 255)
+
+    def __init__(self, name: str, width: float, height: float):
+        super().__init__()
+        self.name   = name.strip() or "Signature"
+        self.width  = width
+        self.height = height
+
+    def wrap(self, avail_w, avail_h):
+        return self.width, self.height
+
+    def draw(self):
+        c, font = self.canv, _signature_font()
+        size   = min(self.height * 0.6, self.width * 0.85 / max(stringWidth(self.name, font, 1), 1))
+        text_w = stringWidth(self.name, font, size)
+        base   = self.height * 0.42
+        c.setFillColor(self._INK)
+        c.setFont(font, size)
+        c.drawCentredString(self.width / 2, base, self.name)
+
+        # Paraphe : deux traits sous le nom, dépassant de part et d'autre
+        x0     = max(self.width * 0.05, (self.width - text_w) / 2 - size * 0.22)
+        x1     = self.width - x0
+        line_y = base - size * 0.36
+        c.setStrokeColor(self._INK)
+        c.setLineWidth(size * 0.033)
+        c.line(x0, line_y, x1, line_y)
+        c.setStrokeColor(colors.Color(10 / 255, 10 / 255, 10 / 255, alpha=200 / 255))
+        c.setLineWidth(size * 0.017)
+        c.line(x0 + size * 0.11, line_y - size * 0.067, x1 - size * 0.11, line_y - size * 0.067)
+
+
+# ─── Génération PDF ───────────────────────────────────────────────────────────
+def generate_expense_pdf(
+    df: pd.DataFrame, name: str, company: str, cur: str,
+    signature_b64: str | None = None,
+    invoice_no: str = "",
+    signature_name: str | None = None,
+) -> bytes:
+    buf = io.BytesIO()
+    _render_expense_pdf(buf, df, name, company, cur, signature_b64, invoice_no, signature_name)
+    return buf.getvalue()
+
+
+def summary_fingerprint(
+    df: pd.DataFrame, name: str, company: str, cur: str,
+    signature_b64: str | None = None,
+    invoice_no: str = "",
+    signature_name: str | None = None,
+) -> str:
+    """
+    Empreinte de tout ce qui change le rendu du récapitulatif : lignes,
+    bénéficiaire, société, devise, signature, N° de facture et date du jour
+    (imprimée sous la signature).
+    """
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    for part in (*df.columns, name, company, cur, signature_b64 or "", signature_name or "",
+                 invoice_no, date.today().isoformat()):
+        h.update(str(part).encode() + b"\x1f")
+    return h.hexdigest()
+
+
+def _render_expense_pdf(
+    out, df: pd.DataFrame, name: str, company: str, cur: str,
+    signature_b64: str | None = None,
+    invoice_no: str = "",
+    signature_name: str | None = None,
+) -> None:
+    """
+    Écrit le récapitulatif directement dans le fichier binaire `out`.
+
+    La signature du bénéficiaire est soit `signature_name`, tracé en texte
+    vectoriel, soit l'image `signature_b64` (normalisée à l'import par
+    ndf.signature.normalize_signature), intégrée telle quelle.
+    """
+    configure_reportlab()
+    doc = SimpleDocTemplate(
+        out, pagesize=landscape(A4),
+        leftMargin=10*mm, rightMargin=10*mm,
+        topMargin=10*mm,  bottomMargin=10*mm,
+    )
+    story = []
+
+    # En-tête
+    _build_header_story(story, company, name, invoice_no)
+    story.append(Spacer(1, 5 * mm))
+
+    # Tableau des dépenses, découpé par page
+    first_avail = _FRAME_H - sum(
+        f.wrap(_USABLE_W, _FRAME_H)[1] + f.getSpaceBefore() + f.getSpaceAfter()
+        for f in story
+    )
+    story.extend(_expense_table_story(df, cur, first_avail))
+    story.append(Spacer(1, 8 * mm))
+
+    # ── Bloc signatures avec image directe (plus simple et fiable) ────────────
+    sig_headers = [
+        _p("Le bénéficiaire", _hdr),
+        _p("La direction", _hdr),
+        _p("La comptabilité", _hdr),
+    ]
+    
+    # Signature du bénéficiaire (colonne 1) : texte vectoriel ou image
+    # importée, qui remplit toute la cellule (80 mm de large)
+    if signature_name:
+        sig_images = [_SignatureText(signature_name, 78*mm, 28*mm), _p(""), _p("")]
+    elif signature_b64:
+        try:
+            sig_img = RLImage(io.BytesIO(base64.b64decode(signature_b64)), width=78*mm, height=28*mm)
+            sig_images = [sig_img, _p(""), _p("")]
+        except Exception:
+            sig_images = [_p(""), _p(""), _p("")]
+    else:
+        sig_images = [_p(""), _p(""), _p("")]
+    
+    sig_dates = [
+        _p(f"Date : {date.today().strftime('%d/%m/%Y')}", _cel),
+        _p("Date :", _cel),
+        _p("Date :", _cel),
+    ]
+    
+    sig_data = [sig_headers, sig_images, sig_dates]
+    sig_table = Table(sig_data, colWidths=[80*mm, 80*mm, 80*mm])
+    sig_table.setStyle(TableStyle([
+        ("ALIGN",      (0, 0), (-1, -1), "CENTER"),
+        ("VALIGN",     (0, 0), (-1, -1), "MIDDLE"),
+        ("GRID",       (0, 0), (-1, -1), 0.3, colors.HexColor("#BBBBBB")),
+        ("TOPPADDING",    (0, 0), (-1, -1), 5),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 5),
+        ("ROWHEIGHT",     (0, 1), (-1, 1), 30*mm),  # Hauteur augmentée pour grande signature
+    ]))
+    story.append(sig_table)
+
+    doc.build(story)
+
+
+# ─── Budget de taille du PDF fusionné ─────────────────────────────────────────
+_BUDGET_MARGIN = 0.95        # part de la cible réellement répartie
+_MIN_SHARE     = 40 * 1024   # en deçà, un justificatif devient illisible
+
+
+def _source_size(source) -> int:
+    return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+
+
+def _fit_budget(items: list, available: int, progress) -> list:
+    """
+    Répartit `available` octets entre les pièces jointes, en une seule
+    génération, et renvoie les `items` ajustés.
+
+    Les PDF passent d'abord, un par un : leur taille après réduction dépend
+    de leur contenu (un PDF texte ne rétrécit pas), le budget restant est
+    donc recalculé après chacun. Les images se partagent ensuite le reste au
+    prorata de leur taille : compress_image atteint sa cible, la réduction
+    se fait à la conversion (budget transmis à normalize_attachment).
+    """
+    from ndf.pdfopt import fit_pdf
+
+    sizes = [_source_size(item[2]) + PAGE_OVERHEAD for item in items]
+    if sum(sizes) <= available:
+        return items
+    items   = list(items)
+    pending = sum(sizes)
+    for i, (fdata, kind, source, *_) in enumerate(items):
+        if kind != "pdf":
+            continue
+        share    = max(_MIN_SHARE, int(sizes[i] * available / pending))
+        pending -= sizes[i]
+        if share < sizes[i]:
+            progress("attachments", 0, len(items), fdata["name"])
+            data, _ = fit_pdf(source, share, sizes[i])
+            # Contenu propre à ce budget : ni cache, ni lecture directe.
+            items[i] = (fdata, kind, data, None, False, False, None)
+            sizes[i] = len(data)
+        available -= sizes[i]
+
+    images = [i for i, item in enumerate(items) if item[1] == "image"]
+    pending = sum(sizes[i] for i in images)
+    for i in images:
+        share    = max(_MIN_SHARE, int(sizes[i] * available / pending)) if pending else sizes[i]
+        pending -= sizes[i]
+        if share < sizes[i]:
+            fdata, kind, source, *_ = items[i]
+            items[i] = (fdata, kind, source, None, False, False, share)
+        available -= min(share, sizes[i])
+    return items
+
+
+def _spool(max_bytes: int):
+    """Fichier temporaire gardé en mémoire jusqu'à `max_bytes`, puis sur disque."""
+    return tempfile.SpooledTemporaryFile(max_size=max_bytes, mode="w+b")
+
+
+def stream_full_pdf(
+    df, name, company, cur, uploaded_files, signature_b64=None, invoice_no="",
+    signature_name: str | None = None,
+    spool_max_bytes: int = PDF_SPOOL_MAX_BYTES,
+    page_cache: PageCache | None = None,
+    executor=None,
+    errors: list | None = None,
+    blob_store: BlobStore | None = None,
+    progress=None,
+    target_size: int | None = None,
+    trace: BuildTrace | None = None,
+):
+    """
+    PDF fusionné assemblé au fil de l'eau dans un fichier temporaire.
+
+    Le récapitulatif est rendu dans un fichier temporaire, puis chaque pièce
+    jointe est lue, recopiée dans le résultat par PdfStreamWriter (voir
+    ndf.pdfstream) et libérée avant l'ouverture de la suivante : la mémoire
+    est bornée par la plus grosse pièce jointe (et le budget de `page_cache`),
+    non par leur somme. Le résultat est un SpooledTemporaryFile qui déborde
+    sur disque au-delà de `spool_max_bytes`.
+
+    Avec `page_cache`, le récapitulatif (indexé par summary_fingerprint) et
+    les pièces jointes déjà converties lors d'une génération précédente sont
+    repris du cache au lieu d'être refaits : après l'ajout d'un reçu, seuls
+    le récapitulatif et ce reçu sont rendus.
+    Avec `executor`, les conversions d'images sont réparties sur ses
+    processus. Les pièces jointes en échec sont ignorées et, si `errors` est
+    fourni, y sont ajoutées sous la forme (nom, message).
+
+    Une pièce jointe est décrite soit par ses octets ("bytes"), soit par son
+    empreinte ("sha256") dans `blob_store` : les PDF sont alors lus par mmap
+    et les images converties directement depuis le fichier du blob. Chaque
+    contenu distinct n'apparaît qu'une fois dans le PDF fusionné.
+
+    `progress(stage, done, total, detail)` est appelé au début de chaque étape
+    ("summary", "attachments" pour chaque pièce jointe, "write") ; une
+    exception levée par `progress` interrompt la génération (annulation).
+
+    Avec `target_size` (octets), si la somme des pièces jointes dépasse ce
+    que laisse le récapitulatif, les images et les scans sont réduits pour
+    que le PDF fusionné tienne dans la cible (voir _fit_budget), sans
+    reconstruire le PDF.
+
+    Chaque étape (récapitulatif, budget, chaque pièce jointe, écriture) est
+    mesurée dans `trace` (un BuildTrace neuf à défaut) : durée, octets lus
+    et produits, mémoire ; voir ndf.trace.
+
+    Returns:
+        fichier binaire positionné au début, à fermer par l'appelant
+    """
+    progress = progress or (lambda stage, done=0, total=0, detail="": None)
+    trace    = trace or BuildTrace()
+    # Fermé par le ramasse-miettes si la génération échoue ou est annulée.
+    out      = _spool(spool_max_bytes)
+    writer   = PdfStreamWriter(out)
+
+    progress("summary")
+    with trace.stage("summary", rows=len(df)) as span:
+        key = None
+        if page_cache is not None:
+            key = PageCache.key(None, "summary", summary_fingerprint(
+                df, name, company, cur, signature_b64, invoice_no, signature_name))
+        if key is not None and page_cache.append_pages(key, writer):
+            span["source"] = "cache"
+            summary_size   = page_cache.size(key) or 0
+        else:
+            span["source"] = "rendu"
+            with _spool(spool_max_bytes) as src:
+                _render_expense_pdf(src, df, name, company, cur, signature_b64, invoice_no,
+                                    signature_name)
+                summary_size = src.tell()
+                src.seek(0)
+                if key is not None:
+                    page_cache.put(key, src.read(), writer)
+                else:
+                    for page in PdfReader(src).pages:
+                        writer.add_page(page)
+        span["bytes_out"] = summary_size
+
+    items, seen = [], set()
+    for fdata in uploaded_files.values():
+        kind = "pdf" if fdata["is_pdf"] else "image" if fdata["is_image"] else None
+        if kind is None:
+            continue
+        # Un même contenu, référencé par plusieurs lignes ou importé sous deux
+        # noms, n'est converti et fusionné qu'une fois.
+        stored = fdata.get("sha256")
+        digest = stored or hashlib.sha256(fdata["bytes"]).hexdigest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        if stored is None:
+            source = fdata["bytes"]
+        elif blob_store is not None and blob_store.exists(digest):
+            blob_store.touch(digest)
+            source = blob_store.path(digest)
+        else:
+            if errors is not None:
+                errors.append((fdata["name"], "pièce jointe expirée, à importer de nouveau"))
+            continue
+        # Un PDF du magasin de blobs est lu directement par mmap : le mettre
+        # en cache ne ferait que dupliquer en mémoire un fichier déjà sur disque.
+        direct = stored is not None and kind == "pdf"
+        key    = PageCache.key(None, kind, digest) if page_cache is not None and not direct else None
+        cached = key is not None and key in page_cache
+        items.append((fdata, kind, source, key, cached, direct, None))
+
+    if target_size is not None:
+        with trace.stage("budget", bytes_in=target_size) as span:
+            fitted = _fit_budget(items, int(target_size * _BUDGET_MARGIN) - summary_size, progress)
+            span["reduced"] = sum(a is not b for a, b in zip(items, fitted))
+            items = fitted
+
+    # Seules les pièces absentes du cache sont converties, en parallèle si un
+    # `executor` est fourni ; les résultats reviennent dans l'ordre de saisie.
+    converted = normalize_attachments(
+        [(kind, source, budget) for _, kind, source, _, cached, direct, budget in items
+         if not (cached or direct)],
+        executor, reset_peak=trace.reset_peak,
+    )
+    try:
+        for done, (fdata, kind, source, key, cached, direct, budget) in enumerate(items):
+            progress("attachments", done, len(items), fdata["name"])
+            with trace.stage("attachment", fdata["name"], _source_size(source), kind=kind) as span:
+                _merge_attachment(span, writer, fdata, kind, source, key, cached, direct, budget,
+                                  page_cache, blob_store, converted)
+            if "error" in span and errors is not None:
+                errors.append((fdata["name"], span["error"]))
+    finally:
+        converted.close()   # annulation : conversions en attente abandonnées
+
+    progress("write", len(items), len(items))
+    with trace.stage("write", pages=writer.page_count) as span:
+        writer.close()
+        span["bytes_out"] = out.tell()
+    out.seek(0)
+    return out
+
+
+def _merge_attachment(span, writer, fdata, kind, source, key, cached, direct, budget,
+                      page_cache, blob_store, converted) -> None:
+    """
+    Ajoute au writer les pages d'une pièce jointe (cache, lecture directe ou
+    conversion) ; `span` reçoit la provenance, la taille produite et, en
+    cas d'échec, le message d'erreur.
+    """
+    if cached and page_cache.append_pages(key, writer):
+        span.update(source="cache", bytes_out=page_cache.size(key) or 0)
+        return
+    if direct:
+        span.update(source="direct", bytes_out=span["bytes_in"])
+        try:
+            with blob_store.open(fdata["sha256"]) as buf:
+                for page in PdfReader(buf).pages:
+                    writer.add_page(page)
+        except Exception as e:
+            span["error"] = str(e) or type(e).__name__
+        return
+    span["source"] = "conversion"
+    if cached:   # évincée entre-temps par une autre session
+        result = next(normalize_attachments([(kind, source, budget)]))
+    else:
+        result = next(converted)
+    span.update(result["worker"])
+    if result["error"] is not None:
+        span["error"] = result["error"]
+        return
+    span["bytes_out"] = len(result["pdf"])
+    try:
+        if key is not None:
+            page_cache.put(key, result["pdf"], writer)
+        else:
+            for page in PdfReader(io.BytesIO(result["pdf"])).pages:
+                writer.add_page(page)
+    except Exception as e:
+        span["error"] = str(e) or type(e).__name__
+
+
+def generate_full_pdf(df, name, company, cur, uploaded_files, signature_b64=None, invoice_no="",
+                      target_size=None, signature_name=None, trace=None):
+    """PDF fusionné = récapitulatif + toutes les pièces jointes."""
+    with stream_full_pdf(
+        df, name, company, cur, uploaded_files, signature_b64, invoice_no,
+        signature_name=signature_name, target_size=target_size, trace=trace,
+    ) as out:
+        return out.read()
@@ -0,0 +1,177 @@
+"""
+Optimisation des pièces jointes PDF à l'import.
+
+Les factures scannées arrivent souvent en 600 dpi, une image pleine page
+par page : la note finale devient trop lourde pour partir par mail. Chaque
+page est allégée puis copiée aussitôt (images ramenées à PDF_MAX_DPI en
+JPEG, flux de contenu compressés) ; les objets identiques (polices, logos
+répétés d'une page à l'autre) sont dédoublonnés avant l'écriture. Un chemin
+de fichier est lu par mmap : seule la page en cours est en mémoire. Seule
+l'API publique de pypdf (≥ 6.20, voir requirements.txt) est utilisée.
+"""
+
+import contextlib
+import io
+import math
+import mmap
+import os
+import time
+
+from PIL import Image as PILImage
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import NameObject
+
+from ndf.trace import peak_rss
+
+PDF_MAX_DPI       = int(os.environ.get("NDF_PDF_MAX_DPI", "150"))
+PDF_IMAGE_QUALITY = int(os.environ.get("NDF_PDF_IMAGE_QUALITY", "75"))
+
+PDF_MIN_DPI       = 72     # plancher du mode « taille cible » : encore lisible à l'écran
+
+_JPEG_MODES = ("L", "RGB")    # écrits par Pillow en DCTDecode, DeviceGray / DeviceRGB
+
+
+def _filters(obj) -> list:
+    f = obj.get("/Filter", [])
+    return [f] if isinstance(f, str) else list(f)
+
+
+def _decode_image(obj, name: str, page, size: tuple[int, int]):
+    """
+    Image PIL de l'XObject `obj`, décodée directement à une taille proche de
+    `size` quand c'est un JPEG (le décodeur réduit l'échelle par 1/2…1/8).
+    """
+    if _filters(obj)[-1:] == ["/DCTDecode"]:
+        img = PILImage.open(io.BytesIO(obj.get_data()))
+        img.draft(img.mode, size)
+        return img
+    return page.images[name].image
+
+
+def _downsample(xobjects, name: str, page, max_dpi: int, quality: int) -> bool:
+    """
+    Ramène l'image `name` des ressources `xobjects` de `page` (page du
+    lecteur) à `max_dpi` en JPEG. La résolution est estimée d'après la page :
+    une image pleine page donne sa vraie résolution, une petite image (logo)
+    n'est jamais réduite. L'image réduite, écrite par Pillow dans un PDF
+    d'une page, prend la place de l'originale dans les ressources : le
+    writer ne recopiera que celle-ci.
+    """
+    obj = xobjects[name]
+    if obj.get("/ImageMask") or "/SMask" in obj or "/Mask" in obj:
+        return False
+    if obj.get("/BitsPerComponent", 8) != 8:
+        return False
+    width, height = int(obj["/Width"]), int(obj["/Height"])
+    page_in = max(float(page.mediabox.width), float(page.mediabox.height)) / 72
+    dpi     = max(width, height) / page_in
+    if dpi <= max_dpi * 1.1:
+        return False
+    scale = max_dpi / dpi
+    size  = (max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale)))
+    try:
+        img = _decode_image(obj, name, page, size)
+        if img.mode not in _JPEG_MODES:
+            img = img.convert("RGB")
+        img = img.resize(size, PILImage.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="PDF", quality=quality, optimize=True)
+        ref = next(iter(PdfReader(out).pages[0]["/Resources"]["/XObject"].values()))
+    except Exception:
+        return False    # filtre ou espace de couleur non géré : image conservée
+    # Taille du flux décodé : le JPEG lui-même pour une image DCT.
+    if len(ref.get_object().get_data()) >= len(obj.get_data()):
+        return False
+    xobjects[NameObject(name)] = ref
+    return True
+
+
+@contextlib.contextmanager
+def _open_source(source):
+    """Tampon de lecture : mmap d'un chemin de fichier, ou les bytes eux-mêmes."""
+    if not isinstance(source, str):
+        yield source
+        return
+    with open(source, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def optimize_pdf_with_stats(source, max_dpi: int = PDF_MAX_DPI, quality: int = PDF_IMAGE_QUALITY):
+    """
+    Allège un PDF (bytes ou chemin de fichier) et décrit le résultat.
+
+    Returns:
+        (bytes, infos) où infos contient original_size, size (octets),
+        images (images vues), downsampled (images réduites), seconds,
+        peak_rss (pic du processus, octets) et, en cas d'échec, error. Si
+        le PDF optimisé n'est pas plus petit, l'original est renvoyé.
+    """
+    t0 = time.perf_counter()
+    with _open_source(source) as buf:
+        info = {"original_size": len(buf), "size": len(buf), "images": 0,
+                "downsampled": 0, "seconds": 0.0, "peak_rss": 0}
+        data = None
+        try:
+            writer = PdfWriter()
+            stream = io.BytesIO(buf) if isinstance(buf, bytes) else buf
+            reader = PdfReader(stream)
+            seen   = set()
+            for number in range(len(reader.pages)):
+                if reader is None:
+                    reader, seen = PdfReader(stream), set()
+                page     = reader.pages[number]
+                xobjects = page.get("/Resources", {}).get("/XObject", {})
+                replaced = 0
+                for name, ref in list(xobjects.items()):
+                    obj = ref.get_object()
+                    if obj.get("/Subtype") != "/Image" or id(obj) in seen:
+                        continue
+                    seen.add(id(obj))
+                    info["images"] += 1
+                    replaced       += _downsample(xobjects, name, page, max_dpi, quality)
+                writer.add_page(page).compress_content_streams()
+                info["downsampled"] += replaced
+                if replaced:
+                    # Le lecteur garde en cache tous les objets lus : il est
+                    # vidé (close) pour ne pas retenir les images d'origine,
+                    # puis rouvert à la page suivante. Les objets partagés
+                    # entre pages (polices) recopiés deux fois sont fusionnés
+                    # par compress_identical_objects.
+                    reader.close()
+                    reader = None
+            writer.compress_identical_objects(remove_duplicates=True, remove_unreferenced=True)
+            out = io.BytesIO()
+            writer.write(out)
+            data = out.getvalue()
+        except Exception as e:
+            info["error"] = str(e) or type(e).__name__
+        if data is None or len(data) >= len(buf):
+            data = bytes(buf)
+    info.update(size=len(data), seconds=time.perf_counter() - t0, peak_rss=peak_rss())
+    return data, info
+
+
+def optimize_pdf(source, max_dpi: int = PDF_MAX_DPI, quality: int = PDF_IMAGE_QUALITY) -> bytes:
+    """PDF allégé (voir optimize_pdf_with_stats)."""
+    return optimize_pdf_with_stats(source, max_dpi, quality)[0]
+
+
+def fit_pdf(source, max_bytes: int, size: int):
+    """
+    Réduit un PDF de `size` octets vers `max_bytes` en une passe.
+
+    Le poids d'un scan suit le nombre de pixels : la résolution cible est
+    PDF_MAX_DPI × √(max_bytes / size), sans descendre sous PDF_MIN_DPI (la
+    qualité JPEG baisse alors aussi). Un PDF sans image ne rétrécit pas :
+    l'appelant tient compte de la taille réellement obtenue.
+
+    Returns:
+        (bytes, infos) comme optimize_pdf_with_stats
+    """
+    dpi     = int(PDF_MAX_DPI * math.sqrt(min(1.0, max_bytes / size)))
+    quality = PDF_IMAGE_QUALITY if dpi >= PDF_MIN_DPI else min(PDF_IMAGE_QUALITY, 50)
+    return optimize_pdf_with_stats(source, max(dpi, PDF_MIN_DPI), quality)
@@ -0,0 +1,164 @@
+"""
+Écriture au fil de l'eau du PDF fusionné.
+
+PdfWriter (pypdf) garde en mémoire chaque page clonée jusqu'à write() : le
+pic de mémoire croît alors avec la somme des pièces jointes. PdfStreamWriter
+écrit au contraire chaque page, avec les objets qu'elle référence (contenu,
+polices, images), dès son ajout ; il ne retient que les décalages des objets
+pour la table xref finale. Une pièce jointe peut ainsi être lue, recopiée
+puis libérée avant que la suivante soit ouverte.
+
+Seules les pages sont reprises : signets, formulaires et structure des
+documents joints sont abandonnés, comme le faisait PdfWriter.add_page.
+"""
+
+import io
+
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject, NumberObject,
+    StreamObject,
+)
+
+_HEADER      = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"
+_PAGES_ID    = 1
+_CATALOG_ID  = 2
+_PAGE_SKIP   = ("/Parent", "/B")      # arbre des pages et articles du document d'origine
+_STREAM_MARK = b"\nstream\n"
+
+
+class PdfStreamWriter:
+    """
+    PDF écrit page par page dans le fichier binaire `out`.
+
+    add_page() accepte les pages d'un PdfReader (même interface que
+    PdfWriter.add_page) ; les objets partagés par plusieurs pages d'un même
+    document ne sont écrits qu'une fois. close() écrit l'arbre des pages, le
+    catalogue et la table xref, sans fermer `out`.
+    """
+
+    def __init__(self, out):
+        self.out        = out
+        self.page_count = 0
+        self._start     = out.tell()
+        self._offsets   = {}        # n° d'objet -> décalage dans le fichier
+        self._next_id   = _CATALOG_ID + 1
+        self._kids      = []
+        self._pages_ref = IndirectObject(_PAGES_ID, 0, None)
+        self._source    = None      # document des pages en cours de recopie
+        self._ids       = {}        # (n°, génération) d'origine -> nouvel IndirectObject
+        out.write(_HEADER)
+
+    def add_page(self, page) -> None:
+        """Écrit la page et tous les objets qu'elle référence."""
+        ref = page.indirect_reference
+        if ref is None:
+            new = self._new_ref()
+            self._write_all([(new, page)])
+        else:
+            if ref.pdf is not self._source:
+                # Nouveau document : les numéros d'objets d'origine repartent de zéro.
+                self._source, self._ids = ref.pdf, {}
+            key = (ref.idnum, ref.generation)
+            new = self._ids.get(key)
+            if new is None:
+                new = self._ids[key] = self._new_ref()
+                self._write_all([(new, page)])
+        self._kids.append(new)
+        self.page_count += 1
+
+    def close(self) -> None:
+        """Termine le fichier : arbre des pages, catalogue, xref et trailer."""
+        self._source, self._ids = None, {}
+        self._write_object(_PAGES_ID, DictionaryObject({
+            NameObject("/Type"):  NameObject("/Pages"),
+            NameObject("/Kids"):  ArrayObject(self._kids),
+            NameObject("/Count"): NumberObject(len(self._kids)),
+        }))
+        self._write_object(_CATALOG_ID, DictionaryObject({
+            NameObject("/Type"):  NameObject("/Catalog"),
+            NameObject("/Pages"): self._pages_ref,
+        }))
+        xref = self.out.tell() - self._start
+        size = self._next_id
+        self.out.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        self.out.write(b"".join(b"%010d 00000 n \n" % self._offsets[i] for i in range(1, size)))
+        self.out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                       % (size, _CATALOG_ID, xref))
+
+    # ─── Recopie des objets ───────────────────────────────────────────────
+    def _new_ref(self) -> IndirectObject:
+        ref = IndirectObject(self._next_id, 0, None)
+        self._next_id += 1
+        return ref
+
+    def _ref(self, ref: IndirectObject, pending: list) -> IndirectObject:
+        key = (ref.idnum, ref.generation)
+        new = self._ids.get(key)
+        if new is None:
+            new = self._ids[key] = self._new_ref()
+            pending.append((new, ref))
+        return new
+
+    def _write_all(self, pending: list) -> None:
+        """Écrit les objets en attente et, de proche en proche, ceux qu'ils référencent."""
+        while pending:
+            new, obj = pending.pop()
+            if isinstance(obj, IndirectObject):
+                obj = obj.get_object()
+            self._write_object(new.idnum, obj, pending)
+
+    def _write_object(self, idnum: int, obj, pending: list | None = None) -> None:
+        self._offsets[idnum] = self.out.tell() - self._start
+        self.out.write(b"%d 0 obj\n" % idnum)
+        if pending is None:      # arbre des pages et catalogue, déjà renumérotés
+            obj.write_to_stream(self.out)
+        elif isinstance(obj, StreamObject):
+            # Flux recopié tel quel (déjà compressé, déjà déchiffré par le
+            # lecteur) : seul son dictionnaire est renuméroté.
+            raw  = io.BytesIO()
+            obj.write_to_stream(raw)
+            buf  = raw.getbuffer()
+            body = buf[_find(buf, _STREAM_MARK):]
+            head = self._remap(DictionaryObject(obj), pending)
+            head[NameObject("/Length")] = NumberObject(
+                len(body) - len(_STREAM_MARK) - len(b"\nendstream"))
+            head.write_to_stream(self.out)
+            self.out.write(body)
+        else:
+            self._remap(obj, pending).write_to_stream(self.out)
+        self.out.write(b"\nendobj\n")
+
+    def _remap(self, obj, pending):
+        """Copie d'un objet direct dont les références pointent vers les nouveaux numéros."""
+        if isinstance(obj, IndirectObject):
+            return self._ref(obj, pending)
+        if isinstance(obj, DictionaryObject):
+            kind = obj.get("/Type")
+            if kind in ("/Pages", "/Catalog"):
+                return NullObject()   # atteint par un lien : pas d'arbre d'origine
+            copy = DictionaryObject()
+            for k, v in obj.items():
+                if kind == "/Page" and k in _PAGE_SKIP:
+                    continue
+                copy[NameObject(k)] = self._remap(v, pending)
+            if kind == "/Page":
+                copy[NameObject("/Parent")] = self._pages_ref
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._remap(v, pending) for v in obj)
+        return obj
+
+
+def _find(buf: memoryview, mark: bytes) -> int:
+    """
+    Position de `mark` dans un flux sérialisé, sans recopier le flux. Le
+    dictionnaire qui précède ne peut pas le contenir : pypdf y échappe les
+    retours à la ligne des chaînes et des noms.
+    """
+    step = 4096
+    for start in range(0, len(buf), step):
+        chunk = bytes(buf[start:start + step + len(mark)])
+        pos   = chunk.find(mark)
+        if pos >= 0:
+            return start + pos
+    raise ValueError("flux PDF sans mot-clé stream")
@@ -0,0 +1,135 @@
+"""
+Ordonnanceur des générations de PDF, partagé par toutes les sessions.
+
+Au plus `slots` générations tournent en même temps ; les autres attendent
+dans une file par utilisateur, servie à tour de rôle : un utilisateur qui
+lance dix notes ne fait pas attendre dix tours à celui qui en lance une.
+Chaque job terminé est journalisé (attente, durée, profondeur de file) sur
+le logger ndf.scheduler, que ndf.trace.configure_logging fait sortir.
+"""
+
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+
+PDF_JOB_SLOTS = int(os.environ.get("NDF_PDF_JOBS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+
+log = logging.getLogger(__name__)
+
+
+class JobScheduler:
+    """File équitable (tourniquet par utilisateur) devant `slots` threads de travail."""
+
+    def __init__(self, slots: int = PDF_JOB_SLOTS, history: int = 200):
+        self.slots     = slots
+        self._cond     = threading.Condition()
+        self._queues   = OrderedDict()          # utilisateur -> deque de jobs
+        self._running  = set()
+        self._waits    = deque(maxlen=history)  # secondes passées en file
+        self._runs     = deque(maxlen=history)  # secondes de génération
+        self.completed = 0
+        self.cancelled = 0
+        self.failed    = 0
+        for i in range(slots):
+            threading.Thread(target=self._work, name=f"ndf-pdf-slot-{i}", daemon=True).start()
+
+    def submit(self, job, user: str):
+        """Met `job` (PdfJob) en file pour `user` et le renvoie."""
+        with self._cond:
+            self._queues.setdefault(user, deque()).append(job)
+            self._cond.notify()
+        return job
+
+    def cancel(self, job) -> None:
+        """
+        Annule `job` ; s'il attend encore, il quitte la file et passe
+        aussitôt à l'état « annulé » sans rien exécuter dans le thread appelant.
+        """
+        with self._cond:
+            for user, queue in self._queues.items():
+                if job in queue:
+                    queue.remove(job)
+                    if not queue:
+                        del self._queues[user]
+                    break
+            else:
+                job.cancel()    # en cours : arrêt à la prochaine étape
+                return
+            self.cancelled += 1
+        job.mark_cancelled()
+
+    def _order(self) -> list:
+        """Jobs en attente dans l'ordre où ils seront servis."""
+        queues = [list(q) for q in self._queues.values()]
+        order  = []
+        for rank in range(max(map(len, queues), default=0)):
+            order.extend(q[rank] for q in queues if rank < len(q))
+        return order
+
+    def position(self, job) -> int | None:
+        """Rang de `job` dans la file (1 = le prochain servi) ; 0 s'il tourne, None s'il est inconnu."""
+        with self._cond:
+            if job in self._running:
+                return 0
+            order = self._order()
+        return order.index(job) + 1 if job in order else None
+
+    def _next(self):
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            user, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            # Tourniquet : l'utilisateur servi repasse en fin de file.
+            del self._queues[user]
+            if queue:
+                self._queues[user] = queue
+            self._running.add(job)
+            return job
+
+    def _work(self) -> None:
+        while True:
+            job = self._next()
+            try:
+                job.run()
+            except Exception:
+                log.exception("génération PDF interrompue")
+            with self._cond:
+                self._running.discard(job)
+                if job.started is not None:
+                    self._waits.append(job.started - job.created)
+                if job.finished is not None and job.started is not None:
+                    self._runs.append(job.finished - job.started)
+                if job.stage == "cancelled":
+                    self.cancelled += 1
+                elif job.stage == "done":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                depth = sum(map(len, self._queues.values()))
+            if job.finished is not None:
+                log.info("pdf job %s: attente %.2f s, génération %.2f s, file %d",
+                         job.stage, job.started - job.created, job.finished - job.started, depth)
+
+    def metrics(self) -> dict:
+        """Profondeur de file, occupation et temps d'attente récents (s)."""
+        with self._cond:
+            waits, runs = sorted(self._waits), sorted(self._runs)
+            queued = sum(map(len, self._queues.values()))
+            oldest = min((j.created for q in self._queues.values() for j in q), default=None)
+            return {
+                "slots":       self.slots,
+                "running":     len(self._running),
+                "queued":      queued,
+                "users":       len(self._queues),
+                "completed":   self.completed,
+                "cancelled":   self.cancelled,
+                "failed":      self.failed,
+                "wait_p50":    statistics.median(waits) if waits else 0.0,
+                "wait_p95":    waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "wait_oldest": time.monotonic() - oldest if oldest is not None else 0.0,
+                "run_p50":     statistics.median(runs) if runs else 0.0,
+            }
@@ -0,0 +1,113 @@
+"""
+Signature manuscrite stylisée générée à partir du nom du bénéficiaire, et
+normalisation des signatures importées.
+
+La police est résolue une fois par processus et chaque signature générée est
+gardée par nom. Dans le PDF, une signature générée est tracée en texte
+vectoriel (police TrueType embarquée en sous-ensemble, voir ndf.pdf) : aucune
+image n'y transite.
+"""
+
+import functools
+import io
+import os
+
+from PIL import Image as PILImage
+
+# Polices essayées dans l'ordre : (chemin, taille en px pour l'aperçu 1200×400).
+SIGNATURE_FONTS = [
+    # Serif Bold Italic (le plus proche d'une signature élégante)
+    ('/usr/share/fonts/truetype/liberation/LiberationSerif-BoldItalic.ttf', 180),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSerif-BoldItalic.ttf', 180),
+    # Fallback: Serif Italic normal
+    ('/usr/share/fonts/truetype/liberation/LiberationSerif-Italic.ttf', 200),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSerif-Italic.ttf', 200),
+    # Autres options cursives disponibles
+    ('/usr/share/fonts/truetype/google-fonts/Lora-Italic-Variable.ttf', 180),
+]
+# Largeur maximale (px) d'une signature importée, une fois normalisée.
+SIGNATURE_MAX_WIDTH = 1200
+
+
+@functools.lru_cache(maxsize=1)
+def resolve_font() -> tuple[str | None, int]:
+    """(chemin, taille) de la première police disponible ; (None, 180) sinon."""
+    from PIL import ImageFont
+    for font_path, size in SIGNATURE_FONTS:
+        if not os.path.exists(font_path):
+            continue
+        try:
+            ImageFont.truetype(font_path, size)
+            return font_path, size
+        except OSError:
+            pass
+    return None, 180
+
+
+@functools.lru_cache(maxsize=256)
+def generate_signature_from_name(name: str) -> bytes:
+    """Génère une signature manuscrite stylisée GRANDE avec le nom complet."""
+    from PIL import ImageDraw, ImageFont
+
+    # Nettoyer le nom
+    full_name = name.strip()
+    if not full_name:
+        full_name = "Signature"
+
+    # Dimensions pour signature très imposante
+    width, height = 1200, 400
+    img = PILImage.new('RGBA', (width, height), (255, 255, 255, 0))
+    draw = ImageDraw.Draw(img)
+
+    font_path, size = resolve_font()
+    font = ImageFont.truetype(font_path, size) if font_path else ImageFont.load_default()
+
+    # Calculer position centrée
+    bbox = draw.textbbox((0, 0), full_name, font=font)
+    text_width = bbox[2] - bbox[0]
+    text_height = bbox[3] - bbox[1]
+    x = (width - text_width) // 2
+    y = (height - text_height) // 2 - 30
+
+    # Dessiner en noir encre
+    draw.text((x, y), full_name, fill=(10, 10, 10, 255), font=font)
+
+    # Paraphe élégant sous la signature (lignes plus épaisses)
+    line_y = y + text_height + 25
+    line_start = max(60, x - 40)
+    line_end = min(width - 60, x + text_width + 40)
+
+    # Ligne principale épaisse
+    draw.line([(line_start, line_y), (line_end, line_y)],
+              fill=(10, 10, 10, 255), width=6)
+    # Ligne secondaire plus fine
+    draw.line([(line_start + 20, line_y + 12), (line_end - 20, line_y + 12)],
+              fill=(10, 10, 10, 200), width=3)
+
+    # Convertir en PNG
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    buf.seek(0)
+    return buf.read()
+
+
+def normalize_signature(image_bytes: bytes) -> bytes:
+    """
+    Signature importée prête pour le PDF, calculée une fois à l'import :
+    redressée, aplatie sur fond blanc, ramenée à SIGNATURE_MAX_WIDTH et
+    encodée en JPEG, que ReportLab intègre tel quel sans le décoder.
+    """
+    from PIL import ImageOps
+    img = ImageOps.exif_transpose(PILImage.open(io.BytesIO(image_bytes)))
+    if img.mode in ("RGBA", "LA", "P"):
+        rgba = img.convert("RGBA")
+        img  = PILImage.new("RGB", rgba.size, (255, 255, 255))
+        img.paste(rgba, mask=rgba.split()[-1])
+    elif img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    if img.width > SIGNATURE_MAX_WIDTH:
+        img = img.resize((SIGNATURE_MAX_WIDTH, round(img.height * SIGNATURE_MAX_WIDTH / img.width)),
+                         PILImage.Resampling.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
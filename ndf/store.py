@@ -0,0 +1,168 @@
+"""
+Tableau des dépenses d'une session, stocké par colonnes.
+
+Les montants sont gardés en centimes entiers et les totaux par catégorie
+sont tenus à jour à chaque modification : le récapitulatif ne relit jamais
+les lignes. Les modifications du st.data_editor (lignes modifiées, ajoutées,
+supprimées) s'appliquent comme des mises à jour ponctuelles, et le DataFrame
+affiché n'est reconstruit qu'après un changement. Les lignes touchées depuis
+le dernier archivage sont suivies (changes) : l'archive n'enregistre qu'elles.
+"""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from ndf.config import ATTACHMENT_KEY, EXPENSE_CATEGORIES
+from ndf.money import as_cents
+
+TEXT_FIELDS = ["Date", "Fournisseur", "Objet", "Type", "Imputation budgétaire", "Justificatif"]
+
+
+def amount_column(cur: str) -> str:
+    return f"Montant TTC ({cur})"
+
+
+def _text(value) -> str:
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return str(value)
+
+
+class ExpenseStore:
+    """
+    Colonnes typées (texte, centimes) et totaux courants par catégorie.
+
+    Les lignes sont repérées par leur position, comme dans st.data_editor.
+    Le montant est indépendant de la devise : `cur` ne sert qu'à nommer la
+    colonne « Montant TTC (…) » en entrée et en sortie.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self._text    = {c: [] for c in TEXT_FIELDS + [ATTACHMENT_KEY]}
+        self._cents   = []
+        self.totals   = dict.fromkeys(EXPENSE_CATEGORIES, 0)
+        self.refs     = Counter()   # clé de pièce jointe -> nombre de lignes
+        self.version  = 0
+        self._frame   = None        # (version, devise, DataFrame)
+        self._dirty   = set()       # positions ajoutées ou modifiées depuis commit_changes()
+        self._shifted = 0           # position à partir de laquelle tout est à réenregistrer
+
+    def __len__(self) -> int:
+        return len(self._cents)
+
+    @property
+    def grand_total(self) -> int:
+        return sum(self.totals.values())
+
+    def incomplete(self) -> int:
+        """Lignes sans montant ou sans fournisseur (brouillons de l'import groupé…)."""
+        return sum(c is None or not s for c, s in zip(self._cents, self._text["Fournisseur"]))
+
+    # ── Totaux courants ──────────────────────────────────────────────────────
+    def _count(self, i: int, sign: int) -> None:
+        rtype, cents = self._text["Type"][i], self._cents[i]
+        if rtype in self.totals and cents is not None:
+            self.totals[rtype] += sign * cents
+        key = self._text[ATTACHMENT_KEY][i]
+        if key:
+            self.refs[key] += sign
+            if self.refs[key] <= 0:
+                del self.refs[key]
+
+    def _changed(self) -> None:
+        self.version += 1
+        self._frame   = None
+
+    # ── Mises à jour ─────────────────────────────────────────────────────────
+    def append(self, row: dict, cur: str) -> None:
+        for c, col in self._text.items():
+            col.append(_text(row.get(c)))
+        self._cents.append(as_cents(row.get(amount_column(cur))))
+        self._count(len(self._cents) - 1, +1)
+        self._dirty.add(len(self._cents) - 1)
+        self._changed()
+
+    def extend(self, rows, cur: str) -> None:
+        for row in rows:
+            self.append(row, cur)
+
+    def update(self, i: int, changes: dict, cur: str) -> None:
+        """Modifie les champs `changes` de la ligne `i`."""
+        self._count(i, -1)
+        for c, value in changes.items():
+            if c == amount_column(cur):
+                self._cents[i] = as_cents(value)
+            elif c in self._text and c != ATTACHMENT_KEY:
+                self._text[c][i] = _text(value)
+        self._count(i, +1)
+        self._dirty.add(i)
+        self._changed()
+
+    def delete(self, positions) -> None:
+        drop = set(positions)
+        if not drop:
+            return
+        for i in drop:
+            self._count(i, -1)
+        keep = [i for i in range(len(self._cents)) if i not in drop]
+        self._cents = [self._cents[i] for i in keep]
+        for c, col in self._text.items():
+            self._text[c] = [col[i] for i in keep]
+        # Les lignes suivantes changent de position : toutes à réenregistrer.
+        self._shifted = min(self._shifted, min(drop))
+        self._changed()
+
+    def apply_editor_diff(self, diff: dict, cur: str) -> None:
+        """
+        Applique l'état d'un st.data_editor : {"edited_rows": {position:
+        {colonne: valeur}}, "added_rows": [{colonne: valeur}], "deleted_rows":
+        [position]}, positions relatives aux données affichées.
+        """
+        for i, changes in diff.get("edited_rows", {}).items():
+            self.update(int(i), changes, cur)
+        self.extend(diff.get("added_rows", []), cur)
+        self.delete(int(i) for i in diff.get("deleted_rows", []))
+
+    # ── Lecture ──────────────────────────────────────────────────────────────
+    def frame(self, cur: str) -> pd.DataFrame:
+        """DataFrame des lignes, reconstruit seulement après une modification."""
+        if self._frame is not None and self._frame[:2] == (self.version, cur):
+            return self._frame[2]
+        cents = np.array([np.nan if c is None else c for c in self._cents], dtype=float)
+        data  = {c: self._text[c] for c in ["Date", "Fournisseur", "Objet", "Type"]}
+        data[amount_column(cur)] = cents / 100
+        for c in ["Imputation budgétaire", "Justificatif", ATTACHMENT_KEY]:
+            data[c] = self._text[c]
+        df = pd.DataFrame(data)
+        self._frame = (self.version, cur, df)
+        return df
+
+    def changes(self, cur: str, with_keys: bool = False) -> dict[int, dict]:
+        """
+        Lignes ajoutées ou modifiées depuis le dernier commit_changes(),
+        par position (celles décalées par une suppression comprises).
+        """
+        n         = len(self._cents)
+        positions = sorted({i for i in self._dirty if i < n} | set(range(self._shifted, n)))
+        return {i: self._row(i, amount_column(cur), with_keys) for i in positions}
+
+    def commit_changes(self) -> None:
+        """Les lignes actuelles sont enregistrées : plus rien à reporter."""
+        self._dirty   = set()
+        self._shifted = len(self._cents)
+
+    def records(self, cur: str, with_keys: bool = False):
+        """Lignes au format dict (export Excel…), clé de pièce jointe comprise si `with_keys`."""
+        amt_col = amount_column(cur)
+        for i in range(len(self._cents)):
+            yield self._row(i, amt_col, with_keys)
+
+    def _row(self, i: int, amt_col: str, with_keys: bool) -> dict:
+        row = {c: col[i] for c, col in self._text.items() if with_keys or c != ATTACHMENT_KEY}
+        row[amt_col] = None if self._cents[i] is None else self._cents[i] / 100
+        return row
@@ -0,0 +1,234 @@
+"""
+Mesures de la génération PDF, étape par étape.
+
+Un BuildTrace accompagne une génération (ou un import groupé) : chaque
+étape (récapitulatif, chaque pièce jointe, écriture) y note sa durée, les
+octets lus et produits et la mémoire du processus, et part aussitôt dans le
+journal « ndf.trace » sous forme d'une ligne JSON. Le journal « ndf » est
+dirigé vers stderr ou un fichier par configure_logging (NDF_TRACE).
+
+Une conversion faite dans un processus du pool y est mesurée par measured() :
+l'étape reçoit sa durée et sa mémoire dans le processus (worker_*), en plus
+de l'attente du thread de génération. Sur demande, la génération entière est
+profilée avec cProfile (thread de génération seulement).
+
+Le pic de mémoire (VmHWM) n'est remis à zéro que sur demande (`reset_peak`) :
+c'est un état du noyau pour tout le processus, que les autres sessions du
+serveur mesurent aussi. Sans remise à zéro, chaque étape note la variation
+de mémoire résidente (rss_delta) et le pic depuis le démarrage du processus.
+"""
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import uuid
+
+from ndf.config import TRACE_LOG
+
+log = logging.getLogger(__name__)
+
+# Un seul profileur actif à la fois (Python ≥ 3.12 refuse le second).
+_PROFILE_LOCK = threading.Lock()
+_HANDLER_NAME = "ndf-trace"
+
+
+def configure_logging(target: str = TRACE_LOG) -> None:
+    """
+    Dirige le journal « ndf » (étapes des générations, métriques de la file)
+    au niveau INFO vers stderr ("stderr" ou "1") ou vers le fichier `target` ;
+    "" ou "0" le laisse tel quel. Sans effet si c'est déjà fait.
+    """
+    logger = logging.getLogger("ndf")
+    if target in ("", "0") or any(h.get_name() == _HANDLER_NAME for h in logger.handlers):
+        return
+    handler = (logging.StreamHandler() if target in ("1", "stderr")
+               else logging.FileHandler(target, encoding="utf-8"))
+    handler.set_name(_HANDLER_NAME)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def _proc_status(field: str) -> int | None:
+    """Champ mémoire (octets) de /proc/self/status, None hors Linux."""
+    with contextlib.suppress(OSError):
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    return None
+
+
+def peak_rss() -> int:
+    """
+    Pic de mémoire résidente du processus (octets). Sous Linux, VmHWM : à la
+    différence de ru_maxrss, il n'hérite pas du pic du processus parent.
+    """
+    peak = _proc_status("VmHWM:")
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_peak_rss() -> bool:
+    """
+    Ramène VmHWM à la mémoire résidente actuelle (Linux, /proc/self/clear_refs),
+    pour que peak_rss() donne le pic à partir de maintenant ; False si
+    impossible (le pic reste alors celui de toute la vie du processus).
+    Réservé aux mesures isolées (profilage, batch, bench) : la remise à zéro
+    vaut pour tout le processus.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss() -> int:
+    """Mémoire résidente actuelle du processus (octets), 0 si inconnue."""
+    return _proc_status("VmRSS:") or 0
+
+
+def measured(func, *args, reset_peak: bool = False, **kwargs):
+    """
+    Exécute func(*args, **kwargs), typiquement dans un processus du pool ;
+    renvoie (résultat, {"worker_seconds", "worker_rss_delta",
+    "worker_peak_rss", "worker_pid"}). Le pic est celui de l'appel avec
+    `reset_peak`, sinon celui du processus depuis son démarrage.
+    Les exceptions de func remontent telles quelles.
+    """
+    rss0 = current_rss()
+    if reset_peak:
+        reset_peak_rss()
+    t0     = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, {"worker_seconds": round(time.perf_counter() - t0, 4),
+                    "worker_rss_delta": current_rss() - rss0,
+                    "worker_peak_rss": peak_rss(), "worker_pid": os.getpid()}
+
+
+class BuildTrace:
+    """
+    Étapes d'une génération : {"stage", "name", "seconds", "bytes_in",
+    "bytes_out", "rss", "rss_delta", "peak_rss", …}. La mémoire est celle du
+    processus entier (partagée avec les autres sessions) : `rss` est relevée
+    en fin d'étape et `rss_delta` est sa variation pendant l'étape.
+    `peak_rss` est le pic du processus depuis son démarrage ; avec
+    `reset_peak=True` (profilage, batch, bench), VmHWM est remis à zéro au
+    début de chaque étape (voir reset_peak_rss) et c'est le pic de l'étape,
+    conversions du pool comprises. Deux étapes simultanées, dans deux
+    sessions, se partagent ce pic.
+
+    `kind` préfixe les événements du journal : "pdf" (pdf_stage, pdf_build)
+    ou "ingest" pour un import groupé.
+
+    Avec `profile=True`, profiled() enregistre un profil cProfile de la
+    génération : `profile_text` (fonctions les plus coûteuses) et
+    `profile_bytes` (fichier .prof pour snakeviz / pstats).
+    """
+
+    def __init__(self, profile: bool = False, kind: str = "pdf", reset_peak: bool = False,
+                 **context):
+        self.build_id      = uuid.uuid4().hex[:12]
+        self.kind          = kind
+        self.reset_peak    = reset_peak
+        self.context       = context        # utilisateur, nombre de lignes…
+        self.spans         = []
+        self.profile       = profile
+        self.profile_text  = ""
+        self.profile_bytes = b""
+        self._lock         = threading.Lock()
+        self._t0           = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, stage: str, name: str = "", bytes_in: int = 0, **extra):
+        """
+        Mesure le bloc ; le dict produit peut être complété dans le bloc
+        (bytes_out, source…). Il est enregistré même si le bloc échoue.
+        """
+        span = {"stage": stage, "name": name, "bytes_in": bytes_in, "bytes_out": 0, **extra}
+        rss0 = current_rss()
+        if self.reset_peak:
+            reset_peak_rss()
+        t0   = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            rss = current_rss()
+            span.update(seconds=round(time.perf_counter() - t0, 4),
+                        rss=rss, rss_delta=rss - rss0, peak_rss=peak_rss())
+            with self._lock:
+                self.spans.append(span)
+            log.info(json.dumps({"event": f"{self.kind}_stage", "build": self.build_id, **span},
+                                ensure_ascii=False))
+
+    def finish(self, status: str) -> dict:
+        """Ligne de synthèse de la génération (journalisée et renvoyée)."""
+        with self._lock:
+            peak = max([s["peak_rss"] for s in self.spans] + [peak_rss()])
+        summary = {"event": f"{self.kind}_build", "build": self.build_id, "status": status,
+                   "seconds": round(time.perf_counter() - self._t0, 4),
+                   "stages": self.totals(), "peak_rss": peak, **self.context}
+        log.info(json.dumps(summary, ensure_ascii=False))
+        return summary
+
+    def totals(self) -> dict:
+        """Secondes cumulées par étape."""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                totals[span["stage"]] = round(totals.get(span["stage"], 0.0) + span["seconds"], 4)
+        return totals
+
+    @contextlib.contextmanager
+    def profiled(self, top: int = 30):
+        """
+        Profile le bloc avec cProfile si `profile` est demandé. Un seul profil
+        à la fois : si une autre génération est déjà profilée, le bloc
+        s'exécute sans profil (`profile_text` l'indique).
+        """
+        if not self.profile:
+            yield
+            return
+        profiler = None
+        if _PROFILE_LOCK.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:    # autre outil de profilage actif (Python ≥ 3.12)
+                _PROFILE_LOCK.release()
+                profiler = None
+        if profiler is None:
+            self.profile_text = "Profil non pris : une autre génération était déjà profilée."
+            yield
+            return
+        try:
+            yield
+        finally:
+            profiler.disable()
+            _PROFILE_LOCK.release()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            self.profile_text = out.getvalue()
+            profiler.create_stats()
+            self.profile_bytes = marshal.dumps(profiler.stats)   # format de dump_stats
+            path = os.environ.get("NDF_PROFILE_DIR")
+            if path:
+                os.makedirs(path, exist_ok=True)
+                profiler.dump_stats(os.path.join(path, f"pdf-{self.build_id}.prof"))
+
@@ -0,0 +1,43 @@
+"""
+Utilitaires sans dépendance lourde, partagés par l'interface et le moteur PDF.
+"""
+
+from datetime import date
+
+
+# ─── Numéro de facture ────────────────────────────────────────────────────────
+def build_invoice_number(lastname: str) -> str:
+    """Construit le N° de facture au format NDFNOMYYMM."""
+    nom_clean = "".join(c for c in lastname.strip().upper() if c.isalnum())
+    today     = date.today()
+    return f"NDF{nom_clean}{today.strftime('%y%m')}"
+
+
+# ─── Montants ─────────────────────────────────────────────────────────────────
+THIN_NBSP = "\u202f"   # séparateur des milliers : espace fine insécable
+# Les polices standard des PDF (Helvetica, WinAnsi) n'ont pas l'espace fine :
+# le PDF utilise l'espace insécable ordinaire.
+PDF_NBSP  = "\u00a0"
+
+
+def fmt_cents(cents: int, sep: str = THIN_NBSP) -> str:
+    """Formate un montant en centimes entiers : -1 234,56"""
+    euros, dec = divmod(abs(int(cents)), 100)
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{euros:,}".replace(",", sep) + f",{dec:02d}"
+
+
+def fmt_fr(value) -> str:
+    """
+    Formate un montant en notation française avec espace fine : 1 234,56
+
+    Le montant est d'abord arrondi au centime (1.999 → 2,00) ; le signe est
+    conservé (-0.5 → -0,50). Pour une colonne entière, voir
+    ndf.money.format_cents.
+    """
+    if value == "" or value is None:
+        return ""
+    try:
+        return fmt_cents(round(float(value) * 100))
+    except Exception:
+        return str(value)
@@ -0,0 +1,36 @@
+"""Archive : le PDF généré vit dans le BlobStore, la note n'en garde que l'empreinte."""
+
+import io
+import sqlite3
+
+from ndf.archive import ExpenseArchive
+from ndf.blobs import BlobStore
+
+
+def test_generated_pdf_is_a_kept_blob(tmp_path):
+    archive = ExpenseArchive(str(tmp_path / "archive.db"))
+    store   = BlobStore(str(tmp_path / "blobs"), keep=archive.blob_digests)
+    archive.save_note("NDFDUPONT2610", "Jean Dupont", "IFEA SAS", "€", [])
+
+    first  = store.put_file(io.BytesIO(b"%PDF-1 " * 100_000))
+    assert archive.save_pdf("NDFDUPONT2610", first, store.size(first))
+    second = store.put_file(io.BytesIO(b"%PDF-2 " * 100_000))
+    assert archive.save_pdf("NDFDUPONT2610", second, store.size(second))
+    assert not archive.save_pdf("NDFINCONNU", second, 1)
+
+    note = archive.note("NDFDUPONT2610")
+    assert (note["status"], note["pdf_sha256"], note["pdf_size"]) == ("générée", second, 700_000)
+    store.sweep(now=2e10)    # tous les blobs expirés
+    assert store.exists(second) and not store.exists(first)
+    assert store.read(second) == b"%PDF-2 " * 100_000
+
+
+def test_version_1_pdf_table_is_dropped(tmp_path):
+    path = str(tmp_path / "archive.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE note_pdfs (invoice_no TEXT PRIMARY KEY, pdf BLOB NOT NULL)")
+        conn.execute("PRAGMA user_version = 1")
+    ExpenseArchive(path).close()
+    with sqlite3.connect(path) as conn:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "note_pdfs" not in tables and "notes" in tables
@@ -0,0 +1,37 @@
+"""Génération en lot : un fichier de sortie distinct par note, même entre homonymes."""
+
+import os
+
+from ndf.batch import _output_paths, run_batch
+
+
+def _note(firstname, lastname, company="IFEA SAS", currency="€"):
+    return {"firstname": firstname, "lastname": lastname, "company": company,
+            "currency": currency, "attachments": [],
+            "rows": [{"Date": "01/10/2026", "Fournisseur": "SNCF", "Objet": "Train",
+                      "Type": "TRANSPORT - CARBURANT", f"Montant TTC ({currency})": 42.0,
+                      "Imputation budgétaire": "", "Justificatif": ""}]}
+
+
+def test_output_paths_distinct_for_shared_surname(tmp_path):
+    notes = [_note("Jean", "Dupont"), _note("Jean", "Dupont", currency="$"),
+             _note("Jean", "Du Pont"), _note("Paul", "Martin")]
+    paths = _output_paths(notes, str(tmp_path))
+    assert len(set(paths)) == len(paths)
+
+
+def test_run_batch_writes_one_pdf_per_note(tmp_path):
+    notes   = [_note("Jean", "Dupont"), _note("Jean", "Dupont", currency="$"),
+               _note("Jean", "Du Pont")]
+    results = run_batch(notes, str(tmp_path))
+    assert [r["error"] for r in results] == [None, None, None]
+    assert len(os.listdir(tmp_path)) == 3
+    assert all(r["size"] == os.path.getsize(r["path"]) for r in results)
+
+
+def test_run_batch_refuses_reused_output_path(tmp_path, monkeypatch):
+    same = str(tmp_path / "NDFDUPONT.pdf")
+    monkeypatch.setattr("ndf.batch._output_paths", lambda notes, out_dir: [same, same])
+    results = run_batch([_note("Jean", "Dupont"), _note("Jeanne", "Dupont")], str(tmp_path))
+    assert results[0]["error"] is None
+    assert "déjà utilisé" in results[1]["error"]
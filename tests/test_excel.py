@@ -0,0 +1,65 @@
+"""Export puis import Excel du tableau des dépenses."""
+
+import io
+
+from ndf.excel import read_expenses_xlsx, write_expenses_xlsx
+from ndf.store import ExpenseStore
+
+AMOUNT = "Montant TTC (€)"
+
+
+def _row(fournisseur: str, rtype: str, amount, **extra) -> dict:
+    return {"Date": "02/10/2026", "Fournisseur": fournisseur, "Objet": "Mission Lyon",
+            "Type": rtype, AMOUNT: amount, "Imputation budgétaire": "",
+            "Justificatif": "", **extra}
+
+
+def test_round_trip_keeps_draft_rows():
+    store = ExpenseStore()
+    store.extend([
+        _row("SNCF", "TRANSPORT - CARBURANT", 1234.56, Justificatif="billet.pdf"),
+        _row("Ibis", "HOTEL-HEBERGEMENT", 0.07),
+        _row("Taxi", "TRANSPORT - CARBURANT", None),       # brouillon : montant à saisir
+        _row("Orange", "TELEPHONE", 1_000_000_000.01),
+    ], "€")
+    out = io.BytesIO()
+    write_expenses_xlsx(store.records("€"), "€", out)
+    out.seek(0)
+
+    rows, errors = read_expenses_xlsx(out, "€")
+    assert errors == []
+    assert rows == list(store.records("€"))
+    back = ExpenseStore()
+    back.extend(rows, "€")
+    assert back.totals == store.totals
+    assert back.incomplete() == store.incomplete() == 1
+
+
+def _sheet(header: list, *rows: list) -> io.BytesIO:
+    from openpyxl import Workbook
+    wb = Workbook()
+    wb.active.append(header)
+    for row in rows:
+        wb.active.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+def test_other_currency_is_rejected():
+    flat = _sheet(["Date", "Fournisseur", "Type", "Montant TTC ($)"],
+                  ["02/10/2026", "Uber", "TRANSPORT - CARBURANT", 12.5])
+    rows, errors = read_expenses_xlsx(flat, "€")
+    assert rows == [] and len(errors) == 1 and "Montant TTC ($)" in errors[0]
+
+    exported = io.BytesIO()
+    write_expenses_xlsx([_row("Uber", "TRANSPORT - CARBURANT", 12.5)], "$", exported)
+    exported.seek(0)
+    rows, errors = read_expenses_xlsx(exported, "€")
+    assert rows == [] and len(errors) == 1
+
+    same = _sheet(["Date", "Fournisseur", "Type", "Montant TTC (€)"],
+                  ["02/10/2026", "Uber", "TRANSPORT - CARBURANT", 12.5])
+    rows, errors = read_expenses_xlsx(same, "€")
+    assert errors == [] and rows[0][AMOUNT] == 12.5
@@ -0,0 +1,35 @@
+"""Réduction d'une photo au budget du PDF fusionné (fit_image)."""
+
+import io
+
+import pytest
+from PIL import Image as PILImage
+
+from ndf import images
+from ndf.images import fit_image
+
+
+@pytest.fixture(scope="module")
+def photo() -> bytes:
+    """Photo 12 MP bruitée : la qualité plancher ne suffit pas, la largeur baisse."""
+    out = io.BytesIO()
+    PILImage.effect_noise((4000, 3000), 30).convert("RGB").save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("budget", [20_000, 30_000, 45_000])
+def test_fit_image_uses_the_budget(photo, budget, monkeypatch):
+    widths = []
+    encode = images.compress_image_with_stats
+
+    def spy(*args, **kwargs):
+        widths.append(kwargs.get("max_width"))
+        return encode(*args, **kwargs)
+
+    monkeypatch.setattr(images, "compress_image_with_stats", spy)
+    data = fit_image(photo, budget)
+    assert 0.85 * budget <= len(data) <= budget
+    # Après la réduction de largeur, la dichotomie garde la largeur réduite.
+    reduced = widths.index(next(w for w in widths if w is not None))
+    assert len(set(widths[reduced:])) == 1
+    assert PILImage.open(io.BytesIO(data)).width == widths[-1]
@@ -0,0 +1,36 @@
+"""Formatage vectorisé des centimes (format_cents)."""
+
+import numpy as np
+import pandas as pd
+
+from ndf.money import format_cents
+from ndf.utils import THIN_NBSP
+
+
+def _reference(cents: int) -> str:
+    """Formatage scalaire attendu : « -1 234,56 »."""
+    euros, rest = divmod(abs(cents), 100)
+    text = f"{euros:,}".replace(",", " ") + f",{rest:02d}"
+    return "-" + text if cents < 0 else text
+
+
+def test_edge_values():
+    cents = pd.Series([-123456, 0, 5, -7, 99, -100, 100_000_000_000, 123456789012, None],
+                      dtype="Int64")
+    assert format_cents(cents, sep=" ").tolist() == [
+        "-1 234,56", "0,00", "0,05", "-0,07", "0,99", "-1,00",
+        "1 000 000 000,00", "1 234 567 890,12", ""]
+
+
+def test_blank_zero_and_separator():
+    cents = pd.Series([0, None, 123456], dtype="Int64", index=[4, 7, 9])
+    text  = format_cents(cents, blank_zero=True)
+    assert text.tolist() == ["", "", f"1{THIN_NBSP}234,56"]
+    assert list(text.index) == [4, 7, 9]
+    assert format_cents(pd.Series([], dtype="Int64")).tolist() == []
+
+
+def test_matches_scalar_formatting():
+    rng   = np.random.default_rng(0)
+    cents = np.concatenate([rng.integers(-10**13, 10**13, 500), rng.integers(-1000, 1000, 500)])
+    assert format_cents(cents, sep=" ").tolist() == [_reference(int(c)) for c in cents]
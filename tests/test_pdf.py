@@ -0,0 +1,96 @@
+"""Récapitulatif PDF : totaux reportés d'une page à l'autre, flux binaires sans ASCII85."""
+
+import io
+
+import pandas as pd
+from PIL import Image as PILImage
+from pypdf import PdfReader
+from reportlab import rl_config
+from reportlab.platypus import Table
+
+from ndf.images import make_executor
+from ndf.pdf import TABLE_CATEGORIES, _expense_table_story, generate_expense_pdf, stream_full_pdf
+from ndf.utils import PDF_NBSP, fmt_cents
+
+
+def _expenses(n: int) -> pd.DataFrame:
+    """`n` lignes réparties sur les catégories ; une sur sept sans montant (brouillon)."""
+    return pd.DataFrame([{
+        "Date": "01/10/2026", "Fournisseur": f"Fournisseur {i}",
+        "Objet": "Déplacement client, long libellé qui passe sur deux lignes " * (i % 5 == 0),
+        "Type": TABLE_CATEGORIES[i % len(TABLE_CATEGORIES)],
+        "Montant TTC (€)": None if i % 7 == 3 else round(12.34 * (i + 1) - 0.01 * i, 2),
+        "Imputation budgétaire": "", "Justificatif": "",
+    } for i in range(n)])
+
+
+def _amounts(row: list) -> list[int]:
+    """Centimes des colonnes montants (catégories puis TOTAL) d'une ligne du tableau."""
+    return [int(v.replace(PDF_NBSP, "").replace(",", "")) if v else 0 for v in row[4:]]
+
+
+def _expected(df: pd.DataFrame, end: int) -> list[int]:
+    """Totaux cumulés des `end` premières lignes, calculés indépendamment."""
+    sums = [0] * (len(TABLE_CATEGORIES) + 1)
+    for _, row in df.iloc[:end].iterrows():
+        if pd.notna(row["Montant TTC (€)"]):
+            cents = round(row["Montant TTC (€)"] * 100)
+            sums[TABLE_CATEGORIES.index(row["Type"])] += cents
+            sums[-1] += cents
+    return sums
+
+
+def test_carried_totals_across_pages():
+    df     = _expenses(150)
+    tables = [f for f in _expense_table_story(df, "€") if isinstance(f, Table)]
+    assert len(tables) >= 3
+
+    end = 0
+    for i, table in enumerate(tables):
+        rows = table._cellvalues
+        body = rows[2:-1] if i else rows[1:-1]
+        if i:
+            assert rows[1][0] == "Report"
+            assert _amounts(rows[1]) == _amounts(tables[i - 1]._cellvalues[-1])
+            assert _amounts(rows[1]) == _expected(df, end)
+        end += len(body)
+        last = rows[-1]
+        assert last[0] == ("TOTAUX" if i == len(tables) - 1 else "À reporter")
+        assert _amounts(last) == _expected(df, end)
+    assert end == len(df)
+    assert fmt_cents(_expected(df, end)[-1], PDF_NBSP) == tables[-1]._cellvalues[-1][-1]
+
+
+def test_each_table_chunk_fits_one_page():
+    df     = _expenses(150)
+    chunks = sum(isinstance(f, Table) for f in _expense_table_story(df, "€"))
+    reader = PdfReader(io.BytesIO(generate_expense_pdf(df, "Jean Dupont", "IFEA SAS", "€")))
+    texts  = [p.extract_text() for p in reader.pages]
+    pages  = [t for t in texts if "Objet (Description)" in t]
+    # Un tableau débordant serait coupé par ReportLab : page sans ligne de clôture.
+    assert len(pages) == chunks
+    assert all(("À reporter" in t) != ("TOTAUX" in t) for t in pages)
+    assert sum("À reporter" in t for t in texts) == chunks - 1
+    assert sum("Report" in t.replace("À reporter", "") for t in texts) == chunks - 1
+    assert sum("TOTAUX" in t for t in texts) == 1
+
+
+def test_no_ascii85_streams(monkeypatch):
+    # Valeur par défaut de ReportLab : le moteur doit la régler lui-même,
+    # dans ce processus comme dans les processus de conversion.
+    monkeypatch.setattr(rl_config, "useA85", 1)
+    uploaded = {}
+    for i, fmt in enumerate(["JPEG", "PNG"]):
+        out = io.BytesIO()
+        PILImage.effect_noise((320, 240), 40).convert("RGB").save(out, format=fmt)
+        uploaded[str(i)] = {"bytes": out.getvalue(), "name": f"ticket.{fmt.lower()}",
+                            "is_pdf": False, "is_image": True}
+
+    summary = generate_expense_pdf(_expenses(3), "Jean Dupont", "IFEA SAS", "€")
+    with make_executor(1) as executor:
+        with stream_full_pdf(_expenses(3), "Jean Dupont", "IFEA SAS", "€", uploaded,
+                             executor=executor) as pdf:
+            merged = pdf.read()
+    assert len(PdfReader(io.BytesIO(merged)).pages) == 1 + 2
+    for data in (summary, merged):
+        assert b"/ASCII85Decode" not in data and b"/A85" not in data
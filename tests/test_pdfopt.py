@@ -0,0 +1,39 @@
+"""Optimisation des PDF joints : scans ramenés à PDF_MAX_DPI, le reste intact."""
+
+import io
+
+from PIL import Image as PILImage
+from pypdf import PdfReader
+
+from ndf.pdfopt import optimize_pdf_with_stats
+
+
+def _scan(pages: int, dpi: int = 300) -> bytes:
+    """Scan A4 (Pillow) : une image JPEG pleine page par page."""
+    size   = (int(8.27 * dpi), int(11.69 * dpi))
+    images = [PILImage.effect_noise(size, 60 + i).convert("RGB") for i in range(pages)]
+    out    = io.BytesIO()
+    images[0].save(out, format="PDF", resolution=dpi, quality=95,
+                   save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+def test_scanned_pages_are_downsampled(tmp_path):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(_scan(3))
+    data, info = optimize_pdf_with_stats(str(path), max_dpi=100)
+    assert "error" not in info
+    assert (info["images"], info["downsampled"]) == (3, 3)
+    assert info["size"] == len(data) < info["original_size"]
+    reader = PdfReader(io.BytesIO(data))
+    assert len(reader.pages) == 3
+    for page in reader.pages:
+        image = page.images[0].image
+        assert max(image.size) <= 11.69 * 100 + 1
+
+
+def test_small_images_are_kept():
+    source     = _scan(2, dpi=72)
+    data, info = optimize_pdf_with_stats(source)
+    assert info["downsampled"] == 0
+    assert len(PdfReader(io.BytesIO(data)).pages) == 2
@@ -0,0 +1,141 @@
+"""PDF fusionné écrit page à page (ndf.pdfstream) : relu en mode strict."""
+
+import io
+import zlib
+
+import pandas as pd
+from PIL import Image as PILImage
+from pypdf import PdfReader
+
+from ndf.blobs import BlobStore
+from ndf.pdf import stream_full_pdf
+from ndf.pdfstream import PdfStreamWriter
+
+
+def _objstm_pdf(pages: int) -> bytes:
+    """
+    PDF à flux d'objets (PDF 1.5) : catalogue, arbre des pages, police et
+    ressources partagées par toutes les pages sont dans un /ObjStm, la table
+    xref est un flux /XRef ; seuls les contenus de page sont des objets simples.
+    """
+    font, resources, first_page = 3, 4, 5
+    contents = first_page + pages
+    objects  = {
+        1:         b"<< /Type /Catalog /Pages 2 0 R >>",
+        2:         b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % (first_page + i) for i in range(pages)), pages),
+        font:      b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        resources: b"<< /Font << /F1 3 0 R >> >>",
+    }
+    for i in range(pages):
+        objects[first_page + i] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842]"
+                                   b" /Resources %d 0 R /Contents %d 0 R >>" % (resources, contents + i))
+    packed = list(objects)
+    header, body = [], b""
+    for num in packed:
+        header.append(b"%d %d" % (num, len(body)))
+        body += objects[num] + b"\n"
+    header  = b" ".join(header) + b"\n"
+    objstm  = contents + pages
+    xref_id = objstm + 1
+
+    out     = io.BytesIO()
+    offsets = {}
+    out.write(b"%PDF-1.5\n%\xe2\xe3\xcf\xd3\n")
+    for i in range(pages):
+        text = b"BT /F1 18 Tf 72 700 Td (Page jointe %d) Tj ET" % (i + 1)
+        offsets[contents + i] = out.tell()
+        out.write(b"%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n"
+                  % (contents + i, len(text), text))
+    data = zlib.compress(header + body)
+    offsets[objstm] = out.tell()
+    out.write(b"%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\n"
+              b"stream\n" % (objstm, len(packed), len(header), len(data)) + data
+              + b"\nendstream\nendobj\n")
+    offsets[xref_id] = out.tell()
+    rows = [b"\x00\x00\x00\x00\x00\xff\xff"]
+    for num in range(1, xref_id + 1):
+        if num in objects:
+            rows.append(b"\x02" + objstm.to_bytes(4, "big") + packed.index(num).to_bytes(2, "big"))
+        else:
+            rows.append(b"\x01" + offsets[num].to_bytes(4, "big") + b"\x00\x00")
+    xref = b"".join(rows)
+    out.write(b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 2] /Root 1 0 R /Length %d >>\n"
+              b"stream\n" % (xref_id, xref_id + 1, len(xref)) + xref + b"\nendstream\nendobj\n")
+    out.write(b"startxref\n%d\n%%%%EOF\n" % offsets[xref_id])
+    return out.getvalue()
+
+
+def _reopen(data: bytes) -> PdfReader:
+    """Relecture stricte ; chaque page renvoie à l'unique arbre des pages."""
+    reader = PdfReader(io.BytesIO(data), strict=True)
+    root   = reader.trailer["/Root"]["/Pages"].indirect_reference
+    assert all(p["/Parent"].indirect_reference == root for p in reader.pages)
+    return reader
+
+
+def _photo() -> bytes:
+    out = io.BytesIO()
+    PILImage.effect_noise((640, 480), 40).convert("RGB").save(out, format="JPEG", quality=85)
+    return out.getvalue()
+
+
+def _expenses(n: int = 3) -> pd.DataFrame:
+    return pd.DataFrame([{"Date": "01/10/2026", "Fournisseur": f"Fournisseur {i}",
+                          "Objet": "Train", "Type": "TRANSPORT - CARBURANT",
+                          "Montant TTC (€)": 10.0 + i, "Imputation budgétaire": "",
+                          "Justificatif": ""} for i in range(n)])
+
+
+def _build(uploaded: dict, blob_store=None) -> PdfReader:
+    errors = []
+    with stream_full_pdf(_expenses(), "Jean Dupont", "IFEA SAS", "€", uploaded,
+                         invoice_no="NDFDUPONT2610", errors=errors,
+                         blob_store=blob_store) as pdf:
+        data = pdf.read()
+    assert errors == []
+    return _reopen(data)
+
+
+def test_merge_object_streams_image_and_summary(tmp_path):
+    source = _objstm_pdf(3)
+    assert len(PdfReader(io.BytesIO(source), strict=True).pages) == 3
+    store  = BlobStore(str(tmp_path))
+    reader = _build({
+        "a": {"sha256": store.put(source), "name": "facture.pdf", "is_pdf": True, "is_image": False},
+        "b": {"bytes": _photo(), "name": "ticket.jpg", "is_pdf": False, "is_image": True},
+    }, store)
+
+    assert len(reader.pages) == 1 + 3 + 1
+    assert "NDFDUPONT2610" in reader.pages[0].extract_text()
+    for i in range(3):
+        assert f"Page jointe {i + 1}" in reader.pages[1 + i].extract_text()
+    # Police et ressources partagées : recopiées une seule fois.
+    fonts = {p["/Resources"]["/Font"]["/F1"].indirect_reference.idnum for p in reader.pages[1:4]}
+    assert len(fonts) == 1
+    image = reader.pages[4].images[0].image
+    image.load()
+    assert image.size[0] > 0 and image.size[1] > 0
+
+
+def test_same_digest_given_twice_is_merged_once(tmp_path):
+    store  = BlobStore(str(tmp_path))
+    digest = store.put(_objstm_pdf(2))
+    reader = _build({
+        "a": {"sha256": digest, "name": "facture.pdf", "is_pdf": True, "is_image": False},
+        "b": {"sha256": digest, "name": "facture (copie).pdf", "is_pdf": True, "is_image": False},
+    }, store)
+    assert len(reader.pages) == 1 + 2
+    assert [("Page jointe" in p.extract_text()) for p in reader.pages] == [False, True, True]
+
+
+def test_same_page_added_twice_by_the_writer():
+    source = PdfReader(io.BytesIO(_objstm_pdf(1)))
+    out    = io.BytesIO()
+    writer = PdfStreamWriter(out)
+    writer.add_page(source.pages[0])
+    writer.add_page(PdfReader(io.BytesIO(_objstm_pdf(1))).pages[0])
+    writer.close()
+    reader = _reopen(out.getvalue())
+    assert writer.page_count == len(reader.pages) == 2
+    assert all("Page jointe 1" in p.extract_text() for p in reader.pages)
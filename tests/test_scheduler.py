@@ -0,0 +1,66 @@
+"""Ordonnanceur : annulation des jobs en file, comptage des échecs."""
+
+import io
+import threading
+import time
+
+from ndf.jobs import PdfJob
+from ndf.scheduler import JobScheduler
+
+
+def test_cancel_queued_job_never_calls_func():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def blocking(**kwargs):
+        started.set()
+        release.wait(5)
+
+    def recorded(**kwargs):
+        calls.append(threading.current_thread().name)
+
+    scheduler = JobScheduler(slots=1)
+    running   = scheduler.submit(PdfJob(blocking), "alice")
+    queued    = scheduler.submit(PdfJob(recorded), "bob")
+    assert started.wait(5) and scheduler.position(running) == 0
+    scheduler.cancel(queued)
+
+    assert queued.is_finished and queued.stage == "cancelled"
+    assert queued.started is None and calls == []
+    assert scheduler.position(queued) is None
+    assert scheduler.metrics()["cancelled"] == 1
+    release.set()
+
+
+def _finished(scheduler: JobScheduler, jobs: list, timeout: float = 5) -> None:
+    """Attend que `jobs` soient terminés et comptés par l'ordonnanceur."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        m = scheduler.metrics()
+        if all(j.is_finished for j in jobs) and not m["running"]:
+            return
+        time.sleep(0.01)
+    raise AssertionError("jobs non terminés")
+
+
+def test_failed_jobs_are_not_completed():
+    def raises(**kwargs):
+        raise RuntimeError("disque plein")
+
+    scheduler = JobScheduler(slots=1)
+    jobs = [scheduler.submit(PdfJob(raises), "alice"),
+            scheduler.submit(PdfJob(lambda **kwargs: None), "alice"),
+            scheduler.submit(PdfJob(lambda **kwargs: io.BytesIO(b"%PDF")), "alice")]
+    _finished(scheduler, jobs)
+
+    assert [j.stage for j in jobs] == ["failed", "failed", "done"]
+    assert jobs[0].error == "disque plein" and jobs[1].error and jobs[2].error is None
+    m = scheduler.metrics()
+    assert (m["completed"], m["failed"], m["cancelled"]) == (1, 2, 0)
+
+
+def test_cancel_during_final_write_closes_result():
+    result = io.BytesIO(b"%PDF")
+    job    = PdfJob(lambda **kwargs: (job.cancel(), result)[1])
+    job.run()
+    assert job.stage == "cancelled" and job.result is None and result.closed
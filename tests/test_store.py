@@ -0,0 +1,64 @@
+"""Tableau des dépenses : un diff du st.data_editor tient totaux et pièces à jour."""
+
+from ndf.config import ATTACHMENT_KEY, EXPENSE_CATEGORIES
+from ndf.store import ExpenseStore
+
+AMOUNT = "Montant TTC (€)"
+
+
+def _row(fournisseur: str, rtype: str, amount, key: str = "") -> dict:
+    return {"Fournisseur": fournisseur, "Type": rtype, AMOUNT: amount, ATTACHMENT_KEY: key}
+
+
+def _recount(store: ExpenseStore) -> dict:
+    """Totaux recalculés depuis les lignes, pour comparer aux totaux courants."""
+    totals = dict.fromkeys(EXPENSE_CATEGORIES, 0)
+    for row in store.records("€"):
+        if row[AMOUNT] is not None:
+            totals[row["Type"]] += round(row[AMOUNT] * 100)
+    return totals
+
+
+def test_edit_add_and_delete_in_one_diff():
+    store = ExpenseStore()
+    store.extend([
+        _row("SNCF", "TRANSPORT - CARBURANT", 45.10, "k1"),
+        _row("Ibis", "HOTEL-HEBERGEMENT", 89.00, "k2"),
+        _row("Brasserie", "RECEPTION-INVITATIONS-REPAS", "23,40", "k1"),
+        _row("La Poste", "AFFRANCHISSEMENT", 7.50),
+    ], "€")
+    assert store.totals["TRANSPORT - CARBURANT"] == 4510
+    assert store.refs == {"k1": 2, "k2": 1}
+    store.commit_changes()
+
+    store.apply_editor_diff({
+        "edited_rows": {"0": {AMOUNT: 50.0}, 2: {"Type": "DIVERS"}, 3: {AMOUNT: None}},
+        "added_rows":  [_row("Uber", "TRANSPORT - CARBURANT", "12,30", "k3"),
+                        _row("", "TELEPHONE", None)],
+        "deleted_rows": [1],
+    }, "€")
+
+    assert len(store) == 5
+    assert [r["Fournisseur"] for r in store.records("€")] == [
+        "SNCF", "Brasserie", "La Poste", "Uber", ""]
+    assert store.totals["TRANSPORT - CARBURANT"] == 5000 + 1230
+    assert store.totals["HOTEL-HEBERGEMENT"] == 0
+    assert store.totals["RECEPTION-INVITATIONS-REPAS"] == 0
+    assert store.totals["DIVERS"] == 2340
+    assert store.totals["AFFRANCHISSEMENT"] == 0
+    assert store.totals == _recount(store)
+    assert store.grand_total == 5000 + 1230 + 2340
+    # La pièce k2 n'est plus référencée ; k1 l'est toujours deux fois.
+    assert store.refs == {"k1": 2, "k3": 1}
+    assert store.incomplete() == 2
+    # Édition de 0, 2, 3 puis suppression de 1 : tout est décalé à partir de 1.
+    assert sorted(store.changes("€")) == [0, 1, 2, 3, 4]
+    frame = store.frame("€")
+    assert frame[AMOUNT].isna().tolist() == [False, False, True, False, True]
+
+
+def test_delete_last_reference_drops_key():
+    store = ExpenseStore()
+    store.extend([_row("A", "DIVERS", 1, "k"), _row("B", "DIVERS", 2, "k")], "€")
+    store.apply_editor_diff({"deleted_rows": [0, 1]}, "€")
+    assert len(store) == 0 and not store.refs and store.grand_total == 0
@@ -0,0 +1,41 @@
+"""Mesures par étape : le pic mémoire du processus n'est remis à zéro que sur demande."""
+
+from ndf import trace as ndf_trace
+from ndf.trace import BuildTrace, measured
+
+
+def _resets(monkeypatch) -> list:
+    calls = []
+    monkeypatch.setattr(ndf_trace, "reset_peak_rss", lambda: calls.append(1) or True)
+    return calls
+
+
+def test_stage_keeps_peak_by_default(monkeypatch):
+    calls = _resets(monkeypatch)
+    rss   = iter([100, 150, 150, 120])
+    monkeypatch.setattr(ndf_trace, "current_rss", lambda: next(rss))
+    trace = BuildTrace()
+    with trace.stage("summary"):
+        pass
+    with trace.stage("write"):
+        pass
+    assert calls == []
+    summary, write = trace.spans
+    assert (summary["rss"], summary["rss_delta"]) == (150, 50)
+    assert (write["rss"], write["rss_delta"]) == (120, -30)
+    assert summary["peak_rss"] > 0
+
+
+def test_reset_is_opt_in(monkeypatch):
+    calls = _resets(monkeypatch)
+    trace = BuildTrace(reset_peak=True)
+    for stage in ("summary", "attachment", "write"):
+        with trace.stage(stage):
+            pass
+    assert len(calls) == 3
+
+    result, worker = measured(len, b"abc")
+    assert result == 3 and len(calls) == 3
+    assert {"worker_seconds", "worker_rss_delta", "worker_peak_rss"} <= worker.keys()
+    measured(len, b"abc", reset_peak=True)
+    assert len(calls) == 4